@@ -0,0 +1,111 @@
+"""
+CSV/XLSX ingestion benchmark: old pandas read-everything path vs the
+column-detecting streaming extractor, on synthetic sheets with ID, name,
+phone, date and amount columns.
+
+    python bench/bench_ingest.py [--rows 1000000] [--xlsx-rows 1000000]
+
+Also reports how many numbers each path took from non-phone columns.
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor import iter_raw_numbers
+
+HEADER = ["Customer ID", "Name", "Mobile", "Signup Date", "Amount"]
+
+
+def synthetic_rows(n, seed=7):
+    rnd = random.Random(seed)
+    for i in range(n):
+        phone = f"+91 {rnd.randint(6000, 9999)}{rnd.randint(0, 999999):06d}"
+        yield [10000000 + i, f"Name {i}", phone, f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+               rnd.randint(1000000, 99999999)]
+
+
+def write_csv(path, n):
+    with open(path, "w") as f:
+        f.write(",".join(HEADER) + "\n")
+        for r in synthetic_rows(n):
+            f.write(",".join(map(str, r)) + "\n")
+
+
+def write_xlsx(path, n):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(HEADER)
+    for r in synthetic_rows(n): ws.append(r)
+    wb.save(path)
+
+
+def legacy_extract(path):
+    # copy of the original extract_all_numbers for csv/xlsx
+    import pandas as pd
+    df = pd.read_csv(path, dtype=str) if path.endswith(".csv") else pd.read_excel(path, dtype=str)
+    text_data = " ".join(df.values.flatten().astype(str))
+    return re.findall(r"\+?\d{7,}", text_data)
+
+
+def new_extract(path):
+    return list(iter_raw_numbers(path))
+
+
+def peak_mb():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return float("nan")
+
+
+def measure(fn, path):
+    """Runs in a fresh process so peak RSS belongs to this extractor alone."""
+    t = time.perf_counter()
+    nums = fn(path)
+    t = time.perf_counter() - t
+    # synthetic phones have 10+ digits, IDs and amounts 7-8
+    junk = sum(1 for n in nums if len(n.lstrip("+")) < 10)
+    return t, len(nums), junk, peak_mb()
+
+
+def report(kind, rows, path):
+    from concurrent.futures import ProcessPoolExecutor
+    print(f"\n{kind}: {rows} rows, {os.path.getsize(path) / 1e6:.1f} MB")
+    res = {}
+    for label, fn in (("legacy", legacy_extract), ("columnar", new_extract)):
+        with ProcessPoolExecutor(1) as pool:
+            res[label] = t, count, junk, rss = pool.submit(measure, fn, path).result()
+        print(f"  {label:>9}: {t:8.2f}s  {count / t:>10,.0f} numbers/s  {count:>9} numbers"
+              f"  {junk:>9} from other columns  peak RSS {rss:,.0f} MB")
+    print(f"  speedup {res['legacy'][0] / res['columnar'][0]:.1f}x")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--xlsx-rows", type=int, default=1_000_000)
+    args = ap.parse_args()
+    tmp = tempfile.mkdtemp()
+    csv_path, xlsx_path = os.path.join(tmp, "sheet.csv"), os.path.join(tmp, "sheet.xlsx")
+    try:
+        write_csv(csv_path, args.rows)
+        report("CSV", args.rows, csv_path)
+        if args.xlsx_rows:
+            write_xlsx(xlsx_path, args.xlsx_rows)
+            report("XLSX", args.xlsx_rows, xlsx_path)
+    finally:
+        for p in (csv_path, xlsx_path):
+            if os.path.exists(p): os.remove(p)
+        os.rmdir(tmp)
+
+
+if __name__ == "__main__":
+    main()
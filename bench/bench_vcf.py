@@ -0,0 +1,63 @@
+"""
+VCF rendering benchmark: old `out +=` loop vs the streaming vcf_writer.
+
+    python bench/bench_vcf.py [1000 10000 100000]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vcf_writer import write_vcards, cfg_parts
+from normalize import normalize
+
+CFG = {"contact_name": "Contact", "country_code": "+91", "group_number": "Team"}
+
+
+def legacy_make_vcf(numbers, cfg, path, start=1):
+    # copy of the old make_vcf body
+    out = ""
+    for i, n in enumerate(numbers, start=start):
+        name = f"{cfg['contact_name']}{str(i).zfill(3)}"
+        if cfg.get("group_number"): name += f" ({cfg['group_number']})"
+        clean_n = n.replace("+", "")
+        prefix = cfg["country_code"] if cfg["country_code"] else "+"
+        final_num = f"{prefix}{clean_n}"
+        out += f"BEGIN:VCARD\nVERSION:3.0\nFN:{name}\nTEL;TYPE=CELL:{final_num}\nEND:VCARD\n"
+    with open(path, "w", encoding="utf-8") as f: f.write(out)
+
+
+def stream_make_vcf(numbers, cfg, path, start=1):
+    name, suffix = cfg_parts(cfg)
+    with open(path, "wb") as f: write_vcards(f, numbers, name, start, suffix)
+
+
+def timed(fn, *args):
+    t = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t
+
+
+def main(sizes):
+    tmp = tempfile.mkdtemp()
+    a, b = os.path.join(tmp, "legacy.vcf"), os.path.join(tmp, "stream.vcf")
+    print(f"{'contacts':>10} {'legacy s':>10} {'stream s':>10} {'speedup':>8}")
+    for size in sizes:
+        # national numbers: the legacy path puts the country code in front of them
+        nums = [str(random.randint(10**9, 10**10 - 1)) for _ in range(size)]
+        t_old = min(timed(legacy_make_vcf, nums, CFG, a) for _ in range(3))
+        # the bot normalises once at upload, not per file
+        canon = normalize(nums, CFG["country_code"])
+        t_new = min(timed(stream_make_vcf, canon, CFG, b) for _ in range(3))
+        with open(a, "rb") as x, open(b, "rb") as y:
+            assert x.read() == y.read(), "outputs differ"
+        print(f"{size:>10} {t_old:>10.4f} {t_new:>10.4f} {t_old / t_new:>7.1f}x")
+    for p in (a, b): os.remove(p)
+    os.rmdir(tmp)
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [1000, 10000, 100000])
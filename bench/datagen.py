@@ -0,0 +1,139 @@
+"""
+Reproducible synthetic inputs for the benchmarks (same seed -> same bytes).
+
+    mixed_country_numbers(n)       list of "+<cc><national>" strings, ~5% invalid
+    write_noisy_txt(path, n)       chat-export style text around n numbers
+    write_multi_tel_vcf(path, n)   vCards with 1-4 TEL lines each, n TELs total
+    write_wide_csv(path, rows)     12 columns, 2 of them phones
+    write_wide_xlsx(path, rows)    same sheet as .xlsx (openpyxl write_only)
+"""
+import random
+
+# calling code, national number pattern ("#" = any digit, [..] = one of), weight
+COUNTRIES = [
+    ("91", "[6789]#########", 40),    # India
+    ("1", "[2-9]##[2-9]######", 15),  # US / Canada
+    ("44", "7#########", 8),          # UK mobile
+    ("55", "119[6-9]#######", 8),     # Brazil, Sao Paulo mobile
+    ("62", "8[1-5]########", 8),      # Indonesia
+    ("234", "8[01]########", 6),      # Nigeria
+    ("49", "15[12579]########", 5),   # Germany
+    ("971", "5[024568]#######", 5),   # UAE
+    ("92", "3[0-4]########", 5),      # Pakistan
+]
+
+
+def _digit(rnd, spec):
+    if spec == "#": return str(rnd.randint(0, 9))
+    if spec.startswith("["):
+        body = spec[1:-1]
+        if "-" in body:
+            lo, hi = body.split("-")
+            return str(rnd.randint(int(lo), int(hi)))
+        return rnd.choice(body)
+    return spec
+
+
+def _tokens(pattern):
+    i = 0
+    while i < len(pattern):
+        if pattern[i] == "[":
+            j = pattern.index("]", i)
+            yield pattern[i:j + 1]
+            i = j + 1
+        else:
+            yield pattern[i]
+            i += 1
+
+
+def mixed_country_numbers(n, seed=1, invalid=0.05):
+    rnd = random.Random(seed)
+    specs = [(cc, list(_tokens(p))) for cc, p, _ in COUNTRIES]
+    weights = [w for _, _, w in COUNTRIES]
+    out = []
+    for _ in range(n):
+        if rnd.random() < invalid:
+            out.append("+" + "".join(str(rnd.randint(0, 9)) for _ in range(rnd.randint(7, 14))))
+            continue
+        cc, toks = rnd.choices(specs, weights)[0]
+        out.append("+" + cc + "".join(_digit(rnd, t) for t in toks))
+    return out
+
+
+NOISE = ["ok", "call me", "sent", "pls check", "thanks!!", "order #4471", "meet at 5:30",
+         "otp 448812", "mail me at a.b@example.com", "pin 560001", "2024-03-14", "see you",
+         "amount 1,250.00", "ref 55-1234", "👍", "price 999"]
+
+
+def write_noisy_txt(path, n, seed=2, dup=0.1):
+    """n numbers (with ~dup re-sent ones) between chat noise. Returns n."""
+    rnd = random.Random(seed)
+    nums = mixed_country_numbers(n, seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i, num in enumerate(nums):
+            if i and rnd.random() < dup: num = nums[rnd.randrange(i)]
+            if rnd.random() < 0.3: num = num.lstrip("+")
+            f.write(f"[{rnd.randint(1, 28):02d}/0{rnd.randint(1, 9)}, {rnd.randint(0, 23)}:{rnd.randint(0, 59):02d}] "
+                    f"User{rnd.randint(1, 300)}: {rnd.choice(NOISE)} {num} {rnd.choice(NOISE)}\n")
+    return n
+
+
+def write_multi_tel_vcf(path, n, seed=3):
+    """vCards with 1-4 TEL lines each until n numbers are written. Returns n."""
+    rnd = random.Random(seed)
+    nums = mixed_country_numbers(n, seed)
+    types = ["CELL", "HOME", "WORK", "CELL;PREF"]
+    with open(path, "w", encoding="utf-8") as f:
+        i, card = 0, 0
+        while i < n:
+            k = min(rnd.randint(1, 4), n - i)
+            card += 1
+            f.write(f"BEGIN:VCARD\nVERSION:3.0\nFN:Person {card}\nN:{card};Person;;;\n")
+            for t in range(k):
+                f.write(f"TEL;TYPE={types[t]}:{nums[i + t]}\n")
+            if rnd.random() < 0.3: f.write(f"EMAIL:p{card}@example.com\n")
+            if rnd.random() < 0.2: f.write(f"NOTE:customer since 2019 id 7{card:07d}\n")
+            f.write("END:VCARD\n")
+            i += k
+    return n
+
+
+WIDE_HEADER = ["Customer ID", "Name", "Email", "Mobile", "Alt Phone", "City",
+               "Signup Date", "Amount", "Pincode", "Orders", "Last Login", "Notes"]
+CITIES = ["Mumbai", "Delhi", "Pune", "Lagos", "Jakarta", "London", "Dubai", "Karachi"]
+
+
+def wide_rows(rows, seed=4):
+    rnd = random.Random(seed)
+    nums = mixed_country_numbers(rows * 2, seed, invalid=0.0)
+    for i in range(rows):
+        yield [10000000 + i, f"Name {i}", f"user{i}@example.com", nums[2 * i],
+               nums[2 * i + 1] if rnd.random() < 0.5 else "", rnd.choice(CITIES),
+               f"2023-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}", rnd.randint(1000000, 99999999),
+               rnd.randint(100000, 999999), rnd.randint(0, 90),
+               f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 10:{rnd.randint(0, 59):02d}",
+               rnd.choice(["", "vip", "call after 6", "ref 1234567"])]
+
+
+def write_wide_csv(path, rows, seed=4):
+    """Returns the number of phone cells written."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(",".join(WIDE_HEADER) + "\n")
+        for r in wide_rows(rows, seed):
+            count += 1 + bool(r[4])
+            f.write(",".join(map(str, r)) + "\n")
+    return count
+
+
+def write_wide_xlsx(path, rows, seed=4):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(WIDE_HEADER)
+    count = 0
+    for r in wide_rows(rows, seed):
+        count += 1 + bool(r[4])
+        ws.append(r)
+    wb.save(path)
+    return count
@@ -0,0 +1,308 @@
+"""
+Offline end-to-end harness: drives the bot_core handlers with fake Update
+objects and a fake Bot (no network, no token), and reports per-scenario
+latency and the Telegram API calls each flow makes.
+
+    python bench/harness.py                       # every scenario, 10k numbers
+    python bench/harness.py --scenarios gen merge --numbers 100000 --users 20
+    python bench/harness.py --api-latency 80      # pretend each API call takes 80 ms
+    python bench/harness.py --queue-workers 4     # heavy flows via a SQLite job queue
+
+--users runs that many users through the scenario at the same time.
+--queue-workers starts that many local worker processes (each with its own
+fake Bot) and times a scenario until its queued jobs are finished.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import functools
+import itertools
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram import Update, Message
+
+import datagen
+
+_ids = itertools.count(1000)
+
+
+class FakeFile:
+    def __init__(self, data):
+        self.data = data
+
+    async def download_to_memory(self, out):
+        out.write(self.data)
+
+    async def download_to_drive(self, path):
+        with open(path, "wb") as f: f.write(self.data)
+
+
+class FakeBot:
+    """Stands in for telegram.Bot: records calls, returns plausible objects."""
+
+    defaults = None
+
+    def __init__(self, latency=0.0, shared_dir=None):
+        self.latency = latency
+        self.shared_dir = shared_dir   # uploads + call log shared with queue workers
+        self.files = {}
+        self.calls = []   # (uid/chat, method, bytes)
+        self.replies = {}  # chat -> [(text, callback_data of its buttons)]
+
+    def _message(self, chat_id, text=None):
+        return Message.de_json({"message_id": next(_ids), "date": int(time.time()), "text": text,
+                                "chat": {"id": chat_id, "type": "private"}}, self)
+
+    async def _call(self, method, chat_id, nbytes=0):
+        self.calls.append((chat_id, method, nbytes))
+        if self.shared_dir:
+            with open(os.path.join(self.shared_dir, "calls.jsonl"), "a") as f:
+                f.write(json.dumps([chat_id, method, nbytes]) + "\n")
+        if self.latency: await asyncio.sleep(self.latency)
+
+    async def send_message(self, chat_id, text, reply_markup=None, **kw):
+        await self._call("sendMessage", chat_id)
+        rows = getattr(reply_markup, "inline_keyboard", None) or ()
+        self.replies.setdefault(chat_id, []).append((text, [b.callback_data for row in rows for b in row]))
+        return self._message(chat_id, text)
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kw):
+        await self._call("editMessageText", chat_id)
+        return self._message(chat_id, text)
+
+    async def edit_message_reply_markup(self, chat_id=None, message_id=None, **kw):
+        await self._call("editMessageReplyMarkup", chat_id)
+        return True
+
+    async def delete_message(self, chat_id, message_id, **kw):
+        await self._call("deleteMessage", chat_id)
+        return True
+
+    async def answer_callback_query(self, callback_query_id, **kw):
+        await self._call("answerCallbackQuery", None)
+        return True
+
+    async def send_document(self, chat_id, document, filename=None, **kw):
+        data = document.read() if hasattr(document, "read") else document
+        await self._call("sendDocument", chat_id, len(data))
+        return self._message(chat_id)
+
+    async def send_media_group(self, chat_id, media, **kw):
+        size = 0
+        for m in media:
+            doc = m.media
+            size += len(getattr(doc, "input_file_content", b"") or b"")
+        await self._call("sendMediaGroup", chat_id, size)
+        return [self._message(chat_id) for _ in media]
+
+    async def get_file(self, file_id, **kw):
+        await self._call("getFile", None)
+        if file_id not in self.files and self.shared_dir:
+            with open(os.path.join(self.shared_dir, file_id), "rb") as f: return FakeFile(f.read())
+        return FakeFile(self.files[file_id])
+
+
+class User:
+    """One fake chat: builds updates and feeds them to the handlers."""
+
+    def __init__(self, bot, uid):
+        self.bot, self.uid = bot, uid
+        self.ctx = SimpleNamespace(bot=bot)
+        self.user = {"id": uid, "is_bot": False, "first_name": f"Bench{uid}"}
+        self.chat = {"id": uid, "type": "private"}
+
+    def _msg(self, **fields):
+        return dict({"message_id": next(_ids), "date": int(time.time()), "chat": self.chat, "from": self.user}, **fields)
+
+    def _update(self, **fields):
+        return Update.de_json(dict({"update_id": next(_ids)}, **fields), self.bot)
+
+    async def command(self, text):
+        import bot_core
+        u = self._update(message=self._msg(text=text, entities=[{"type": "bot_command", "offset": 0, "length": len(text)}]))
+        await bot_core.start(u, self.ctx)
+
+    async def text(self, text):
+        import bot_core
+        await bot_core.handle_text(self._update(message=self._msg(text=text)), self.ctx)
+
+    def buttons(self):
+        """callback_data of the buttons under the last message sent to this chat."""
+        replies = self.bot.replies.get(self.uid)
+        return replies[-1][1] if replies else []
+
+    def errors(self):
+        return [t for t, _ in self.bot.replies.get(self.uid, []) if t.startswith("❌")]
+
+    async def press(self, data):
+        import bot_core
+        msg = self._msg(text="menu")
+        msg["from"] = {"id": 1, "is_bot": True, "first_name": "bot"}
+        u = self._update(callback_query={"id": str(next(_ids)), "from": self.user, "chat_instance": "bench",
+                                         "data": data, "message": msg})
+        await bot_core.buttons(u, self.ctx)
+
+    async def upload(self, name, data):
+        import bot_core
+        file_id = f"f{next(_ids)}"
+        self.bot.files[file_id] = data
+        if self.bot.shared_dir:
+            with open(os.path.join(self.bot.shared_dir, file_id), "wb") as f: f.write(data)
+        doc = {"file_id": file_id, "file_unique_id": file_id, "file_name": name, "file_size": len(data)}
+        await bot_core.handle_file(self._update(message=self._msg(document=doc)), self.ctx)
+
+
+# ===== SCENARIOS =====
+# each takes (user, inputs) and runs one full flow from the main menu
+
+async def sc_start(u, inp):
+    await u.command("/start")
+
+
+async def sc_analysis(u, inp):
+    await u.press("analysis")
+    await u.upload("numbers.txt", inp["txt"])
+
+
+async def sc_convert(u, inp):
+    await u.press("converter")
+    await u.upload("sheet.csv", inp["csv"])
+    await u.press("cv_vcf")
+
+
+async def sc_convert_all(u, inp):
+    await u.press("converter")
+    await u.upload("numbers.txt", inp["txt"])
+    await u.press("cv_all")
+
+
+async def sc_gen(u, inp):
+    await u.press("gen")
+    for answer in ("Bench", "Contact", "500", "1", "1"):
+        await u.text(answer)
+    await u.press("skip_cc")
+    await u.press("skip_group")
+    await u.press("gen_done")
+    await u.upload("numbers.txt", inp["txt"])
+
+
+async def sc_split(u, inp):
+    await u.press("split_vcf")
+    await u.upload("contacts.vcf", inp["vcf"])
+    await queued_done(u.uid)   # the count arrives before the user answers
+    await u.text("1000")
+    # the zip / separate files choice only comes with more than ZIP_SUGGEST_FILES files
+    if "split_zip" in u.buttons(): await u.press("split_zip")
+
+
+async def sc_merge(u, inp):
+    await u.press("merge")
+    await u.upload("a.txt", inp["txt"])
+    await u.upload("b.vcf", inp["vcf"])
+    await u.text("done")
+    await u.press("merge_as_txt")
+
+
+async def sc_rename(u, inp):
+    await u.press("rename_contacts")
+    for i in range(5): await u.upload(f"part{i}.vcf", inp["vcf"])
+    await u.text("Bench")
+    await u.press("rename_vcf")
+
+
+SCENARIOS = {name[3:]: fn for name, fn in globals().items() if name.startswith("sc_")}
+
+
+def make_inputs(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        out = {}
+        for key, writer in (("txt", datagen.write_noisy_txt), ("vcf", datagen.write_multi_tel_vcf),
+                            ("csv", datagen.write_wide_csv)):
+            path = os.path.join(tmp, "in." + key)
+            writer(path, n if key != "csv" else n // 2)
+            with open(path, "rb") as f: out[key] = f.read()
+        return out
+
+
+async def queued_done(uid):
+    import jobqueue
+    while jobqueue.enabled() and await asyncio.to_thread(jobqueue.queue().pending, uid):
+        await asyncio.sleep(0.05)
+
+
+async def run_scenario(name, inputs, users, latency, uid_base, shared_dir=None):
+    bot = FakeBot(latency, shared_dir)
+    people = [User(bot, uid_base + i) for i in range(users)]
+    async def one(u):
+        t = time.perf_counter()
+        await SCENARIOS[name](u, inputs)
+        await queued_done(u.uid)
+        # an error reply means the scenario did not run the flow it names
+        if u.errors(): raise AssertionError(f"{name}: {u.errors()[0]}")
+        return time.perf_counter() - t
+    t = time.perf_counter()
+    times = sorted(await asyncio.gather(*[one(u) for u in people]))
+    wall = time.perf_counter() - t
+    calls = bot.calls
+    if shared_dir:
+        # front + workers all log here; keep this scenario's chats (and chat-less calls)
+        with open(os.path.join(shared_dir, "calls.jsonl")) as f:
+            calls = [c for c in map(json.loads, f) if c[0] is None or uid_base <= c[0] < uid_base + users]
+        os.remove(os.path.join(shared_dir, "calls.jsonl"))
+    methods = {}
+    for _, m, _ in calls: methods[m] = methods.get(m, 0) + 1
+    return {"wall": wall, "p50": times[len(times) // 2], "max": times[-1],
+            "calls": len(calls) / users, "uploaded": sum(b for _, _, b in calls) / users,
+            "methods": {m: c / users for m, c in sorted(methods.items())}}
+
+
+async def main_async(args):
+    from jobs import executor
+    import jobqueue
+    inputs = make_inputs(args.numbers)
+    shared, workers = None, []
+    if args.queue_workers:
+        shared = tempfile.mkdtemp(prefix="harness-queue-")
+        jobqueue.configure(f"sqlite:///{shared}/jobs.db")
+        workers = jobqueue.start_local_workers(args.queue_workers, functools.partial(FakeBot, args.api_latency / 1000, shared))
+    print(f"{'scenario':<10} {'users':>5} {'wall':>8} {'p50':>8} {'max':>8} {'API calls':>10} {'uploaded':>10}")
+    try:
+        for k, name in enumerate(args.scenarios):
+            r = await run_scenario(name, inputs, args.users, args.api_latency / 1000, 100_000 * (k + 1), shared)
+            print(f"{name:<10} {args.users:>5} {r['wall']:>7.2f}s {r['p50']:>7.2f}s {r['max']:>7.2f}s"
+                  f" {r['calls']:>10.1f} {r['uploaded'] / 1e6:>8.2f}MB")
+            if args.verbose: print("           " + ", ".join(f"{m} {c:g}" for m, c in r["methods"].items()))
+    finally:
+        jobqueue.stop_local_workers(workers)
+        executor.shutdown()
+        if shared: import shutil; shutil.rmtree(shared, ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scenarios", nargs="*", choices=sorted(SCENARIOS), default=sorted(SCENARIOS))
+    ap.add_argument("--numbers", type=int, default=10_000)
+    ap.add_argument("--users", type=int, default=1)
+    ap.add_argument("--api-latency", type=float, default=0, help="ms per fake API call")
+    ap.add_argument("--queue-workers", type=int, default=0, help="run heavy flows on N local queue workers")
+    ap.add_argument("-v", "--verbose", action="store_true", help="show API calls per method")
+    args = ap.parse_args()
+    # start from an empty result cache so every run measures real work
+    cache = tempfile.mkdtemp(prefix="harness-cache-")
+    os.environ["RESULT_CACHE_DIR"] = cache
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        import shutil; shutil.rmtree(cache, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
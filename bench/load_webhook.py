@@ -0,0 +1,85 @@
+"""
+Load test for webhook mode: posts synthetic Telegram updates to a running
+bot and reports accepted updates/sec and request latency.
+
+    BOT_MODE=webhook python main.py              # in another shell
+    python bench/load_webhook.py --url http://127.0.0.1:10000/webhook -n 5000 -c 50
+
+Updates come from made-up users and chats, so the bot's replies fail at
+the Telegram API. The numbers show how fast the endpoint takes and queues
+updates; use --kind to pick text messages, button presses or /start.
+"""
+import os
+import sys
+import time
+import json
+import random
+import asyncio
+import argparse
+
+import httpx
+
+
+def fake_update(update_id, kind):
+    user = {"id": 10_000 + update_id % 500, "is_bot": False, "first_name": "Load"}
+    chat = {"id": user["id"], "type": "private"}
+    msg = {"message_id": update_id, "date": int(time.time()), "chat": chat, "from": user}
+    if kind == "callback":
+        return {"update_id": update_id, "callback_query": {
+            "id": str(update_id), "from": user, "chat_instance": "load",
+            "data": random.choice(["main_menu", "analysis", "converter", "mysettings"]),
+            "message": dict(msg, text="menu"),
+        }}
+    if kind == "start":
+        msg.update(text="/start", entities=[{"type": "bot_command", "offset": 0, "length": 6}])
+    else:
+        msg["text"] = "hello " + str(update_id)
+    return {"update_id": update_id, "message": msg}
+
+
+async def run(url, total, concurrency, kind, secret):
+    headers = {"Content-Type": "application/json"}
+    if secret: headers["X-Telegram-Bot-Api-Secret-Token"] = secret
+    latencies, errors = [], 0
+    ids = iter(range(1, total + 1))
+
+    async def worker(client):
+        nonlocal errors
+        for uid in ids:
+            body = json.dumps(fake_update(uid, kind))
+            t = time.perf_counter()
+            try:
+                r = await client.post(url, content=body, headers=headers)
+                if r.status_code != 200: errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - t)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f"updates: {total}  concurrency: {concurrency}  errors: {errors}")
+    print(f"elapsed: {elapsed:.2f}s  throughput: {total / elapsed:.0f} updates/s")
+    print(f"latency ms  p50={pct(0.50):.1f}  p95={pct(0.95):.1f}  p99={pct(0.99):.1f}")
+
+
+def main():
+    port = os.environ.get("PORT", "10000")
+    path = os.environ.get("WEBHOOK_PATH", "/webhook")
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default=f"http://127.0.0.1:{port}{path}")
+    ap.add_argument("-n", "--total", type=int, default=2000)
+    ap.add_argument("-c", "--concurrency", type=int, default=20)
+    ap.add_argument("--kind", choices=["text", "callback", "start"], default="text")
+    ap.add_argument("--secret", default=os.environ.get("WEBHOOK_SECRET", ""))
+    args = ap.parse_args()
+    asyncio.run(run(args.url, args.total, args.concurrency, args.kind, args.secret))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+Local mock of the Telegram Bot API with flood limits, for the outbound rate
+limiter (ratelimit.py). A real telegram.ext.ExtBot talks HTTP to it.
+
+    python bench/mockapi.py                        # limiter on vs off
+    python bench/mockapi.py --users 20 --files 30
+    python bench/mockapi.py --serve 8081           # just run the server
+
+The server answers the methods the bot uses and returns 429 with
+retry_after like Telegram does: per chat past --chat-rate/s (bursts of
+--chat-burst), over all chats past --global-rate/s. The load is --users
+chats each running a split: a progress edit every 0.1s while --files
+documents go out, then the "done" and menu messages. "failed" counts
+chats whose flow died on a flood wait. One more chat taps a
+button every 1.5s meanwhile; its latency is what users feel.
+"""
+import os
+import sys
+import json
+import time
+import email
+import asyncio
+import argparse
+import itertools
+from urllib.parse import parse_qsl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TOKEN = "123:mock"
+
+
+class MockTelegram:
+    """asyncio HTTP server speaking enough of the Bot API, with flood limits."""
+
+    def __init__(self, chat_rate=1.0, chat_burst=5, global_rate=30.0):
+        self.chat_rate, self.chat_burst, self.global_rate = chat_rate, chat_burst, global_rate
+        self.buckets = {}   # chat (or None for global) -> [tokens, stamp]
+        self.ids = itertools.count(1)
+        self.calls = []     # (method, chat, status)
+        self.server = None
+        self.writers = set()
+
+    async def start(self, port=0):
+        self.server = await asyncio.start_server(self._conn, "127.0.0.1", port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def stop(self):
+        self.server.close()
+        for w in list(self.writers): w.close()
+        await self.server.wait_closed()
+
+    # ----- limits -----
+
+    def _take(self, key, rate, burst):
+        now = time.monotonic()
+        tokens, stamp = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - stamp) * rate)
+        if tokens < 1:
+            self.buckets[key] = [tokens, now]
+            return int((1 - tokens) / rate) + 1
+        self.buckets[key] = [tokens - 1, now]
+        return 0
+
+    def _limit(self, chat):
+        wait = self._take(None, self.global_rate, self.global_rate)
+        if not wait and chat is not None: wait = self._take(chat, self.chat_rate, self.chat_burst)
+        return wait
+
+    # ----- API -----
+
+    def _message(self, chat, text=None):
+        return {"message_id": next(self.ids), "date": int(time.time()), "text": text,
+                "chat": {"id": chat, "type": "private"}}
+
+    def handle(self, method, params):
+        chat = params.get("chat_id")
+        chat = int(chat) if chat not in (None, "") else None
+        if method == "getMe":
+            return 200, {"id": 1, "is_bot": True, "first_name": "Mock", "username": "mock_bot"}
+        wait = self._limit(chat)
+        self.calls.append((method, chat, 429 if wait else 200))
+        if wait:
+            return 429, {"description": f"Too Many Requests: retry after {wait}", "parameters": {"retry_after": wait}}
+        if method in ("sendMessage", "sendDocument"): return 200, self._message(chat, params.get("text"))
+        if method == "editMessageText":
+            m = self._message(chat, params.get("text"))
+            m["message_id"] = int(params["message_id"])
+            return 200, m
+        if method == "sendMediaGroup":
+            return 200, [self._message(chat) for _ in json.loads(params.get("media", "[]"))]
+        return 200, True
+
+    async def _conn(self, reader, writer):
+        self.writers.add(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                path = lines[0].split(" ")[1]
+                headers = {k.lower(): v.strip() for k, v in (l.split(":", 1) for l in lines[1:] if ":" in l)}
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, result = self.handle(path.rsplit("/", 1)[-1], parse_params(headers.get("content-type", ""), body))
+                payload = {"ok": True, "result": result} if status == 200 else dict(result, ok=False, error_code=status)
+                data = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Too Many Requests'}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+
+def parse_params(content_type, body):
+    if content_type.startswith("multipart/"):
+        msg = email.message_from_bytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        params = {}
+        for part in msg.get_payload():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename() is None: params[name] = part.get_payload(decode=True).decode()
+        return params
+    if content_type.startswith("application/json"):
+        return json.loads(body or b"{}")
+    return dict(parse_qsl(body.decode()))
+
+
+# ===== LOAD =====
+
+async def split_user(bot, chat, files):
+    """A split: status message edited every 0.1s while the files are sent."""
+    status = await bot.send_message(chat, "⏳ Splitting...")
+    done = asyncio.Event()
+
+    async def progress():
+        k = 0
+        while not done.is_set():
+            k += 1
+            try: await bot.edit_message_text(f"⏳ Splitting... {k}", chat_id=chat, message_id=status.message_id)
+            except Exception: pass
+            await asyncio.sleep(0.1)
+
+    task = asyncio.create_task(progress())
+    for i in range(files):
+        await bot.send_document(chat, b"BEGIN:VCARD\nEND:VCARD\n", filename=f"part{i}.vcf")
+    done.set(); await task
+    await bot.send_message(chat, "✅ Done.")
+    await bot.send_message(chat, "🤖 MAIN MENU")
+
+
+async def tapping_user(bot, chat, stop, latencies):
+    failed = 0
+    while not stop.is_set():
+        t = time.perf_counter()
+        try:
+            await bot.send_message(chat, "menu")
+            latencies.append(time.perf_counter() - t)
+        except Exception:
+            failed += 1
+        await asyncio.sleep(1.5)
+    return failed
+
+
+async def run_load(limited, args):
+    from telegram.error import RetryAfter
+    from telegram.ext import ExtBot
+    from telegram.request import HTTPXRequest
+    from ratelimit import OutboundLimiter
+
+    api = MockTelegram(args.chat_rate, args.chat_burst, args.global_rate)
+    base = await api.start()
+    bot = ExtBot(TOKEN, base_url=base, request=HTTPXRequest(connection_pool_size=64),
+                 rate_limiter=OutboundLimiter() if limited else None)
+    if not limited:
+        # what the bot did before: every call site retried flood waits itself
+        raw = bot._post
+        async def retrying(*a, **kw):
+            for attempt in range(4):
+                try: return await raw(*a, **kw)
+                except RetryAfter as e:
+                    if attempt == 3: raise
+                    await asyncio.sleep(e.retry_after + 0.5)
+        bot._post = retrying
+    await bot.initialize()
+    stop, taps = asyncio.Event(), []
+    t = time.perf_counter()
+    tapper = asyncio.create_task(tapping_user(bot, 999, stop, taps))
+    results = await asyncio.gather(*[split_user(bot, 1000 + i, args.files) for i in range(args.users)], return_exceptions=True)
+    wall = time.perf_counter() - t
+    stop.set()
+    failed = await tapper + sum(isinstance(r, Exception) for r in results)
+    await bot.shutdown(); await api.stop()
+
+    c429 = sum(1 for _, _, s in api.calls if s == 429)
+    edits = sum(1 for m, _, s in api.calls if m == "editMessageText" and s == 200)
+    taps.sort()
+    return {"wall": wall, "calls": len(api.calls), "429": c429, "edits": edits, "failed": failed,
+            "tap_p50": taps[len(taps) // 2], "tap_max": taps[-1]}
+
+
+async def main_async(args):
+    print(f"{args.users} chats x {args.files} files, mock limits {args.chat_rate:g}/s per chat, {args.global_rate:g}/s global")
+    print(f"{'limiter':<8} {'wall':>7} {'API calls':>10} {'429s':>6} {'edits':>6} {'failed':>7} {'tap p50':>8} {'tap max':>8}")
+    for limited in (False, True):
+        r = await run_load(limited, args)
+        print(f"{'on' if limited else 'off':<8} {r['wall']:>6.1f}s {r['calls']:>10} {r['429']:>6} {r['edits']:>6}"
+              f" {r['failed']:>7} {r['tap_p50']:>7.2f}s {r['tap_max']:>7.2f}s")
+
+
+async def serve(port, args):
+    api = MockTelegram(args.chat_rate, args.chat_burst, args.global_rate)
+    print(f"mock Bot API on {await api.start(port)} (token {TOKEN})")
+    await asyncio.Event().wait()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=10)
+    ap.add_argument("--files", type=int, default=20)
+    ap.add_argument("--chat-rate", type=float, default=1.0)
+    ap.add_argument("--chat-burst", type=float, default=5)
+    ap.add_argument("--global-rate", type=float, default=30.0)
+    ap.add_argument("--serve", type=int, metavar="PORT", help="only run the mock server")
+    args = ap.parse_args()
+    asyncio.run(serve(args.serve, args) if args.serve else main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Cold start benchmark: how long a fresh process takes to handle its first
+update, and which imports that time goes to.
+
+    python bench/startup.py               # 5 cold starts, top 15 imports
+    python bench/startup.py --runs 10 --top 30
+    python bench/startup.py --module bot_core
+
+Each run is a new interpreter that imports main and feeds one /start from
+the owner through main.start with the harness's fake Bot (no network, no
+database). "first update" is measured from just before the process is
+spawned, so it includes interpreter start. Import times come from
+python -X importtime: cumulative time of the module and of each package
+it imports directly.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = """
+import sys, time, json, asyncio
+t0 = time.perf_counter()
+sys.path[:0] = [{root!r}, {bench!r}]
+import {module}
+t1 = time.perf_counter()
+from harness import FakeBot, User
+import main
+async def first():
+    u = User(FakeBot(), 1)
+    await main.start(u._update(message=u._msg(text="/start", entities=[{{"type": "bot_command", "offset": 0, "length": 6}}])), u.ctx)
+asyncio.run(first())
+print(json.dumps({{"import": t1 - t0, "done": time.time()}}))
+"""
+
+
+def cold_start(module):
+    env = dict(os.environ, OWNER_ID="1")
+    t = time.time()
+    out = subprocess.run([sys.executable, "-c", CHILD.format(root=ROOT, bench=BENCH, module=module)],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    res = json.loads(out.strip().splitlines()[-1])
+    return res["import"], res["done"] - t
+
+
+def import_times(module):
+    """{package: cumulative seconds} for module and what it imports directly, in a fresh process."""
+    env = dict(os.environ, OWNER_ID="1")
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import sys; sys.path.insert(0, {ROOT!r}); import {module}"],
+                         env=env, capture_output=True, text=True, check=True).stderr
+    times = {}
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "|" not in line: continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit(): continue   # header
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth > 1 or "." in name: continue
+        times[name] = times.get(name, 0) + int(cumulative) / 1e6
+    return times
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--module", default="main", help="module whose import is timed")
+    args = ap.parse_args()
+
+    runs = sorted(cold_start(args.module) for _ in range(args.runs))
+    imports = sorted(r[0] for r in runs)
+    firsts = sorted(r[1] for r in runs)
+    print(f"import {args.module:<10} median {imports[len(imports) // 2]:.3f}s  best {imports[0]:.3f}s")
+    print(f"first update      median {firsts[len(firsts) // 2]:.3f}s  best {firsts[0]:.3f}s  ({args.runs} runs)")
+
+    print(f"\n{'module':<24} {'import':>8}")
+    for name, sec in sorted(import_times(args.module).items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{name:<24} {sec * 1000:>6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
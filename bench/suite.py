@@ -0,0 +1,240 @@
+"""
+Benchmark + regression suite for the bot_core processing functions.
+
+    python bench/suite.py                              # quick preset, print table
+    python bench/suite.py --preset full                # 10k / 100k / 1M
+    python bench/suite.py --save bench/baseline.json   # record a baseline
+    python bench/suite.py --compare bench/baseline.json  # exit 1 on regression
+
+Every case runs in a fresh process, so peak RSS belongs to that case alone;
+"in case" is how much the peak grew while the timed calls ran (inputs are
+generated in the same process before that). Wall time is the best of
+--repeat runs. Baselines are machine specific: record one on the machine
+that runs the comparison; --compare skips a baseline saved elsewhere.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen
+
+PRESETS = {"quick": [10_000], "full": [10_000, 100_000, 1_000_000]}
+# phonenumbers validation is ~10k numbers/s per core, keep it off the 1M size
+MAX_SIZE = {"analysis_report": 100_000, "detect_country": 100_000, "extract_xlsx": 200_000, "convert_all": 200_000}
+# timer noise: a case only regresses when it is also this much slower
+NOISE_SECONDS = 0.001
+
+
+def _file(tmp, name, writer, n):
+    path = os.path.join(tmp, name)
+    count = writer(path, n)
+    return path, count
+
+
+# each case: prepare(n, tmp) -> (callable, numbers handled)
+def case_extract_txt(n, tmp):
+    import bot_core
+    path, count = _file(tmp, "noisy.txt", datagen.write_noisy_txt, n)
+    return lambda: bot_core.extract_all_numbers(path), count
+
+
+def case_extract_vcf(n, tmp):
+    import bot_core
+    path, count = _file(tmp, "multi.vcf", datagen.write_multi_tel_vcf, n)
+    return lambda: bot_core.extract_all_numbers(path), count
+
+
+def case_extract_csv(n, tmp):
+    import bot_core
+    path, count = _file(tmp, "wide.csv", datagen.write_wide_csv, n)
+    return lambda: bot_core.extract_all_numbers(path), count
+
+
+def case_extract_xlsx(n, tmp):
+    import bot_core
+    path, count = _file(tmp, "wide.xlsx", datagen.write_wide_xlsx, n)
+    return lambda: bot_core.extract_all_numbers(path), count
+
+
+def case_detect_country(n, tmp):
+    import validation
+    nums = datagen.mixed_country_numbers(n)
+    def run():
+        # the bot only samples the first numbers; here all n, from cold caches
+        validation.lookup.cache_clear(); validation.geo_cache.data.clear()
+        return validation.primary_country(nums, sample=n)
+    return run, n
+
+
+def case_analysis_report(n, tmp):
+    import bot_core, validation
+    nums = datagen.mixed_country_numbers(n)
+    def run():
+        validation.lookup.cache_clear(); validation.geo_cache.data.clear()
+        return bot_core.generate_analysis_report("bench.txt", nums)
+    return run, n
+
+
+def case_make_vcf(n, tmp):
+    import bot_core
+    from normalize import normalize
+    cfg = dict(bot_core.DEFAULT_SETTINGS, country_code="+91", group_number="Team")
+    nums = normalize(datagen.mixed_country_numbers(n), cfg["country_code"])
+    return lambda: bot_core.make_vcf(nums, cfg, 0, custom_limit=n).discard(), n
+
+
+def case_normalize(n, tmp):
+    from normalize import e164_unique
+    from numset import NumberArray
+    nums = NumberArray.from_iter(datagen.mixed_country_numbers(n))
+    return lambda: e164_unique(nums, "+91"), n
+
+
+def case_chunk(n, tmp):
+    import bot_core
+    nums = datagen.mixed_country_numbers(n)
+    return lambda: sum(1 for _ in bot_core.chunk(nums, 100)), n
+
+
+def case_convert_all(n, tmp):
+    from converter import convert_numbers, FORMATS
+    from numset import NumberArray
+    nums = NumberArray.from_iter(datagen.mixed_country_numbers(n))
+    def run():
+        for b in convert_numbers(nums, "bench.txt", FORMATS): b.discard()
+    return run, n
+
+
+def case_rename_contacts(n, tmp):
+    from filestore import Blob
+    from vcf_rename import rename_file
+    path, _ = _file(tmp, "multi.vcf", datagen.write_multi_tel_vcf, n)
+    src = Blob("multi.vcf", path=path)
+    with open(path, "rb") as f: cards = f.read().count(b"BEGIN:VCARD")
+    return lambda: rename_file((src, "out.vcf", "Bench", 1)).discard(), cards
+
+
+def case_merge_txt(n, tmp):
+    import bot_core
+    from filestore import Blob
+    a, _ = _file(tmp, "a.txt", datagen.write_noisy_txt, n)
+    b = os.path.join(tmp, "b.txt")
+    datagen.write_noisy_txt(b, n, seed=9)
+    data = [open(p, "rb").read() for p in (a, b)]
+    def run():
+        # merge_files discards its inputs, hand it fresh in-memory blobs
+        blobs = [Blob(f"{i}.txt", data=d) for i, d in enumerate(data)]
+        out, _ = bot_core.merge_files(blobs, "txt", bot_core.DEFAULT_SETTINGS)
+        out.discard()
+    return run, 2 * n
+
+
+CASES = {name[5:]: fn for name, fn in globals().items() if name.startswith("case_")}
+
+
+def _peak_mb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def run_case(name, n, repeat):
+    """Runs in a child process. Returns a result dict."""
+    import numset, validation
+    numset.prewarm(); validation.prewarm()   # the bot loads these at startup (main.prewarm)
+    with tempfile.TemporaryDirectory() as tmp:
+        fn, count = CASES[name](n, tmp)
+        before = _peak_mb()
+        best = float("inf")
+        for _ in range(repeat):
+            t = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t)
+        return {"seconds": round(best, 5), "numbers_per_sec": round(count / best) if best else 0,
+                "peak_rss_mb": round(_peak_mb(), 1), "rss_growth_mb": round(_peak_mb() - before, 1)}
+
+
+def run_suite(cases, sizes, repeat):
+    results = {}
+    for name in cases:
+        for n in sizes:
+            if n > MAX_SIZE.get(name, n): continue
+            with ProcessPoolExecutor(1) as pool:
+                res = pool.submit(run_case, name, n, repeat).result()
+            results[f"{name}@{n}"] = res
+            print(f"{name + '@' + str(n):<28} {res['seconds']:>9.4f}s {res['numbers_per_sec']:>12,}/s"
+                  f" {res['peak_rss_mb']:>8.1f} MB {res['rss_growth_mb']:>+8.1f} MB", flush=True)
+    return results
+
+
+def compare(results, baseline, time_tol, rss_tol):
+    """Returns the list of regressions (cases slower / fatter than allowed)."""
+    bad = []
+    for key, res in results.items():
+        base = baseline.get(key)
+        if base is None: continue
+        if res["seconds"] > base["seconds"] * (1 + time_tol) and res["seconds"] - base["seconds"] > NOISE_SECONDS:
+            bad.append(f"{key}: {base['seconds']:.4f}s -> {res['seconds']:.4f}s")
+        if res["rss_growth_mb"] > base["rss_growth_mb"] * (1 + rss_tol) + 10:
+            bad.append(f"{key}: memory {base['rss_growth_mb']:+.0f} -> {res['rss_growth_mb']:+.0f} MB")
+    return bad
+
+
+def machine():
+    """Host, CPU model and core count, Python version: what a baseline is only valid for."""
+    cpu = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu = next((l.split(":", 1)[1].strip() for l in f if l.startswith("model name")), cpu)
+    except OSError:
+        pass
+    return f"{platform.node()} {cpu} x{os.cpu_count()} python {platform.python_version()}"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--preset", choices=PRESETS, default="quick")
+    ap.add_argument("--sizes", type=int, nargs="*")
+    ap.add_argument("--cases", nargs="*", choices=sorted(CASES), default=sorted(CASES))
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--save", help="write results as a baseline file")
+    ap.add_argument("--compare", help="baseline file to check against")
+    ap.add_argument("--any-machine", action="store_true", help="compare with a baseline from another machine anyway")
+    ap.add_argument("--time-tolerance", type=float, default=0.30)
+    ap.add_argument("--rss-tolerance", type=float, default=0.25)
+    args = ap.parse_args()
+
+    sizes = args.sizes or PRESETS[args.preset]
+    print(f"{'case':<28} {'wall':>10} {'numbers':>14} {'peak RSS':>11} {'in case':>11}")
+    results = run_suite(args.cases, sizes, args.repeat)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"machine": machine(), "results": results}, f, indent=1, sort_keys=True)
+        print(f"baseline saved to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            saved = json.load(f)
+        if saved.get("machine") != machine() and not args.any_machine:
+            # timings from another machine say nothing about this change
+            print(f"\n{args.compare} was recorded on {saved.get('machine')!r}, this is {machine()!r}:"
+                  f" not compared. Record a baseline here first (--save), or pass --any-machine.")
+            return
+        bad = compare(results, saved["results"], args.time_tolerance, args.rss_tolerance)
+        if bad:
+            print("\nREGRESSIONS:\n  " + "\n  ".join(bad))
+            sys.exit(1)
+        print("\nno regressions against", args.compare)
+
+
+if __name__ == "__main__":
+    main()
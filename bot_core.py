@@ -1,9 +1,25 @@
 import os
 import re
-import pandas as pd
-import phonenumbers
 import asyncio
-from phonenumbers import geocoder, carrier
+from extractor import collect_numbers
+from converter import convert_numbers, FORMATS
+from merger import merge_stream, format_merge_stats
+from numset import NumberArray
+from normalize import e164_unique, NON_DIGIT_RE
+from vcf_index import VCFIndex, parse_targets
+from jobs import executor as jobs, cancellable
+import jobqueue
+from vcf_writer import write_vcards, cfg_parts
+from filestore import BlobWriter, download
+from resultcache import results, sha256
+from sessions import hub as sessions
+from delivery import deliver_chunks, send_group, zip_blobs, join_blobs, ZIP_SUGGEST_FILES
+from vcf_rename import rename_file, count_cards
+import namegen
+import validation
+import metrics
+import progress
+from progress import Progress
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ParseMode
 from telegram.ext import (
@@ -26,14 +42,16 @@ DEFAULT_SETTINGS = {
     "group_number": None,
 }
 
-user_settings = {}
-user_state = {}
-merge_queue = {}
-split_queue = {}
-rename_queue = {}
-quick_vcf_data = {}
-vcf_editor_data = {}
-convert_queue = {}
+# per-user data lives in the session store (TTL + memory cap, optional
+# SQLite/Postgres backend), see sessions.py
+user_settings = sessions.namespace("settings")
+user_state = sessions.namespace("state")
+merge_queue = sessions.namespace("merge")
+split_queue = sessions.namespace("split")
+rename_queue = sessions.namespace("rename")
+quick_vcf_data = sessions.namespace("quick_vcf")
+vcf_editor_data = sessions.namespace("editor")
+convert_queue = sessions.namespace("convert")
 
 def settings(uid):
     user_settings.setdefault(uid, DEFAULT_SETTINGS.copy())
@@ -43,86 +61,25 @@ def state(uid):
     user_state.setdefault(uid, {"mode": None, "step": None})
     return user_state[uid]
 
-# ================= HELPERS & ANIMATION =================
-
-async def progress_bar(msg, text):
-    """
-    Displays a percentage based loading animation.
-    Speed increased significantly.
-    """
-    stages = [
-        (20, "■■□□□□□□□□"),
-        (50, "■■■■■□□□□□"),
-        (80, "■■■■■■■■□□"),
-        (100, "■■■■■■■■■■")
-    ]
-
-    for percent, bar in stages:
-        try:
-            await msg.edit_text(
-                f"⏳ **{text}...**\n\n"
-                f"`[{bar}] {percent}%`",
-                parse_mode=ParseMode.MARKDOWN
-            )
-            await asyncio.sleep(0.1) # FAST SPEED (Reduced from 0.4)
-        except:
-            pass
-
-def extract_all_numbers(path):
-    ext = os.path.splitext(path)[1].lower()
-    nums = []
+# ================= HELPERS =================
+
+def extract_all_numbers(src):
     try:
-        if ext == ".vcf":
-            with open(path, "r", errors="ignore") as f:
-                for line in f:
-                    if line.startswith("TEL"):
-                        n = re.sub(r"[^\d+]", "", line)
-                        if len(n) >= 7: nums.append(n)
-        elif ext in [".xlsx", ".xls"]:
-            df = pd.read_excel(path, dtype=str)
-            text_data = " ".join(df.values.flatten().astype(str))
-            nums = re.findall(r"\+?\d{7,}", text_data)
-        elif ext == ".csv":
-            df = pd.read_csv(path, dtype=str)
-            text_data = " ".join(df.values.flatten().astype(str))
-            nums = re.findall(r"\+?\d{7,}", text_data)
-        else:
-            with open(path, "r", errors="ignore") as f:
-                nums = re.findall(r"\+?\d{7,}", f.read())
+        return collect_numbers(src).dedupe()
     except Exception as e:
         print(f"Error extracting: {e}")
-        return []
-    return list(dict.fromkeys(nums))
+        return NumberArray()
 
 def detect_primary_country(numbers):
-    countries = {}
-    for n in numbers[:50]:
-        try:
-            parse_num = "+" + n if not n.startswith("+") else n
-            pn = phonenumbers.parse(parse_num, None)
-            region = geocoder.description_for_number(pn, "en")
-            if region: countries[region] = countries.get(region, 0) + 1
-        except: continue
-    if countries: return max(countries, key=countries.get)
-    return "Unknown"
+    return validation.primary_country(numbers)
 
 def generate_analysis_report(file_name, numbers):
-    total = len(numbers)
-    unique_set = set(numbers)
-    unique_count = len(unique_set)
-    duplicates = total - unique_count
+    unique = set(numbers)
+    stats, invalid_count = validation.tally(unique)
+    return format_report(file_name, len(numbers), len(unique), stats, invalid_count)
 
-    country_stats = {}
-    invalid_count = 0
-    for n in unique_set:
-        try:
-            parse_num = "+" + n if not n.startswith("+") else n
-            pn = phonenumbers.parse(parse_num, None)
-            if phonenumbers.is_valid_number(pn):
-                region = geocoder.description_for_number(pn, "en") or "Unknown"
-                country_stats[region] = country_stats.get(region, 0) + 1
-            else: invalid_count += 1
-        except: invalid_count += 1
+def format_report(file_name, total, unique_count, country_stats, invalid_count):
+    duplicates = total - unique_count
 
     country_text = "\n".join([f"  └ {c}: {count}" for c, count in country_stats.items()])
     if not country_text: country_text = "  └ None detected"
@@ -143,6 +100,20 @@ def generate_analysis_report(file_name, numbers):
     )
     return report
 
+async def analyse_parallel(uid, file_name, numbers, on_progress=None, key=None):
+    """Validation split over the worker pool in ANALYSIS_CHUNK sized pieces.
+    With a result cache key the counts of a file analysed before are reused."""
+    counts = key and await asyncio.to_thread(results.get, key, "report")
+    if not counts:
+        unique = numbers.dedupe() if isinstance(numbers, NumberArray) else list(dict.fromkeys(numbers))
+        with metrics.timed("validate", numbers=len(unique)):
+            parts = await jobs.run_chunks(uid, validation.tally, list(chunk(unique, validation.ANALYSIS_CHUNK)),
+                                          on_progress=on_progress)
+        stats, invalid_count = validation.merge_tallies(parts)
+        counts = (len(numbers), len(unique), stats, invalid_count)
+        if key: await asyncio.to_thread(results.put, key, "report", counts)
+    return format_report(file_name, *counts)
+
 def chunk(lst, n):
     for i in range(0, len(lst), n):
         yield lst[i:i+n]
@@ -150,18 +121,260 @@ def chunk(lst, n):
 def make_vcf(numbers, cfg, index, custom_limit=None):
     limit = custom_limit if custom_limit else cfg["limit"]
     start = cfg["contact_start"] + index * limit
-    out = ""
-    for i, n in enumerate(numbers, start=start):
-        name = f"{cfg['contact_name']}{str(i).zfill(3)}"
-        if cfg.get("group_number"): name += f" ({cfg['group_number']})"
-        clean_n = n.replace("+", "")
-        prefix = cfg["country_code"] if cfg["country_code"] else "+"
-        final_num = f"{prefix}{clean_n}"
-        out += f"BEGIN:VCARD\nVERSION:3.0\nFN:{name}\nTEL;TYPE=CELL:{final_num}\nEND:VCARD\n"
-
+    name, suffix = cfg_parts(cfg)
     fname = f"{cfg['file_name']}_{cfg['vcf_start'] + index}.vcf"
-    with open(fname, "w", encoding="utf-8") as f: f.write(out)
-    return fname
+    with BlobWriter(fname) as f: write_vcards(f, numbers, name, start, suffix)
+    return f.close()
+
+async def send_blob(message, blob, **kwargs):
+    with metrics.timed("upload", nbytes=blob.size):
+        return await message.reply_document(await blob.aread(), filename=blob.name, **kwargs)
+
+async def extract(uid, src, on_progress=None):
+    """extract_all_numbers in the job pool, timed as the parse stage."""
+    with metrics.timed("parse", nbytes=src.size):
+        nums = await jobs.run(uid, extract_all_numbers, src, on_progress=on_progress)
+    metrics.add("parse", numbers=len(nums))
+    return nums
+
+async def upload_numbers(uid, bot, doc, on_progress=None, country_code=""):
+    """Numbers in an uploaded document, canonical E.164 with country_code
+    applied -> (nums, cache key). A file seen before (same file_unique_id or
+    same bytes) comes from the result cache; the download is skipped entirely
+    when the file_unique_id is known. The raw tokens are cached, and each
+    country code's E.164 numbers apart, all made from those tokens."""
+    kind = "e164" + NON_DIGIT_RE.sub("", country_code or "")
+    key = results.key_for(doc.file_unique_id)
+    nums = key and await asyncio.to_thread(results.get, key, kind)
+    if nums is not None: return nums, key
+
+    tokens = key and await asyncio.to_thread(results.get, key, "tokens")
+    if tokens is None:
+        src = await download(bot, doc)
+        try:
+            key = await asyncio.to_thread(sha256, src)
+            results.link(doc.file_unique_id, key)
+            nums = await asyncio.to_thread(results.get, key, kind)
+            if nums is not None: return nums, key
+            tokens = await asyncio.to_thread(results.get, key, "tokens")
+            if tokens is None:
+                tokens = await extract(uid, src, on_progress=on_progress)
+                await asyncio.to_thread(results.put, key, "tokens", tokens)
+        finally:
+            src.discard()
+    nums = await jobs.run(uid, e164_unique, tokens, country_code, cpu=False)
+    await asyncio.to_thread(results.put, key, kind, nums)
+    return nums, key
+
+# ================= JOBS (run in worker pool) =================
+
+def merge_files(blobs, fmt, cfg):
+    """Streams all inputs into one deduped file. Returns (blob, per-file stats)."""
+    if fmt == "vcf":
+        name, suffix = cfg_parts(cfg)
+        out = BlobWriter(f"{cfg['file_name']}_{cfg['vcf_start']}.vcf")
+        pos = [cfg["contact_start"]]
+        def emit(nums):
+            pos[0] += write_vcards(out, nums, name, pos[0], suffix)
+    else:
+        out, pos = BlobWriter("Merged_File.txt"), [0]
+        def emit(nums):
+            sep = "\n" if pos[0] else ""
+            out.write((sep + "\n".join("+" + n for n in nums)).encode())
+            pos[0] += len(nums)
+
+    with out:
+        try: stats = merge_stream(blobs, emit, country_code=cfg["country_code"])
+        finally:
+            for b in blobs: b.discard()
+    return out.close(), stats
+
+def build_quick_vcf(f_name, entries):
+    total_nums = 0
+    with BlobWriter(f"{f_name}.vcf") as x:
+        for entry in entries:
+            total_nums += write_vcards(x, entry['nums'], entry['contact'])
+    return x.close(), total_nums
+
+def build_vcf_index(src):
+    return VCFIndex.build(src.read())
+
+def apply_vcf_edits(src, index):
+    with BlobWriter(src.name) as f: index.write(src.read(), f)
+    return f.close()
+
+def render_chunk(item):
+    numbers, cfg, index, limit = item
+    return make_vcf(numbers, cfg, index, custom_limit=limit)
+
+def split_zip(nums, cfg, limit):
+    total = -(-len(nums) // limit)
+    def files():
+        for i, p in enumerate(chunk(nums, limit)):
+            yield make_vcf(p, cfg, i, custom_limit=limit)
+            progress.report((i + 1) / total)
+    return zip_blobs(f"{cfg['file_name']}.zip", files())
+
+# ================= FLOWS =================
+# The heavy flows as coroutines on (message, uid, ...). Handlers start them
+# through dispatch(): here, or on a queue worker when JOB_QUEUE is set (see
+# jobqueue.py), so a flow gets everything it needs as arguments (Telegram
+# documents, a copy of the settings) and only talks to `message`'s chat.
+
+async def dispatch(message, uid, flow, **kw):
+    """Runs a flow in this process, or queues it. Returns its result (None if queued)."""
+    if not jobqueue.enabled(): return await flow(message, uid, **kw)
+    _, ahead = await jobqueue.submit(flow, message, uid, **kw)
+    if ahead: await message.reply_text(f"📥 **Queued.** {ahead} job(s) ahead of yours, the result will come here.", parse_mode=ParseMode.MARKDOWN)
+
+@jobqueue.task("analysis")
+async def analysis_flow(message, uid, doc):
+    async with Progress(message, "Scanning File") as p:
+        nums, key = await upload_numbers(uid, message.get_bot(), doc, on_progress=p.part(0, 0.4))
+        report = await analyse_parallel(uid, doc.file_name or "file", nums, on_progress=p.part(0.4, 1), key=key)
+    await message.reply_text(report, parse_mode=ParseMode.MARKDOWN, reply_markup=main_menu())
+
+@jobqueue.task("convert")
+async def convert_flow(message, uid, doc, target_fmt):
+    try:
+        async with Progress(message, "Converting File") as p:
+            nums, _ = await upload_numbers(uid, message.get_bot(), doc, on_progress=p.part(0, 0.7))
+            formats = list(FORMATS) if target_fmt == "all" else [target_fmt]
+            with metrics.timed("render", numbers=len(nums)):
+                outs = await jobs.run(uid, convert_numbers, nums, doc.file_name or "file", formats, on_progress=p.part(0.7, 1))
+
+        try:
+            if len(outs) == 1:
+                await send_blob(message, outs[0], caption=f"✅ **Conversion Successful!**", parse_mode=ParseMode.MARKDOWN)
+            else:
+                await send_group(message, outs)
+                await message.reply_text(f"✅ **Conversion Successful!** ({len(outs)} formats)", parse_mode=ParseMode.MARKDOWN)
+        finally:
+            for b in outs: b.discard()
+        await message.reply_text("🔄 Would you like to convert another file?", reply_markup=main_menu())
+    except Exception as e:
+        await message.reply_text(f"❌ Error Occurred: {e}", reply_markup=main_menu())
+
+@jobqueue.task("split_count")
+async def split_count_flow(message, uid, doc, country_code=""):
+    async with Progress(message, "Reading File") as p:
+        nums, _ = await upload_numbers(uid, message.get_bot(), doc, on_progress=p.update, country_code=country_code)
+    await message.reply_text(f"📊 Found **{len(nums)}** numbers.\nEnter limit per file:", parse_mode=ParseMode.MARKDOWN, reply_markup=cancel_kb())
+    return len(nums)
+
+@jobqueue.task("split")
+async def split_flow(message, uid, doc, cfg, limit, as_zip=False):
+    # the numbers are normally still in the result cache from split_count
+    async with Progress(message, "Splitting Files") as p:
+        nums, _ = await upload_numbers(uid, message.get_bot(), doc, on_progress=p.part(0, 0.1), country_code=cfg["country_code"])
+        if as_zip:
+            with metrics.timed("render", numbers=len(nums)):
+                out = await jobs.run(uid, split_zip, nums, cfg, limit, on_progress=p.part(0.1, 1))
+            await send_blob(message, out); out.discard()
+        else:
+            items = [(c, cfg, i, limit) for i, c in enumerate(chunk(nums, limit))]
+            await deliver_chunks(jobs, uid, message, render_chunk, items, on_progress=p.part(0.1, 1))
+    await message.reply_text("✅ **Splitting Completed.**", reply_markup=main_menu(), parse_mode=ParseMode.MARKDOWN)
+
+@jobqueue.task("gen")
+async def gen_flow(message, uid, doc, cfg):
+    async with Progress(message, "Generating Files") as p:
+        nums, _ = await upload_numbers(uid, message.get_bot(), doc, on_progress=p.part(0, 0.3), country_code=cfg["country_code"])
+        detected_country = "Manual"
+        if not cfg["country_code"]: detected_country = detect_primary_country(nums)
+
+        items = [(c, cfg, i, cfg["limit"]) for i, c in enumerate(chunk(nums, cfg["limit"]))]
+        n_files = await deliver_chunks(jobs, uid, message, render_chunk, items, on_progress=p.part(0.3, 1))
+
+    summary = (
+        f"✅ **GENERATION COMPLETE**\n"
+        f"━━━━━━━━━━━━━━━━━━\n"
+        f"📂 File Name: `{cfg['file_name']}`\n"
+        f"🔢 Total: `{len(nums)}` | 📁 Files: `{n_files}`\n"
+        f"🌍 Detect: `{detected_country}`\n"
+    )
+    await message.reply_text(summary, parse_mode=ParseMode.MARKDOWN, reply_markup=main_menu())
+
+@jobqueue.task("merge")
+async def merge_flow(message, uid, docs, fmt, cfg):
+    try:
+        async with Progress(message, "Merging Files") as p:
+            blobs = []
+            try:
+                for d in docs: blobs.append(await download(message.get_bot(), d))
+            except BaseException:
+                for b in blobs: b.discard()
+                raise
+            out_f, stats = await jobs.run(uid, merge_files, blobs, fmt, cfg, on_progress=p.update)
+
+        await send_blob(message, out_f, caption="✅ **Merge Successful!**", parse_mode=ParseMode.MARKDOWN)
+        out_f.discard()
+        await message.reply_text(format_merge_stats(stats), parse_mode=ParseMode.MARKDOWN)
+        await message.reply_text("🏠 Main Menu:", reply_markup=main_menu())
+    except Exception as e:
+        await message.reply_text(f"❌ Error: {e}", reply_markup=main_menu())
+
+async def split_count(uid):
+    """Numbers in the queued split file, None while a queue worker is still
+    reading it. Raises LookupError when the split is gone (session expired
+    or the count job failed)."""
+    sq = split_queue.get(uid)
+    if sq is None: raise LookupError("Session expired. Please upload the file again.")
+    if "count" not in sq and "job" in sq:
+        status, res = await jobqueue.result(sq["job"])
+        if status == "done": sq["count"] = res
+        elif status in ("failed", None):
+            split_queue.pop(uid, None)
+            raise LookupError(f"Could not read your file: {res or 'job lost'}")
+    return sq.get("count")
+
+def names_view(base, count, page):
+    return f"📝 **GENERATED LIST** ({page + 1}/{namegen.pages(count)}):\n\n```\n{namegen.name_page(base, count, page)}\n```"
+
+def names_kb(count, page):
+    nav = []
+    if page > 0: nav.append(InlineKeyboardButton("⬅️ PREV", callback_data=f"ng_page_{page - 1}"))
+    if page + 1 < namegen.pages(count): nav.append(InlineKeyboardButton("NEXT ➡️", callback_data=f"ng_page_{page + 1}"))
+    return InlineKeyboardMarkup([nav, [InlineKeyboardButton("📄 AS FILE", callback_data="ng_file"), InlineKeyboardButton("🏠 MENU", callback_data="main_menu")]])
+
+async def send_names(message, uid, base, count):
+    async with Progress(message, "Generating Names") as p:
+        out = await jobs.run(uid, namegen.write_names, base, count, on_progress=p.update)
+    await send_blob(message, out, caption=f"✅ **{count:,}** names.", parse_mode=ParseMode.MARKDOWN)
+    out.discard()
+
+async def run_rename_contacts(message, uid, new_name, as_vcf=False):
+    """RENAME CONTACT over every queued file at once: one file back as is,
+    several as one zip, or (as_vcf) one VCF numbered across all of them."""
+    files = rename_queue.pop(uid, [])
+    state(uid).clear()
+    try:
+        async with Progress(message, "Renaming Contacts") as p:
+            starts = [1] * len(files)
+            if as_vcf:
+                counts = await jobs.run_chunks(uid, count_cards, files)
+                starts = [1 + sum(counts[:i]) for i in range(len(files))]
+            names, items = set(), []
+            for f, start in zip(files, starts):
+                base, ext = os.path.splitext(f.name)
+                name, k = f.name, 1
+                while name in names: k += 1; name = f"{base}_{k}{ext}"
+                names.add(name); items.append((f, name, new_name, start))
+            outs = await jobs.run_chunks(uid, rename_file, items, on_progress=p.part(0, 0.8))
+            if len(outs) > 1:
+                pack = join_blobs if as_vcf else zip_blobs
+                outs = [await jobs.run(uid, pack, f"{new_name}.{'vcf' if as_vcf else 'zip'}", outs, cpu=False)]
+        await send_blob(message, outs[0], caption=f"✅ **Renamed {len(files)} file(s).**", parse_mode=ParseMode.MARKDOWN)
+        outs[0].discard()
+    finally:
+        for f in files: f.discard()
+    await message.reply_text("✅ **Rename Complete.**", reply_markup=main_menu(), parse_mode=ParseMode.MARKDOWN)
+
+async def run_split(message, uid, limit, as_zip=False):
+    st, cfg = state(uid), settings(uid)
+    doc = split_queue.pop(uid)["doc"]
+    st.clear()
+    await dispatch(message, uid, split_flow, doc=doc, cfg=dict(cfg), limit=limit, as_zip=as_zip)
 
 # ================= UI & MENUS =================
 
@@ -204,6 +417,7 @@ def convert_kb():
     return InlineKeyboardMarkup([
         [InlineKeyboardButton("📝 TO TXT", callback_data="cv_txt"), InlineKeyboardButton("📇 TO VCF", callback_data="cv_vcf")],
         [InlineKeyboardButton("📊 TO CSV", callback_data="cv_csv"), InlineKeyboardButton("📑 TO XLSX", callback_data="cv_xlsx")],
+        [InlineKeyboardButton("📦 ALL FORMATS", callback_data="cv_all")],
         [InlineKeyboardButton("❌ CANCEL", callback_data="main_menu")]
     ])
 
@@ -251,6 +465,8 @@ async def start(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     )
     await update.message.reply_text(text, reply_markup=main_menu(), parse_mode=ParseMode.MARKDOWN)
 
+@cancellable
+@sessions.persist
 async def buttons(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
     await q.answer()
@@ -258,6 +474,7 @@ async def buttons(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     st, cfg = state(uid), settings(uid)
 
     if q.data == "main_menu":
+        jobs.cancel(uid); await jobqueue.cancel(uid)
         st.clear()
         if uid in merge_queue: merge_queue.pop(uid)
         await q.message.edit_text("🤖 **MAIN MENU**\nSelect an option to proceed:", reply_markup=main_menu(), parse_mode=ParseMode.MARKDOWN)
@@ -274,40 +491,10 @@ async def buttons(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
     elif q.data.startswith("cv_"):
         target_fmt = q.data.split("_")[1]
-        path = convert_queue.get(uid)
-        if not path: return await q.message.reply_text("❌ Session expired. Please upload the file again.", reply_markup=main_menu())
-
-        # ANIMATION
-        proc_msg = await q.message.edit_text("⏳ **Initializing Conversion...**", parse_mode=ParseMode.MARKDOWN)
-        await progress_bar(proc_msg, "Converting File")
-
-        try:
-            nums = extract_all_numbers(path)
-            out_file = f"Converted_{os.path.basename(path).split('.')[0]}.{target_fmt}"
-
-            if target_fmt == "vcf":
-                temp_cfg = DEFAULT_SETTINGS.copy()
-                temp_cfg["file_name"] = "Converted"
-                out_file = make_vcf(nums, temp_cfg, 0, custom_limit=len(nums))
-            elif target_fmt == "txt":
-                formatted = ["+" + n.replace("+","") for n in nums]
-                with open(out_file, "w") as f: f.write("\n".join(formatted))
-            elif target_fmt == "csv":
-                formatted = ["+" + n.replace("+","") for n in nums]
-                df = pd.DataFrame(formatted, columns=["Mobile Number"])
-                df.to_csv(out_file, index=False)
-            elif target_fmt == "xlsx":
-                formatted = ["+" + n.replace("+","") for n in nums]
-                df = pd.DataFrame(formatted, columns=["Mobile Number"])
-                df.to_excel(out_file, index=False)
-
-            await proc_msg.delete()
-            await q.message.reply_document(open(out_file, "rb"), caption=f"✅ **Conversion Successful!**", parse_mode=ParseMode.MARKDOWN)
-            os.remove(out_file); os.remove(path); st.clear()
-            await q.message.reply_text("🔄 Would you like to convert another file?", reply_markup=main_menu())
-        except Exception as e:
-            await proc_msg.delete()
-            await q.message.reply_text(f"❌ Error Occurred: {e}", reply_markup=main_menu())
+        doc = convert_queue.pop(uid, None)
+        if not doc: return await q.message.reply_text("❌ Session expired. Please upload the file again.", reply_markup=main_menu())
+        await q.message.edit_reply_markup(None); st.clear()
+        await dispatch(q.message, uid, convert_flow, doc=doc, target_fmt=target_fmt)
 
     # --- Quick VCF ---
     elif q.data == "quick_vcf":
@@ -322,24 +509,10 @@ async def buttons(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     elif q.data == "finish_quick":
         f_name = st.get("file", "QuickVCF")
 
-        proc_msg = await q.message.reply_text("⏳ **Preparing...**", parse_mode=ParseMode.MARKDOWN)
-        await progress_bar(proc_msg, "Generating VCF")
-
-        out = ""
-        total_nums = 0
-        for entry in quick_vcf_data[uid]:
-            c_name = entry['contact']
-            for i, n in enumerate(entry['nums'], start=1):
-                clean_n = "+" + n.replace("+", "")
-                out += f"BEGIN:VCARD\nVERSION:3.0\nFN:{c_name}{str(i).zfill(3)}\nTEL;TYPE=CELL:{clean_n}\nEND:VCARD\n"
-                total_nums += 1
-
-        path = f"{f_name}.vcf"
-        with open(path, "w", encoding="utf-8") as x: x.write(out)
+        out, total_nums = await jobs.run(uid, build_quick_vcf, f_name, quick_vcf_data[uid], cpu=False)
 
-        await proc_msg.delete()
-        await q.message.reply_document(open(path, "rb"), caption=f"✅ **Task Completed!**\nTotal Contacts: {total_nums}", parse_mode=ParseMode.MARKDOWN)
-        os.remove(path); st.clear(); quick_vcf_data.pop(uid, None)
+        await send_blob(q.message, out, caption=f"✅ **Task Completed!**\nTotal Contacts: {total_nums}", parse_mode=ParseMode.MARKDOWN)
+        out.discard(); st.clear(); quick_vcf_data.pop(uid, None)
         await q.message.reply_text("🏠 Return to Menu:", reply_markup=main_menu())
 
     # --- VCF Editor ---
@@ -350,7 +523,7 @@ async def buttons(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     elif q.data.startswith("edit_"):
         action = q.data.split("_")[1]
         st["step"] = f"do_{action}"
-        msg = "✍️ **Please send the Numbers to ADD:**" if action == "add" else "🗑️ **Please send the Number to REMOVE:**"
+        msg = "✍️ **Please send the Numbers to ADD:**" if action == "add" else "🗑️ **Please send the Numbers to REMOVE** (one per line):"
         await q.message.edit_text(msg, parse_mode=ParseMode.MARKDOWN, reply_markup=cancel_kb())
 
     # --- Generation Flow ---
@@ -375,6 +548,17 @@ async def buttons(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         st.update({"mode": "name_gen", "step": "name"})
         await q.message.edit_text("📝 **NAME GENERATOR**\n\n✏️ Enter the Base Name (e.g. `Client`):", reply_markup=cancel_kb(), parse_mode=ParseMode.MARKDOWN)
 
+    elif q.data.startswith("ng_"):
+        if st.get("mode") != "name_gen" or "count" not in st:
+            return await q.message.reply_text("❌ Session expired. Please start again.", reply_markup=main_menu())
+        base, count = st["base_name"], st["count"]
+        if q.data == "ng_file":
+            await q.message.edit_reply_markup(None)
+            await send_names(q.message, uid, base, count)
+            st.clear(); return await q.message.reply_text("✅ **Task Done.**", reply_markup=main_menu(), parse_mode=ParseMode.MARKDOWN)
+        page = int(q.data[8:])
+        await q.message.edit_text(names_view(base, count, page), reply_markup=names_kb(count, page), parse_mode=ParseMode.MARKDOWN)
+
     # --- Universal Handlers ---
     elif q.data in ["split_vcf", "merge", "rename_files", "rename_contacts", "mysettings", "reset"]:
         if q.data == "merge": merge_queue[uid] = []
@@ -398,34 +582,27 @@ async def buttons(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
             }
             await q.message.edit_text(prompts.get(q.data, "Send File:"), reply_markup=cancel_kb(), parse_mode=ParseMode.MARKDOWN)
 
-    elif q.data.startswith("merge_as_"):
-        fmt = q.data.split("_")[-1]
-
-        proc_msg = await q.message.reply_text("⏳ **Initializing...**", parse_mode=ParseMode.MARKDOWN)
-        await progress_bar(proc_msg, "Merging Files")
+    elif q.data in ["split_zip", "split_files"]:
+        if uid not in split_queue or "limit" not in st:
+            return await q.message.reply_text("❌ Session expired. Please upload the file again.", reply_markup=main_menu())
+        await q.message.edit_reply_markup(None)
+        await run_split(q.message, uid, st["limit"], as_zip=q.data == "split_zip")
 
-        try:
-            nums = []
-            for f in merge_queue[uid]:
-                nums.extend(extract_all_numbers(f))
-                if os.path.exists(f): os.remove(f)
-            nums = list(dict.fromkeys(nums))
-
-            f_name = "Merged_File"
-            if fmt == "vcf":
-                out_f = make_vcf(nums, cfg, 0, custom_limit=len(nums))
-            else:
-                out_f = f"{f_name}.txt"
-                with open(out_f, "w") as x: x.write("\n".join(["+"+n.replace("+","") for n in nums]))
+    elif q.data in ["rename_zip", "rename_vcf"]:
+        if not rename_queue.get(uid) or "new_name" not in st:
+            return await q.message.reply_text("❌ Session expired. Please upload the files again.", reply_markup=main_menu())
+        await q.message.edit_reply_markup(None)
+        await run_rename_contacts(q.message, uid, st["new_name"], as_vcf=q.data == "rename_vcf")
 
-            await proc_msg.delete()
-            await q.message.reply_document(open(out_f, "rb"), caption="✅ **Merge Successful!**", parse_mode=ParseMode.MARKDOWN)
-            os.remove(out_f); st.clear()
-            await q.message.reply_text("🏠 Main Menu:", reply_markup=main_menu())
-        except Exception as e:
-            await proc_msg.delete()
-            await q.message.reply_text(f"❌ Error: {e}", reply_markup=main_menu())
+    elif q.data.startswith("merge_as_"):
+        fmt = q.data.split("_")[-1]
+        docs = merge_queue.pop(uid, [])
+        if not docs: return await q.message.reply_text("❌ No files to merge.", reply_markup=main_menu())
+        st.clear()
+        await dispatch(q.message, uid, merge_flow, docs=docs, fmt=fmt, cfg=dict(cfg))
 
+@cancellable
+@sessions.persist
 async def handle_text(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     uid = update.effective_user.id
     st, cfg, txt = state(uid), settings(uid), update.message.text.strip()
@@ -454,20 +631,22 @@ async def handle_text(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
             cfg["group_number"] = txt; await show_summary(update.message, cfg)
 
     elif st["mode"] == "split" and st["step"] == "limit":
-        if txt.isdigit():
+        if txt.isdigit() and int(txt) > 0:
             limit = int(txt)
-            nums, path = split_queue[uid]["nums"], split_queue[uid]["file"]
-
-            proc_msg = await update.message.reply_text(f"⏳ **Starting...**", parse_mode=ParseMode.MARKDOWN)
-            await progress_bar(proc_msg, "Splitting Files")
-
-            for i, p in enumerate(chunk(nums, limit)):
-                f = make_vcf(p, cfg, i, custom_limit=limit)
-                await update.message.reply_document(open(f, "rb")); os.remove(f)
-            if os.path.exists(path): os.remove(path)
-
-            await proc_msg.delete()
-            st.clear(); await update.message.reply_text("✅ **Splitting Completed.**", reply_markup=main_menu(), parse_mode=ParseMode.MARKDOWN)
+            try: count = await split_count(uid)
+            except LookupError as e:
+                st.clear()
+                return await update.message.reply_text(f"❌ {e}", reply_markup=main_menu())
+            if count is None: return await update.message.reply_text("⏳ Still reading your file, send the limit again in a moment.")
+            n_files = -(-count // limit)
+            if n_files > ZIP_SUGGEST_FILES:
+                st["limit"] = limit; st["step"] = "format"
+                kb = InlineKeyboardMarkup([
+                    [InlineKeyboardButton("📦 ONE ZIP", callback_data="split_zip"), InlineKeyboardButton("📄 SEPARATE FILES", callback_data="split_files")],
+                    [InlineKeyboardButton("❌ CANCEL", callback_data="main_menu")]
+                ])
+                return await update.message.reply_text(f"📦 This makes **{n_files}** files. How should I send them?", reply_markup=kb, parse_mode=ParseMode.MARKDOWN)
+            await run_split(update.message, uid, limit)
 
     elif st["mode"] == "merge" and txt.lower() == "done":
         kb = InlineKeyboardMarkup([
@@ -483,149 +662,116 @@ async def handle_text(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         st["contact"] = txt; st["step"] = "numbers"
         await update.message.reply_text(f"📤 Paste Numbers for **'{txt}'**:", parse_mode=ParseMode.MARKDOWN, reply_markup=cancel_kb())
     elif st["mode"] == "quick" and st["step"] == "numbers":
-        raw_nums = re.findall(r"\d{7,}", txt)
-        quick_vcf_data[uid].append({"contact": st["contact"], "nums": list(set(raw_nums))})
-        await update.message.reply_text(f"✅ Added {len(set(raw_nums))} numbers.", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("➕ ADD MORE", callback_data="add_more_quick"), InlineKeyboardButton("🏁 FINISH", callback_data="finish_quick"), InlineKeyboardButton("❌ CANCEL", callback_data="main_menu")]]))
+        nums = e164_unique(re.findall(r"\+?\d{7,}", txt), cfg["country_code"]).tolist()
+        quick_vcf_data[uid].append({"contact": st["contact"], "nums": nums})
+        await update.message.reply_text(f"✅ Added {len(nums)} numbers.", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("➕ ADD MORE", callback_data="add_more_quick"), InlineKeyboardButton("🏁 FINISH", callback_data="finish_quick"), InlineKeyboardButton("❌ CANCEL", callback_data="main_menu")]]))
 
     elif st["mode"] == "name_gen":
         if st["step"] == "name":
+            if len(txt) > namegen.BASE_MAX:
+                return await update.message.reply_text(f"⚠️ Keep the name under {namegen.BASE_MAX} characters.", reply_markup=cancel_kb())
             st["base_name"] = txt; st["step"] = "count"
             await update.message.reply_text("🔢 How many names?", parse_mode=ParseMode.MARKDOWN, reply_markup=cancel_kb())
         elif st["step"] == "count":
             if txt.isdigit():
-                proc_msg = await update.message.reply_text("⏳ **Generating...**", parse_mode=ParseMode.MARKDOWN)
-                await progress_bar(proc_msg, "Creating List")
-
                 count = int(txt)
+                if not 0 < count <= namegen.NAMES_MAX:
+                    return await update.message.reply_text(f"⚠️ Enter a number from 1 to {namegen.NAMES_MAX:,}.", reply_markup=cancel_kb())
                 base = st["base_name"]
-                content = "\n".join([f"{base} {i+1}" for i in range(count)])
-
-                await proc_msg.delete()
-
-                if len(content) > 4000:
-                    with open("names.txt", "w") as f: f.write(content)
-                    await update.message.reply_document(open("names.txt", "rb"), caption="✅ List too long, sent as file.")
-                    os.remove("names.txt")
+                if count <= namegen.PAGE_SIZE:
+                    await update.message.reply_text(f"📝 **GENERATED LIST:**\n\n```\n{namegen.name_page(base, count, 0)}\n```", parse_mode=ParseMode.MARKDOWN)
+                elif count <= namegen.PAGED_MAX:
+                    st["count"] = count; st["step"] = "view"
+                    return await update.message.reply_text(names_view(base, count, 0), reply_markup=names_kb(count, 0), parse_mode=ParseMode.MARKDOWN)
                 else:
-                    await update.message.reply_text(f"📝 **GENERATED LIST:**\n\n```\n{content}\n```", parse_mode=ParseMode.MARKDOWN)
+                    await send_names(update.message, uid, base, count)
                 st.clear(); await update.message.reply_text("✅ **Task Done.**", reply_markup=main_menu(), parse_mode=ParseMode.MARKDOWN)
 
     elif st["mode"] == "editor_action":
-        path = vcf_editor_data[uid]
-        proc_msg = await update.message.reply_text("⏳ **Processing...**", parse_mode=ParseMode.MARKDOWN)
-        await progress_bar(proc_msg, "Applying Edits")
-
-        if st["step"] == "do_add":
-            nums = list(dict.fromkeys(re.findall(r"\d{7,}", txt)))
-            new_v = "".join([f"BEGIN:VCARD\nVERSION:3.0\nFN:Added{str(i+1).zfill(3)}\nTEL;TYPE=CELL:+{n.replace('+','')}\nEND:VCARD\n" for i, n in enumerate(nums)])
-            with open(path, "a") as f: f.write(new_v)
-            await proc_msg.delete()
-            await update.message.reply_document(open(path, "rb"), caption="✅ **Contacts Added**", parse_mode=ParseMode.MARKDOWN)
-        elif st["step"] == "do_remove":
-            target = re.sub(r"\D", "", txt)
-            with open(path, "r") as f: content = f.read()
-            cards = content.split("END:VCARD\n")
-            new_cards = [c for c in cards if target not in c and "BEGIN:VCARD" in c]
-            with open(path, "w") as f: f.write("END:VCARD\n".join(new_cards) + "END:VCARD\n")
-            await proc_msg.delete()
-            await update.message.reply_document(open(path, "rb"), caption="✅ **Number Removed**", parse_mode=ParseMode.MARKDOWN)
-        os.remove(path); st.clear(); await update.message.reply_text("✅ **Edit Finished.**", reply_markup=main_menu(), parse_mode=ParseMode.MARKDOWN)
+        src, index = vcf_editor_data[uid]["file"], vcf_editor_data[uid]["index"]
+        if st["step"] in ["do_add", "do_remove"]:
+            if st["step"] == "do_add":
+                count = index.add(e164_unique(re.findall(r"\+?\d{7,}", txt), cfg["country_code"]).tolist())
+                caption = f"✅ **Contacts Added:** `{count}`"
+            else:
+                count = index.remove(parse_targets(txt))
+                caption = f"✅ **Number Removed:** `{count}` card(s)" if count else "⚠️ **Number not found.** File unchanged."
+            async with Progress(update.message, "Applying Edits"):
+                out = await jobs.run(uid, apply_vcf_edits, src, index, cpu=False)
+            await send_blob(update.message, out, caption=caption, parse_mode=ParseMode.MARKDOWN)
+            out.discard()
+        src.discard(); vcf_editor_data.pop(uid, None); st.clear(); await update.message.reply_text("✅ **Edit Finished.**", reply_markup=main_menu(), parse_mode=ParseMode.MARKDOWN)
 
     elif st["mode"] in ["rename_files", "rename_contacts"] and st["step"] == "name":
         if uid not in rename_queue or not rename_queue[uid]:
              await update.message.reply_text("❌ No file found.", reply_markup=main_menu())
              return
 
-        proc_msg = await update.message.reply_text("⏳ **Renaming...**", parse_mode=ParseMode.MARKDOWN)
-        await progress_bar(proc_msg, "Processing Files")
+        if st["mode"] == "rename_contacts":
+            if len(rename_queue[uid]) == 1: return await run_rename_contacts(update.message, uid, txt)
+            st["new_name"] = txt; st["step"] = "format"
+            kb = InlineKeyboardMarkup([
+                [InlineKeyboardButton("📦 ONE ZIP", callback_data="rename_zip"), InlineKeyboardButton("📇 ONE VCF", callback_data="rename_vcf")],
+                [InlineKeyboardButton("❌ CANCEL", callback_data="main_menu")]
+            ])
+            return await update.message.reply_text(f"📦 **{len(rename_queue[uid])}** files. How should I send them?", reply_markup=kb, parse_mode=ParseMode.MARKDOWN)
+
+        files = rename_queue.pop(uid, [])
+        async with Progress(update.message, "Processing Files") as p:
+            for k, f in enumerate(files):
+                out = await asyncio.to_thread(f.renamed, f"{txt}.vcf")
+                await send_blob(update.message, out)
+                out.discard(); f.discard()
+                p.update(k + 1, len(files))
 
-        for f in rename_queue[uid]:
-            if st["mode"] == "rename_files":
-                new_path = f"{txt}.vcf"
-                os.rename(f, new_path)
-                await update.message.reply_document(open(new_path, "rb"))
-                os.remove(new_path)
-            else:
-                out, idx = "", 1
-                with open(f, "r") as r:
-                    for line in r:
-                        if line.startswith("FN:"):
-                            out += f"FN:{txt}{str(idx).zfill(3)}\n"; idx+=1
-                        else: out += line
-                with open(f, "w") as w: w.write(out)
-                await update.message.reply_document(open(f, "rb"))
-                os.remove(f)
-
-        await proc_msg.delete()
         st.clear(); await update.message.reply_text("✅ **Rename Complete.**", reply_markup=main_menu(), parse_mode=ParseMode.MARKDOWN)
 
+@cancellable
+@sessions.persist
 async def handle_file(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     uid = update.effective_user.id
     st, cfg, doc = state(uid), settings(uid), update.message.document
-    path = doc.file_name
-    file_obj = await ctx.bot.get_file(doc.file_id)
-    await file_obj.download_to_drive(path)
 
+    # heavy flows take the document itself and download it when they run
     if st["mode"] == "analysis":
-        proc_msg = await update.message.reply_text("⏳ **Analyzing...**", parse_mode=ParseMode.MARKDOWN)
-        await progress_bar(proc_msg, "Scanning File")
-
-        nums = extract_all_numbers(path)
-        report = generate_analysis_report(path, nums)
-        await proc_msg.delete()
-        await update.message.reply_text(report, parse_mode=ParseMode.MARKDOWN, reply_markup=main_menu())
-        os.remove(path); st.clear()
+        st.clear()
+        return await dispatch(update.message, uid, analysis_flow, doc=doc)
 
-    elif st["mode"] == "converter":
-        convert_queue[uid] = path
+    if st["mode"] == "converter":
+        convert_queue[uid] = doc
         st["step"] = "format"
-        await update.message.reply_text("📂 **File Received.** Choose output format:", reply_markup=convert_kb(), parse_mode=ParseMode.MARKDOWN)
+        return await update.message.reply_text("📂 **File Received.** Choose output format:", reply_markup=convert_kb(), parse_mode=ParseMode.MARKDOWN)
+
+    if st["mode"] == "split":
+        split_queue[uid] = {"doc": doc}; st["step"] = "limit"
+        if jobqueue.enabled(): split_queue[uid]["job"], _ = await jobqueue.submit(split_count_flow, update.message, uid, doc=doc, country_code=cfg["country_code"])
+        else: split_queue[uid]["count"] = await split_count_flow(update.message, uid, doc, cfg["country_code"])
+        return
 
-    elif st["mode"] == "split":
-        nums = extract_all_numbers(path)
-        split_queue[uid] = {"file": path, "nums": nums}; st["step"] = "limit"
-        await update.message.reply_text(f"📊 Found **{len(nums)}** numbers.\nEnter limit per file:", parse_mode=ParseMode.MARKDOWN, reply_markup=cancel_kb())
+    if st["mode"] == "gen" and st["step"] == "waiting_input":
+        st.clear()
+        return await dispatch(update.message, uid, gen_flow, doc=doc, cfg=dict(cfg))
 
-    elif st["mode"] == "gen" and st["step"] == "waiting_input":
-        proc_msg = await update.message.reply_text("⚙️ **Processing...**", parse_mode=ParseMode.MARKDOWN)
-        await progress_bar(proc_msg, "Generating Files")
+    if st["mode"] == "merge":
+        merge_queue[uid].append(doc)
+        return await update.message.reply_text(f"📥 **File Added.** Send next or type 'DONE'.", parse_mode=ParseMode.MARKDOWN, reply_markup=cancel_kb())
 
-        nums = extract_all_numbers(path)
-        detected_country = "Manual"
-        if not cfg["country_code"]: detected_country = detect_primary_country(nums)
+    # the rest works on the file itself
+    if st["mode"] not in ["rename_files", "rename_contacts", "editor"]: return
+    src = await download(ctx.bot, doc)
 
-        generated_files = []
-        for i, c in enumerate(chunk(nums, cfg["limit"])):
-            f = make_vcf(c, cfg, i)
-            await update.message.reply_document(open(f, "rb"))
-            generated_files.append(f)
-
-        await proc_msg.delete()
-
-        summary = (
-            f"✅ **GENERATION COMPLETE**\n"
-            f"━━━━━━━━━━━━━━━━━━\n"
-            f"📂 File Name: `{cfg['file_name']}`\n"
-            f"🔢 Total: `{len(nums)}` | 📁 Files: `{len(generated_files)}`\n"
-            f"🌍 Detect: `{detected_country}`\n"
-        )
-        await update.message.reply_text(summary, parse_mode=ParseMode.MARKDOWN, reply_markup=main_menu())
-        for f in generated_files: os.remove(f)
-        os.remove(path); st.clear()
-
-    elif st["mode"] == "merge":
-        merge_queue[uid].append(path)
-        await update.message.reply_text(f"📥 **File Added.** Send next or type 'DONE'.", parse_mode=ParseMode.MARKDOWN, reply_markup=cancel_kb())
-
-    elif st["mode"] in ["rename_files", "rename_contacts"]:
+    if st["mode"] in ["rename_files", "rename_contacts"]:
         if uid not in rename_queue: rename_queue[uid] = []
-        rename_queue[uid].append(path)
+        rename_queue[uid].append(src)
         st["step"] = "name"
         prompt = "NEW FILE NAME" if st["mode"] == "rename_files" else "NEW CONTACT NAME"
-        await update.message.reply_text(f"✏️ Enter **{prompt}**:", parse_mode=ParseMode.MARKDOWN, reply_markup=cancel_kb())
+        queued = len(rename_queue[uid])
+        head = f"📥 **{queued} files queued.** Send more or enter" if queued > 1 else "✏️ Enter"
+        await update.message.reply_text(f"{head} **{prompt}**:", parse_mode=ParseMode.MARKDOWN, reply_markup=cancel_kb())
 
     elif st["mode"] == "editor":
-        vcf_editor_data[uid] = path
+        index = await jobs.run(uid, build_vcf_index, src)
+        vcf_editor_data[uid] = {"file": src, "index": index}
         st["mode"] = "editor_action"
         kb = InlineKeyboardMarkup([
             [InlineKeyboardButton("➕ ADD", callback_data="edit_add"), InlineKeyboardButton("❌ REMOVE", callback_data="edit_remove")],
@@ -634,7 +780,7 @@ async def handle_file(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"📂 **File Ready.** Select Action:", reply_markup=kb, parse_mode=ParseMode.MARKDOWN)
 
 if __name__ == "__main__":
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+    app = ApplicationBuilder().token(BOT_TOKEN).concurrent_updates(True).build()
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CallbackQueryHandler(buttons))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
@@ -0,0 +1,87 @@
+import progress
+from filestore import BlobWriter
+from vcf_writer import write_vcards
+
+# ================= CONVERTER =================
+# One pass over the numbers feeds every requested format. Each writer gets
+# the numbers batch by batch and streams into its own BlobWriter: TXT/CSV as
+# plain lines, XLSX through openpyxl's write-only sheet, VCF through
+# write_vcards. The "+<digits>" strings are made once per batch for all of them.
+
+FORMATS = ("txt", "vcf", "csv", "xlsx")
+BATCH = 20000
+HEADER = "Mobile Number"
+
+
+class TxtOut:
+    def __init__(self, name):
+        self.out, self.first = BlobWriter(name), True
+
+    def write(self, raw, formatted):
+        if not formatted: return
+        self.out.write((("" if self.first else "\n") + "\n".join(formatted)).encode())
+        self.first = False
+
+    def close(self):
+        return self.out.close()
+
+
+class CsvOut(TxtOut):
+    def __init__(self, name):
+        super().__init__(name)
+        self.out.write(f"{HEADER}\n".encode())
+
+    def write(self, raw, formatted):
+        if formatted: self.out.write(("\n".join(formatted) + "\n").encode())
+
+
+class XlsxOut:
+    def __init__(self, name):
+        from openpyxl import Workbook
+        self.out = BlobWriter(name)
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet("Sheet1")
+        self.ws.append([HEADER])
+
+    def write(self, raw, formatted):
+        for n in formatted: self.ws.append([n])
+
+    def close(self):
+        self.wb.save(self.out)
+        return self.out.close()
+
+
+class VcfOut:
+    # the converter always uses the default card layout: Contact001, Contact002, ...
+    def __init__(self, name, contact_name="Contact", start=1):
+        self.out, self.contact_name, self.pos = BlobWriter(name), contact_name, start
+
+    def write(self, raw, formatted):
+        self.pos += write_vcards(self.out, raw, self.contact_name, self.pos)
+
+    def close(self):
+        return self.out.close()
+
+
+WRITERS = {"txt": TxtOut, "csv": CsvOut, "xlsx": XlsxOut, "vcf": VcfOut}
+
+
+def out_name(src_name, fmt):
+    if fmt == "vcf": return "Converted_1.vcf"
+    return f"Converted_{src_name.split('.')[0]}.{fmt}"
+
+
+def convert_numbers(nums, src_name, formats, batch=BATCH):
+    """Writes nums in every format of `formats` in one pass. Returns the Blobs in that order."""
+    writers = [WRITERS[f](out_name(src_name, f)) for f in formats]
+    try:
+        total = len(nums)
+        for i in range(0, total, batch):
+            raw = nums[i:i + batch]
+            formatted = ["+" + n for n in raw]
+            for w in writers: w.write(raw, formatted)
+            progress.report(min(i + batch, total) / total)
+        return [w.close() for w in writers]
+    except BaseException:
+        for w in writers: w.out.abort()
+        raise
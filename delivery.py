@@ -0,0 +1,96 @@
+import os
+import asyncio
+import zipfile
+
+from telegram import InputMediaDocument
+
+import metrics
+from filestore import BlobWriter
+
+# ================= BULK DELIVERY =================
+# Big splits used to be one render + one upload per file. Here chunks are
+# rendered in the worker pool a window ahead of the upload, and sent as
+# media groups (up to 10 documents per API call). Flood waits are handled by
+# the bot's rate limiter (ratelimit.py).
+
+GROUP_SIZE = 10  # Telegram's media group limit
+DELIVERY_PARALLEL = int(os.environ.get("DELIVERY_PARALLEL", "1"))
+ZIP_SUGGEST_FILES = int(os.environ.get("ZIP_SUGGEST_FILES", "10"))
+
+
+async def send_group(message, blobs):
+    """Sends 1-10 blobs; two or more go out as one media group."""
+    with metrics.timed("upload", nbytes=sum(b.size for b in blobs)):
+        data = await asyncio.gather(*(b.aread() for b in blobs))
+        if len(blobs) == 1:
+            return await message.reply_document(data[0], filename=blobs[0].name)
+        media = [InputMediaDocument(d, filename=b.name) for b, d in zip(blobs, data)]
+        return await message.reply_media_group(media)
+
+
+async def deliver_chunks(jobs, uid, message, render, items, parallel=DELIVERY_PARALLEL, on_progress=None):
+    """
+    Renders `items` with render(item) -> Blob in the job pool and uploads the
+    results in order, GROUP_SIZE per request. The next window renders while the
+    current one uploads; `parallel` > 1 lets that many uploads overlap (order
+    between groups is then no longer guaranteed). on_progress gets the share
+    of files uploaded so far. Returns the number of files.
+    """
+    windows = [items[i:i + GROUP_SIZE] for i in range(0, len(items), GROUP_SIZE)]
+    if not windows: return 0
+    sem = asyncio.Semaphore(max(1, parallel))
+    uploads, sent = [], [0]
+
+    async def upload(blobs):
+        try:
+            await send_group(message, blobs)
+            sent[0] += len(blobs)
+            if on_progress: on_progress(sent[0] / len(items))
+        finally:
+            for b in blobs: b.discard()
+            sem.release()
+
+    async def render_window(window):
+        with metrics.timed("render"):
+            blobs = await jobs.run_chunks(uid, render, window)
+        metrics.add("render", nbytes=sum(b.size for b in blobs))
+        return blobs
+
+    pending = asyncio.ensure_future(render_window(windows[0]))
+    try:
+        for k in range(len(windows)):
+            blobs = await pending
+            pending = None
+            if k + 1 < len(windows):
+                pending = asyncio.ensure_future(render_window(windows[k + 1]))
+            await sem.acquire()
+            uploads.append(asyncio.ensure_future(upload(blobs)))
+            if parallel <= 1: await uploads[-1]
+        await asyncio.gather(*uploads)
+    finally:
+        if pending is not None: pending.cancel()
+        for u in uploads: u.cancel()
+    return len(items)
+
+
+def zip_blobs(name, blobs):
+    """Packs blobs into one zip Blob (discarding the inputs as it goes)."""
+    with BlobWriter(name) as w:
+        with zipfile.ZipFile(w, "w", zipfile.ZIP_DEFLATED, compresslevel=5) as z:
+            for b in blobs:
+                z.writestr(b.name, b.read())
+                b.discard()
+    return w.close()
+
+
+def join_blobs(name, blobs):
+    """Concatenates blobs into one file, newline separated (discarding the inputs)."""
+    with BlobWriter(name) as w:
+        last = b"\n"
+        for b in blobs:
+            if last != b"\n": w.write(b"\n")
+            with b.open() as fh:
+                for part in iter(lambda: fh.read(1 << 20), b""):
+                    w.write(part); last = part[-1:]
+            b.discard()
+    return w.close()
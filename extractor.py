@@ -0,0 +1,353 @@
+import io
+import os
+import re
+import csv
+import mmap
+import tempfile
+import itertools
+from array import array
+
+import progress
+from numset import NumberArray
+
+# ================= STREAMING NUMBER EXTRACTOR =================
+# Reads uploads piece by piece instead of loading the whole file, so memory
+# stays flat no matter how big the contact dump is. A source is either a path
+# or a filestore.Blob (anything with .name and .open()).
+
+NUM_RE = re.compile(r"\+?\d{7,}")
+CHUNK_SIZE = 1 << 20  # 1 MB text chunks
+NUM_CHARS = set("0123456789+")
+
+
+def _open_text(src, newline=None):
+    return io.TextIOWrapper(_binary(src), errors="ignore", newline=newline)
+
+
+def _binary(src):
+    """Binary handle on the source; reports read progress when run as a job."""
+    if isinstance(src, str):
+        return progress.tracked(open(src, "rb"), os.path.getsize(src))
+    return progress.tracked(src.open(), src.size)
+
+
+def _split_tail(buf):
+    """Splits buf so that a number touching the end stays for the next chunk."""
+    cut = len(buf)
+    while cut and buf[cut - 1] in NUM_CHARS:
+        cut -= 1
+    return buf[:cut], buf[cut:]
+
+
+def _iter_text(src, chunk_size):
+    with _open_text(src) as f:
+        tail = ""
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            head, tail = _split_tail(tail + block)
+            # a single giant run of digits, nothing to split on
+            if not head and len(tail) > chunk_size:
+                head, tail = tail, ""
+            yield from NUM_RE.findall(head)
+        if tail:
+            yield from NUM_RE.findall(tail)
+
+
+def _iter_vcf(src):
+    with _open_text(src) as f:
+        for line in f:
+            if line.startswith("TEL"):
+                n = re.sub(r"[^\d+]", "", line)
+                if len(n) >= 7: yield n
+
+
+# ===== TABULAR FILES (CSV / XLSX) =====
+# The first SAMPLE_ROWS rows decide which columns hold phone numbers; only
+# those columns are read afterwards, so digits from ID, date or amount
+# columns no longer end up in the output. Cells are regexed a batch at a
+# time (one findall over the joined batch). If no column looks like phones
+# every cell is scanned, as before.
+
+SAMPLE_ROWS = 200
+ROW_BATCH = 20000
+PHONE_MIN_RATIO = 0.5
+PHONE_CELL_RE = re.compile(r"\+?\(?\d[\d\s().-]{5,22}")
+DATE_CELL_RE = re.compile(r"\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}(\D|$)")
+PHONE_SEP_RE = re.compile(r"(?<=\d)[ ().-]{1,2}(?=\d)|(?<=\+)[ (]+(?=\d)")
+PHONE_HEADER_RE = re.compile(r"phone|mobile|mob\b|tel|cell|whats|contact|number|no\.?$", re.I)
+OTHER_HEADER_RE = re.compile(r"\bid\b|_id|date|time|zip|pin|amount|price|qty|age", re.I)
+
+
+def _cell_text(value):
+    if value is None: return ""
+    if isinstance(value, float) and value.is_integer(): value = int(value)
+    return str(value).strip()
+
+
+def _is_phone_cell(text):
+    if not PHONE_CELL_RE.fullmatch(text) or DATE_CELL_RE.match(text):
+        return False
+    return 7 <= sum(c.isdigit() for c in text) <= 15
+
+
+def _looks_like_ids(values):
+    """Sequential integers (row ids) or one repeated value: phone-shaped, rarely phones."""
+    if len(values) < 3: return False
+    if len(set(values)) <= len(values) // 5: return True
+    nums = [int(v) for v in values if v.isdigit()]
+    steps = sum(1 for x, y in zip(nums, nums[1:]) if y - x == 1)
+    return steps >= 0.9 * (len(values) - 1)
+
+
+def detect_phone_columns(rows):
+    """Column indexes that hold phone numbers, judged from sample rows."""
+    rows = [[_cell_text(c) for c in row] for row in rows]
+    width = max((len(r) for r in rows), default=0)
+    header = rows[0] if rows else []
+    has_header = bool(header) and not any(_is_phone_cell(c) for c in header)
+    body = rows[1:] if has_header else rows
+    found, id_like = [], []
+    for col in range(width):
+        name = header[col] if has_header and col < len(header) else ""
+        values = [r[col] for r in body if col < len(r) and r[col]]
+        if not values or (name and OTHER_HEADER_RE.search(name) and not PHONE_HEADER_RE.search(name)):
+            continue
+        phones = [v for v in values if _is_phone_cell(v)]
+        if len(phones) >= PHONE_MIN_RATIO * len(values):
+            # a generated number range is sequential too, so ID-like columns
+            # only lose when some other column looks like phones
+            (id_like if _looks_like_ids(phones) and not PHONE_HEADER_RE.search(name) else found).append(col)
+    return found or id_like
+
+
+def _scan_rows(rows, cols=None):
+    """Runs NUM_RE over the chosen columns (all when cols is None), a batch of rows at a time."""
+    batch = []
+    for row in rows:
+        if cols is None:
+            batch.extend(row)
+        else:
+            n = len(row)
+            batch.extend(row[c] for c in cols if c < n)
+        if len(batch) >= ROW_BATCH:
+            yield from _scan_cells(batch, cols is not None)
+            batch = []
+    if batch:
+        yield from _scan_cells(batch, cols is not None)
+
+
+def _scan_cells(cells, phone_cols):
+    text = "\n".join(_cell_text(c) for c in cells if c is not None)
+    # inside a phone column "+91 98765-43210" is one number
+    if phone_cols: text = PHONE_SEP_RE.sub("", text)
+    return NUM_RE.findall(text)
+
+
+def _iter_table(rows, keep=None):
+    sample = list(itertools.islice(rows, SAMPLE_ROWS))
+    cols = detect_phone_columns(sample) or None
+    # tell a column-aware row reader to stop decoding the other columns
+    if keep is not None and cols: keep.update(cols)
+    yield from _scan_rows(itertools.chain(sample, rows), cols)
+
+
+def _iter_csv(src):
+    with _open_text(src, newline="") as f:
+        yield from _iter_table(csv.reader(f))
+
+
+# .xlsx is read straight from the sheet XML: openpyxl builds a Cell object for
+# every cell of every column, which is most of the time on wide sheets.
+# Text cells point into the shared-strings table, which grows with the file;
+# past XLSX_MEMORY_STRINGS strings it is kept in a temp file (read through
+# mmap) with only an 8-byte offset per string left in memory.
+XLSX_MEMORY_STRINGS = int(os.environ.get("XLSX_MEMORY_STRINGS", "100000"))
+XL_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+XL_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+
+def _col_index(ref):
+    n = 0
+    for ch in ref:
+        if "A" <= ch <= "Z": n = n * 26 + ord(ch) - 64
+        else: break
+    return n - 1
+
+
+def _xlsx_sheet_path(zf):
+    """Zip path of the active worksheet."""
+    from xml.etree import ElementTree as ET
+    book = ET.fromstring(zf.read("xl/workbook.xml"))
+    view = book.find(f"{XL_NS}bookViews/{XL_NS}workbookView")
+    active = int(view.get("activeTab", 0)) if view is not None else 0
+    sheets = book.findall(f"{XL_NS}sheets/{XL_NS}sheet")
+    rid = sheets[min(active, len(sheets) - 1)].get(XL_REL)
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    target = next(r.get("Target") for r in rels if r.get("Id") == rid)
+    return target.lstrip("/") if target.startswith("/") else "xl/" + target
+
+
+class SharedStrings:
+    """Shared-string table of a workbook, moved to a temp file past `limit` strings."""
+
+    def __init__(self, limit=XLSX_MEMORY_STRINGS):
+        self.limit = limit
+        self.mem = []               # strings not spilled yet, they follow the spilled ones
+        self.offsets = array("Q", [0])
+        self.file = None
+        self.map = None
+
+    def append(self, s):
+        self.mem.append(s)
+        if len(self.mem) >= self.limit: self._spill()
+
+    def _spill(self):
+        if self.file is None: self.file = tempfile.TemporaryFile(prefix="vcfbot-xlsx-")
+        end = self.offsets[-1]
+        for s in self.mem:
+            b = s.encode("utf-8", "surrogatepass")
+            self.file.write(b)
+            end += len(b)
+            self.offsets.append(end)
+        self.mem = []
+
+    def __len__(self):
+        return len(self.offsets) - 1 + len(self.mem)
+
+    def __getitem__(self, i):
+        spilled = len(self.offsets) - 1
+        if i >= spilled: return self.mem[i - spilled]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        if start == end: return ""
+        if self.map is None:
+            self.file.flush()
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map[start:end].decode("utf-8", "surrogatepass")
+
+    def close(self):
+        if self.map is not None: self.map.close()
+        if self.file is not None: self.file.close()
+        self.map = self.file = None
+        self.mem, self.offsets = [], array("Q", [0])
+
+
+def _xlsx_shared_strings(zf):
+    from xml.etree import ElementTree as ET
+    out = SharedStrings()
+    if "xl/sharedStrings.xml" not in zf.namelist(): return out
+    try:
+        with zf.open("xl/sharedStrings.xml") as f:
+            root = None
+            for event, el in ET.iterparse(f, events=("start", "end")):
+                if root is None: root = el
+                if event == "end" and el.tag == f"{XL_NS}si":
+                    out.append("".join(t.text or "" for t in el.iter(f"{XL_NS}t")))
+                    el.clear()
+                    if el in root: root.remove(el)
+    except Exception:
+        out.close()
+        raise
+    return out
+
+
+def _xlsx_rows(zf, path, strings, keep):
+    """Rows of cell values; once `keep` is filled only those columns are decoded."""
+    from xml.etree import ElementTree as ET
+    c_tag, row_tag, v_tag, data_tag = f"{XL_NS}c", f"{XL_NS}row", f"{XL_NS}v", f"{XL_NS}sheetData"
+    with zf.open(path) as f:
+        row, pos, sheet = [], 0, None
+        for event, el in ET.iterparse(f, events=("start", "end")):
+            tag = el.tag
+            if event == "start":
+                if tag == data_tag: sheet = el
+                continue
+            if tag == c_tag:
+                ref = el.get("r")
+                col = _col_index(ref) if ref else pos
+                pos = col + 1
+                if keep and col not in keep:
+                    continue
+                kind = el.get("t")
+                if kind == "inlineStr":
+                    value = "".join(t.text or "" for t in el.iter(f"{XL_NS}t"))
+                else:
+                    v = el.find(v_tag)
+                    value = v.text if v is not None else None
+                    if value is not None and kind == "s": value = strings[int(value)]
+                    elif kind in ("b", "e"): value = None
+                if value is not None:
+                    if col >= len(row): row.extend([None] * (col + 1 - len(row)))
+                    row[col] = value
+            elif tag == row_tag:
+                yield row
+                row, pos = [], 0
+                # cleared rows would still hang off <sheetData>, detach them
+                el.clear()
+                if sheet is not None: sheet.remove(el)
+
+
+def _iter_xlsx(src):
+    import zipfile
+    with _binary(src) as fh:
+        zf = zipfile.ZipFile(fh)
+        try:
+            path, strings = _xlsx_sheet_path(zf), _xlsx_shared_strings(zf)
+        except (KeyError, IndexError, StopIteration, ValueError):
+            zf.close()
+            yield from _iter_xlsx_openpyxl(src)
+            return
+        with zf:
+            keep = set()
+            try:
+                yield from _iter_table(_xlsx_rows(zf, path, strings, keep), keep)
+            finally:
+                strings.close()
+
+
+def _iter_xlsx_openpyxl(src):
+    # unusual workbook layout, let openpyxl find the sheet
+    from openpyxl import load_workbook
+    with _binary(src) as fh:
+        wb = load_workbook(fh, read_only=True, data_only=True)
+        try:
+            yield from _iter_table(wb.active.iter_rows(values_only=True))
+        finally:
+            wb.close()
+
+
+def _iter_xls(src):
+    # legacy .xls has no streaming reader, fall back to pandas
+    import pandas as pd
+    with _binary(src) as fh:
+        df = pd.read_excel(fh, dtype=str, header=None)
+    cols = detect_phone_columns(df.head(SAMPLE_ROWS).itertuples(index=False))
+    if cols: df = df.iloc[:, cols]
+    yield from _scan_cells(df.fillna("").to_numpy().ravel(), bool(cols))
+
+
+def iter_raw_numbers(src, chunk_size=CHUNK_SIZE):
+    """Yields every number token found in the file, duplicates included."""
+    name = src if isinstance(src, str) else src.name
+    ext = os.path.splitext(name)[1].lower()
+    if ext == ".vcf":
+        return _iter_vcf(src)
+    if ext == ".xlsx":
+        return _iter_xlsx(src)
+    if ext == ".xls":
+        return _iter_xls(src)
+    if ext == ".csv":
+        return _iter_csv(src)
+    return _iter_text(src, chunk_size)
+
+
+def collect_numbers(src, out=None):
+    """
+    Appends every number of the file to a compact NumberArray (8 bytes per
+    number) without deduping; call .dedupe() once at the end. Pass the same
+    `out` for several files.
+    """
+    if out is None: out = NumberArray()
+    out.extend(iter_raw_numbers(src))
+    return out
@@ -0,0 +1,214 @@
+import io
+import os
+import time
+import queue
+import shutil
+import asyncio
+import tempfile
+import threading
+import multiprocessing
+
+import metrics
+
+# ================= IN-MEMORY FILES =================
+# Uploads and outputs live in memory as bytes. Only files bigger than
+# SPILL_SIZE_MB go to disk, each in its own temp dir, so two users sending
+# "contacts.txt" at the same time never touch each other's file.
+
+SPILL_BYTES = int(float(os.environ.get("SPILL_SIZE_MB", "20")) * 1024 * 1024)
+TEMP_PREFIX = "vcfbot-"
+TEMP_MAX_AGE = int(os.environ.get("TEMP_MAX_AGE", str(24 * 3600)))
+DOWNLOAD_CHUNK = 1024 * 1024
+DOWNLOAD_TIMEOUT = float(os.environ.get("DOWNLOAD_TIMEOUT", "60"))   # per read, not for the whole file
+
+
+def _safe_name(name):
+    return os.path.basename(name or "file") or "file"
+
+
+class Blob:
+    """A named file held either as bytes or as a path in a private temp dir."""
+
+    def __init__(self, name, data=None, path=None):
+        self.name = _safe_name(name)
+        self.data = data
+        self.path = path
+
+    @property
+    def ext(self):
+        return os.path.splitext(self.name)[1].lower()
+
+    @property
+    def size(self):
+        if self.data is not None: return len(self.data)
+        return os.path.getsize(self.path) if self.path and os.path.exists(self.path) else 0
+
+    def open(self):
+        """Binary handle positioned at the start."""
+        if self.data is not None: return io.BytesIO(self.data)
+        return open(self.path, "rb")
+
+    def read(self):
+        if self.data is not None: return self.data
+        with open(self.path, "rb") as f: return f.read()
+
+    def renamed(self, name):
+        """Same content under another name, no copy for in-memory blobs."""
+        if self.data is not None: return Blob(name, data=self.data)
+        new_path = os.path.join(os.path.dirname(self.path), _safe_name(name))
+        os.replace(self.path, new_path)
+        self.path = None
+        return Blob(name, path=new_path)
+
+    async def aread(self):
+        """read() without blocking the event loop on disk."""
+        if self.data is not None: return self.data
+        return await asyncio.to_thread(self.read)
+
+    def discard(self):
+        if self.path:
+            remove_later(os.path.dirname(self.path))
+            self.path = None
+        self.data = None
+
+    def __repr__(self):
+        where = "memory" if self.data is not None else self.path
+        return f"<Blob {self.name} ({where})>"
+
+
+def spill_path(name):
+    return os.path.join(tempfile.mkdtemp(prefix=TEMP_PREFIX), _safe_name(name))
+
+
+class BlobWriter:
+    """Binary writer that stays in memory until it passes SPILL_BYTES."""
+
+    def __init__(self, name, limit=None):
+        self.name = name
+        self.limit = SPILL_BYTES if limit is None else limit
+        self._buf = io.BytesIO()
+        self._file = None
+        self._path = None
+
+    def write(self, b):
+        if self._file is None and self._buf.tell() + len(b) > self.limit:
+            self._path = spill_path(self.name)
+            self._file = open(self._path, "wb")
+            self._file.write(self._buf.getvalue())
+            self._buf = None
+        return (self._file or self._buf).write(b)
+
+    def flush(self):
+        if self._file is not None: self._file.flush()
+
+    def close(self):
+        """Finishes writing and returns the Blob."""
+        if self._file is not None:
+            self._file.close()
+            return Blob(self.name, path=self._path)
+        return Blob(self.name, data=self._buf.getvalue())
+
+    def __enter__(self):
+        return self
+
+    def abort(self):
+        """Drops everything written so far, spilled file included."""
+        if self._file is not None:
+            self._file.close()
+            Blob(self.name, path=self._path).discard()
+            self._file = None
+        self._buf = None
+
+    def __exit__(self, *exc):
+        if exc[0] is not None: self.abort()
+
+
+async def _download_to(tg_file, path):
+    """Streams a Telegram file into path a chunk at a time (PTB's download_to_drive
+    reads the whole body into memory first)."""
+    src = getattr(tg_file, "file_path", None) or ""
+    if src.startswith(("http://", "https://")):
+        import httpx
+        with open(path, "wb") as f:
+            async with httpx.AsyncClient(timeout=DOWNLOAD_TIMEOUT) as client:
+                async with client.stream("GET", src) as r:
+                    r.raise_for_status()
+                    async for part in r.aiter_bytes(DOWNLOAD_CHUNK):
+                        await asyncio.to_thread(f.write, part)
+    elif src and os.path.isfile(src):
+        # local Bot API server: the file is already on disk
+        await asyncio.to_thread(shutil.copyfile, src, path)
+    else:
+        await tg_file.download_to_drive(path)
+
+
+async def download(bot, doc):
+    """Downloads a Telegram document into a Blob; big files go straight to disk."""
+    with metrics.timed("download", nbytes=doc.file_size or 0):
+        tg_file = await bot.get_file(doc.file_id)
+        if doc.file_size and doc.file_size > SPILL_BYTES:
+            path = await asyncio.to_thread(spill_path, doc.file_name)
+            await _download_to(tg_file, path)
+            return Blob(doc.file_name, path=path)
+        buf = io.BytesIO()
+        await tg_file.download_to_memory(buf)
+        return Blob(doc.file_name, data=buf.getvalue())
+
+
+# ================= TEMP CLEANUP =================
+# Blob.discard() only queues its temp dir; one daemon thread deletes them, so
+# handlers never wait on rmtree. sweep_stale() catches dirs left behind by a
+# crash or restart (older than TEMP_MAX_AGE, well past the session TTL).
+
+_trash = queue.Queue()
+_cleaner = None
+_cleaner_lock = threading.Lock()
+
+
+def _clean_loop():
+    while True:
+        path = _trash.get()
+        shutil.rmtree(path, ignore_errors=True)
+        _trash.task_done()
+
+
+def remove_later(path):
+    global _cleaner
+    if multiprocessing.parent_process() is not None:
+        # pool worker: no event loop to protect, and queued work would die with the process
+        return shutil.rmtree(path, ignore_errors=True)
+    if _cleaner is None:
+        with _cleaner_lock:
+            if _cleaner is None:
+                _cleaner = threading.Thread(target=_clean_loop, name="tmp-cleaner", daemon=True)
+                _cleaner.start()
+    _trash.put(path)
+
+
+def flush_cleanup():
+    """Blocks until every queued temp dir is gone (main.post_shutdown)."""
+    if _cleaner is not None: _trash.join()
+
+
+def sweep_stale(max_age=TEMP_MAX_AGE):
+    """Removes our temp dirs older than max_age. Returns how many."""
+    cutoff, removed = time.time() - max_age, 0
+    root = tempfile.gettempdir()
+    for e in os.scandir(root):
+        if not e.name.startswith(TEMP_PREFIX) or not e.is_dir(follow_symlinks=False): continue
+        try:
+            if e.stat(follow_symlinks=False).st_mtime < cutoff:
+                shutil.rmtree(e.path, ignore_errors=True); removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+async def temp_sweeper(every=3600):
+    while True:
+        try:
+            n = await asyncio.to_thread(sweep_stale)
+            if n: print(f"Removed {n} stale temp dirs")
+        except Exception as e:
+            print(f"Temp sweep failed: {e}")
+        await asyncio.sleep(every)
@@ -0,0 +1,362 @@
+import os
+import time
+import signal
+import socket
+import asyncio
+import sqlite3
+import threading
+import multiprocessing
+
+from telegram import Message
+
+from sessions import pack, unpack
+
+# ================= JOB QUEUE =================
+# With JOB_QUEUE set, the process that receives updates only answers the
+# light handlers. Heavy flows (analysis, generator, split, convert, merge)
+# are written to a durable queue table and picked up by worker processes,
+# on this host or others, that share the bot token. A worker runs the flow
+# against a stand-in for the user's message, so status, files and errors go
+# straight to the right chat.
+#
+# JOB_QUEUE: "" (default, flows run in-process), "sqlite:///path/to/jobs.db"
+# or "postgres" (uses DATABASE_URL, claims with FOR UPDATE SKIP LOCKED).
+# A running job keeps a heartbeat; one whose worker died is claimed again
+# after JOB_LEASE seconds, up to JOB_MAX_ATTEMPTS times.
+
+JOB_QUEUE = os.environ.get("JOB_QUEUE", "")
+JOB_LEASE = int(os.environ.get("JOB_LEASE", "120"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL = float(os.environ.get("JOB_POLL", "0.5"))
+JOB_KEEP = int(os.environ.get("JOB_KEEP", str(24 * 3600)))
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "4"))
+
+TASKS = {}   # name -> async flow(message, uid, **payload)
+
+
+def task(name):
+    """Registers a flow so queue workers can run it by name."""
+    def register(fn):
+        TASKS[name] = fn
+        fn.task_name = name
+        return fn
+    return register
+
+
+class Job:
+    __slots__ = ("id", "kind", "uid", "chat_id", "payload", "attempts")
+
+    def __init__(self, id, kind, uid, chat_id, payload, attempts):
+        self.id, self.kind, self.uid, self.chat_id = id, kind, uid, chat_id
+        self.payload, self.attempts = unpack(payload), attempts
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} uid={self.uid} try={self.attempts}>"
+
+
+# ===== BACKENDS =====
+
+class SQLiteQueue:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS bot_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT, uid INTEGER, chat_id INTEGER, payload BLOB,
+                status TEXT, worker TEXT, attempts INTEGER DEFAULT 0,
+                created REAL, heartbeat REAL, result BLOB, error TEXT
+            )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS bot_jobs_status ON bot_jobs(status, id)")
+
+    def _run(self, sql, args=(), fetch=None):
+        with self.lock:
+            cur = self.conn.execute(sql, args)
+            if fetch == "one": return cur.fetchone()
+            if fetch == "all": return cur.fetchall()
+            return cur.rowcount
+
+    def enqueue(self, kind, uid, chat_id, payload):
+        with self.lock:
+            return self.conn.execute(
+                "INSERT INTO bot_jobs(kind, uid, chat_id, payload, status, created) VALUES(?,?,?,?,'queued',?)",
+                (kind, uid, chat_id, payload, time.time())).lastrowid
+
+    def claim(self, worker, lease):
+        now = time.time()
+        with self.lock:
+            # IMMEDIATE takes the write lock up front, so two workers can't pick the same row
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT id FROM bot_jobs WHERE status='queued' OR (status='running' AND heartbeat<?) "
+                    "ORDER BY id LIMIT 1", (now - lease,)).fetchone()
+                if row is None:
+                    self.conn.execute("COMMIT")
+                    return None
+                self.conn.execute(
+                    "UPDATE bot_jobs SET status='running', worker=?, heartbeat=?, attempts=attempts+1 WHERE id=?",
+                    (worker, now, row[0]))
+                job = self.conn.execute(
+                    "SELECT id, kind, uid, chat_id, payload, attempts FROM bot_jobs WHERE id=?", row).fetchone()
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return Job(*job)
+
+    def heartbeat(self, job_id, worker):
+        """False once the job was cancelled (or taken over by another worker)."""
+        return self._run("UPDATE bot_jobs SET heartbeat=? WHERE id=? AND status='running' AND worker=?",
+                         (time.time(), job_id, worker)) > 0
+
+    def finish(self, job_id, worker, status, result=None, error=None):
+        self._run("UPDATE bot_jobs SET status=?, result=?, error=? WHERE id=? AND status='running' AND worker=?",
+                  (status, pack(result), error, job_id, worker))
+
+    def cancel(self, uid):
+        return self._run("UPDATE bot_jobs SET status='cancelled' WHERE uid=? AND status IN ('queued','running')", (uid,))
+
+    def get(self, job_id):
+        """(status, result) of a job: the result once it is done, the error text if it failed."""
+        row = self._run("SELECT status, result, error FROM bot_jobs WHERE id=?", (job_id,), fetch="one")
+        if row is None: return None, None
+        if row[0] == "failed": return row[0], row[2]
+        return row[0], unpack(row[1]) if row[0] == "done" and row[1] is not None else None
+
+    def position(self, job_id):
+        """Jobs ahead of this one (queued or running)."""
+        row = self._run("SELECT COUNT(*) FROM bot_jobs WHERE id<? AND status IN ('queued','running')",
+                        (job_id,), fetch="one")
+        return row[0]
+
+    def pending(self, uid=None):
+        if uid is None:
+            row = self._run("SELECT COUNT(*) FROM bot_jobs WHERE status IN ('queued','running')", fetch="one")
+        else:
+            row = self._run("SELECT COUNT(*) FROM bot_jobs WHERE uid=? AND status IN ('queued','running')",
+                            (uid,), fetch="one")
+        return row[0]
+
+    def purge(self, keep=JOB_KEEP):
+        self._run("DELETE FROM bot_jobs WHERE status NOT IN ('queued','running') AND created<?", (time.time() - keep,))
+
+
+class PostgresQueue(SQLiteQueue):
+    """Same API on Postgres; claim() uses SKIP LOCKED so workers never block each other."""
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.conn = None
+        self.lock = threading.Lock()
+        self._run("""
+        CREATE TABLE IF NOT EXISTS bot_jobs (
+            id BIGSERIAL PRIMARY KEY,
+            kind TEXT, uid BIGINT, chat_id BIGINT, payload BYTEA,
+            status TEXT, worker TEXT, attempts INTEGER DEFAULT 0,
+            created DOUBLE PRECISION, heartbeat DOUBLE PRECISION, result BYTEA, error TEXT
+        )""")
+        self._run("CREATE INDEX IF NOT EXISTS bot_jobs_status ON bot_jobs(status, id)")
+
+    def _run(self, sql, args=(), fetch=None):
+        import psycopg2
+        sql = sql.replace("?", "%s")
+        with self.lock:
+            for attempt in (1, 2):
+                try:
+                    if self.conn is None or self.conn.closed:
+                        self.conn = psycopg2.connect(self.dsn, sslmode="require")
+                        self.conn.autocommit = True
+                    with self.conn.cursor() as cur:
+                        cur.execute(sql, args)
+                        if fetch == "one": return cur.fetchone()
+                        if fetch == "all": return cur.fetchall()
+                        return cur.rowcount
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    self.conn = None
+                    if attempt == 2: raise
+
+    def enqueue(self, kind, uid, chat_id, payload):
+        import psycopg2
+        return self._run(
+            "INSERT INTO bot_jobs(kind, uid, chat_id, payload, status, created) VALUES(?,?,?,?,'queued',?) RETURNING id",
+            (kind, uid, chat_id, psycopg2.Binary(payload), time.time()), fetch="one")[0]
+
+    def claim(self, worker, lease):
+        now = time.time()
+        row = self._run(
+            "UPDATE bot_jobs SET status='running', worker=?, heartbeat=?, attempts=attempts+1 "
+            "WHERE id=(SELECT id FROM bot_jobs WHERE status='queued' OR (status='running' AND heartbeat<?) "
+            "ORDER BY id FOR UPDATE SKIP LOCKED LIMIT 1) "
+            "RETURNING id, kind, uid, chat_id, payload, attempts",
+            (worker, now, now - lease), fetch="one")
+        return Job(*row) if row else None
+
+    def finish(self, job_id, worker, status, result=None, error=None):
+        import psycopg2
+        self._run("UPDATE bot_jobs SET status=?, result=?, error=? WHERE id=? AND status='running' AND worker=?",
+                  (status, psycopg2.Binary(pack(result)), error, job_id, worker))
+
+
+def make_queue(spec):
+    if not spec:
+        return None
+    if spec.startswith("sqlite:///"):
+        return SQLiteQueue(spec[len("sqlite:///"):])
+    if spec == "postgres":
+        return PostgresQueue(os.environ.get("DATABASE_URL"))
+    raise ValueError(f"Unknown JOB_QUEUE: {spec}")
+
+
+_queue = None
+
+
+def configure(spec):
+    """Switches the queue (JOB_QUEUE at import, or local mode / tests later)."""
+    global _queue, JOB_QUEUE
+    JOB_QUEUE, _queue = spec, None
+
+
+def queue():
+    global _queue
+    if _queue is None and JOB_QUEUE: _queue = make_queue(JOB_QUEUE)
+    return _queue
+
+
+def enabled():
+    return bool(JOB_QUEUE)
+
+
+# ===== FRONT SIDE =====
+
+async def submit(flow, message, uid, **payload):
+    """Queues flow(message, uid, **payload) for a worker. Returns (job id, jobs ahead)."""
+    q = queue()
+    job_id = await asyncio.to_thread(q.enqueue, flow.task_name, uid, message.chat_id, pack(payload))
+    return job_id, await asyncio.to_thread(q.position, job_id)
+
+
+async def cancel(uid):
+    if enabled(): await asyncio.to_thread(queue().cancel, uid)
+
+
+async def result(job_id):
+    return await asyncio.to_thread(queue().get, job_id)
+
+
+# ===== WORKER SIDE =====
+
+def job_message(bot, job):
+    """A message in the job's chat that flows can reply to."""
+    return Message.de_json({"message_id": 0, "date": int(time.time()),
+                            "chat": {"id": job.chat_id, "type": "private"}}, bot)
+
+
+class Worker:
+    def __init__(self, bot, q=None, name=None, concurrency=WORKER_CONCURRENCY, lease=JOB_LEASE):
+        self.bot, self.q = bot, q or queue()
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency, self.lease = concurrency, lease
+        self.running = {}   # job id -> task
+        self.stopping = False
+
+    async def run(self):
+        sem = asyncio.Semaphore(self.concurrency)
+        last_purge = 0.0
+        while not self.stopping:
+            await sem.acquire()
+            if self.stopping: break
+            try:
+                job = await asyncio.to_thread(self.q.claim, self.name, self.lease)
+            except Exception as e:
+                print(f"Job claim failed: {e}")
+                job = None
+            if job is None:
+                sem.release()
+                if time.monotonic() - last_purge > 3600:
+                    last_purge = time.monotonic()
+                    await asyncio.to_thread(self.q.purge)
+                await asyncio.sleep(JOB_POLL)
+                continue
+            task = asyncio.create_task(self._execute(job))
+            self.running[job.id] = task
+            task.add_done_callback(lambda _, job_id=job.id: (self.running.pop(job_id, None), sem.release()))
+        if self.running: await asyncio.gather(*self.running.values(), return_exceptions=True)
+
+    def stop(self):
+        """Stops claiming and cancels running jobs; their lease runs out and another worker retries them."""
+        self.stopping = True
+        for t in list(self.running.values()): t.cancel()
+
+    async def _heartbeat(self, job, task):
+        while True:
+            await asyncio.sleep(max(1.0, self.lease / 4))
+            if not await asyncio.to_thread(self.q.heartbeat, job.id, self.name):
+                task.cancel()   # cancelled by the user (MAIN MENU)
+                return
+
+    async def _execute(self, job):
+        if job.attempts > JOB_MAX_ATTEMPTS:
+            await asyncio.to_thread(self.q.finish, job.id, self.name, "failed", error="too many attempts")
+            try: await self.bot.send_message(job.chat_id, "❌ This job kept failing and was dropped. Please try again.")
+            except Exception: pass
+            return
+        flow = TASKS.get(job.kind)
+        if flow is None:
+            return await asyncio.to_thread(self.q.finish, job.id, self.name, "failed", error=f"unknown task {job.kind}")
+        run = asyncio.create_task(flow(job_message(self.bot, job), job.uid, **job.payload))
+        beat = asyncio.create_task(self._heartbeat(job, run))
+        try:
+            res = await run
+            await asyncio.to_thread(self.q.finish, job.id, self.name, "done", res)
+        except asyncio.CancelledError:
+            if self.stopping: raise
+        except Exception as e:
+            print(f"Job {job!r} failed: {e}")
+            await asyncio.to_thread(self.q.finish, job.id, self.name, "failed", error=str(e)[:500])
+            try: await self.bot.send_message(job.chat_id, f"❌ Error: {e}")
+            except Exception: pass
+        finally:
+            beat.cancel()
+
+
+def worker_main(make_bot, spec=None, name=None, tasks_module="bot_core"):
+    """Process entry point: one worker (with its own job pool) until killed."""
+    import importlib
+    if spec: configure(spec)
+    importlib.import_module(tasks_module)   # registers the flows
+    if queue() is None: raise SystemExit("JOB_QUEUE is not set, nothing to work on")
+
+    async def main():
+        from jobs import executor
+        bot = make_bot()
+        if hasattr(bot, "initialize"): await bot.initialize()
+        worker = Worker(bot, name=name)
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, worker.stop)
+        try:
+            await worker.run()
+        finally:
+            executor.shutdown()
+            if hasattr(bot, "shutdown"): await bot.shutdown()
+    asyncio.run(main())
+
+
+def start_local_workers(n, make_bot, spec=None, tasks_module="bot_core"):
+    """Starts n worker processes on this host (JOB_WORKERS in main.py, the harness)."""
+    ctx = multiprocessing.get_context("spawn")
+    procs = []
+    for i in range(n):
+        p = ctx.Process(target=worker_main, args=(make_bot, spec or JOB_QUEUE, f"local-{i}", tasks_module),
+                        name=f"job-worker-{i}")
+        p.start()
+        procs.append(p)
+    return procs
+
+
+def stop_local_workers(procs, timeout=5):
+    for p in procs: p.terminate()
+    for p in procs:
+        p.join(timeout)
+        if p.is_alive(): p.kill()
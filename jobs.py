@@ -0,0 +1,198 @@
+import os
+import time
+import asyncio
+import functools
+import contextvars
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+import progress
+
+# ================= JOB EXECUTOR =================
+# Heavy file work (parsing, validation, VCF rendering) runs here instead of on
+# the event loop, so one user's big upload doesn't freeze everyone else.
+
+CPU_WORKERS = int(os.environ.get("JOB_CPU_WORKERS", os.cpu_count() or 2))
+IO_WORKERS = int(os.environ.get("JOB_IO_WORKERS", "8"))
+PER_USER_JOBS = int(os.environ.get("JOB_PER_USER", "1"))
+
+_tracking = contextvars.ContextVar("job_tracking", default=False)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobExecutor:
+    def __init__(self, cpu_workers=CPU_WORKERS, io_workers=IO_WORKERS, per_user=PER_USER_JOBS):
+        self.cpu_workers = cpu_workers
+        self.io_workers = io_workers
+        self.per_user = per_user
+        self._cpu = None
+        self._io = None
+        self._limits = {}   # uid -> [Semaphore, jobs holding or waiting], dropped at 0
+        self._tasks = {}    # uid -> handler tasks that are running jobs
+        self.waiting = 0
+        self.running = 0
+        self._slots = None
+        self._free_slots = list(range(progress.SLOTS))
+
+    def _progress_slots(self):
+        if self._slots is None:
+            self._slots = multiprocessing.Array("d", progress.SLOTS, lock=False)
+            progress.init_worker(self._slots)  # thread pool jobs use it directly
+        return self._slots
+
+    def _pool(self, cpu):
+        if cpu:
+            if self._cpu is None:
+                self._cpu = ProcessPoolExecutor(self.cpu_workers, initializer=progress.init_worker,
+                                                initargs=(self._progress_slots(),))
+            return self._cpu
+        if self._io is None:
+            self._progress_slots()
+            self._io = ThreadPoolExecutor(self.io_workers, thread_name_prefix="job-io")
+        return self._io
+
+    def _call(self, fn, args=(), kwargs={}, slot=None):
+        name = getattr(fn, "__name__", "job")
+        if metrics.should_profile(name):
+            args, fn = (fn,) + tuple(args), metrics.run_profiled
+        if slot is not None:
+            args, fn = (slot, fn) + tuple(args), progress.run_in_slot
+        return functools.partial(fn, *args, **kwargs)
+
+    async def _watch(self, future, slot, on_progress):
+        """Feeds on_progress from the job's slot until it finishes."""
+        # a cancelled wait leaves the job running, keep its slot until it ends
+        future.add_done_callback(lambda _: self._free_slots.append(slot))
+        while not future.done():
+            on_progress(self._slots[slot])
+            await asyncio.wait([future], timeout=0.5)
+        return await future
+
+    def _track(self, uid):
+        """Registers the calling handler task for cancel(); it is forgotten once it ends."""
+        if not _tracking.get(): return
+        task = asyncio.current_task()
+        tasks = self._tasks.setdefault(uid, set())
+        if task not in tasks:
+            tasks.add(task)
+            task.add_done_callback(lambda t: self._untrack(uid, t))
+
+    async def _acquire(self, uid, name):
+        """Waits for this user's job slot, counted in the queue metrics."""
+        limit = self._limits.setdefault(uid, [asyncio.Semaphore(self.per_user), 0])
+        limit[1] += 1
+        t = time.perf_counter()
+        self.waiting += 1
+        try:
+            await limit[0].acquire()
+        except BaseException:
+            self._release(uid, limit, acquired=False)
+            raise
+        finally:
+            self.waiting -= 1
+        metrics.job_wait_seconds.observe(name, time.perf_counter() - t)
+        return limit
+
+    def _release(self, uid, limit, acquired=True):
+        if acquired: limit[0].release()
+        limit[1] -= 1
+        if not limit[1] and self._limits.get(uid) is limit: del self._limits[uid]
+
+    async def run(self, uid, fn, *args, cpu=True, on_progress=None, **kwargs):
+        """
+        Runs fn(*args, **kwargs) in the process pool (or thread pool with
+        cpu=False). With on_progress, fractions the job passes to
+        progress.report() are forwarded to it about twice a second.
+        """
+        self._track(uid)
+        name = getattr(fn, "__name__", "job")
+        limit = await self._acquire(uid, name)
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self._pool(cpu)
+            slot = self._free_slots.pop() if on_progress and self._free_slots else None
+            with metrics.job_seconds.time(name):
+                if slot is None:
+                    return await loop.run_in_executor(pool, self._call(fn, args, kwargs))
+                self._slots[slot] = 0.0
+                future = loop.run_in_executor(pool, self._call(fn, args, kwargs, slot))
+                return await self._watch(future, slot, on_progress)
+        finally:
+            self.running -= 1
+            self._release(uid, limit)
+
+    async def run_chunks(self, uid, fn, chunks, cpu=True, on_progress=None):
+        """Runs fn over every chunk in parallel, results in chunk order."""
+        self._track(uid)
+        name = getattr(fn, "__name__", "job")
+        limit = await self._acquire(uid, name)
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self._pool(cpu)
+            futures = [loop.run_in_executor(pool, self._call(fn, (c,))) for c in chunks]
+            if on_progress:
+                done = [0]
+                def finished(_):
+                    done[0] += 1
+                    on_progress(done[0] / len(futures))
+                for f in futures: f.add_done_callback(finished)
+            with metrics.job_seconds.time(name):
+                return await asyncio.gather(*futures)
+        finally:
+            self.running -= 1
+            self._release(uid, limit)
+
+    def cancel(self, uid):
+        """Cancels every handler of this user that is waiting on a job."""
+        tasks = self._tasks.pop(uid, set())
+        for t in tasks:
+            if t is not asyncio.current_task(): t.cancel()
+        return len(tasks)
+
+    def _untrack(self, uid, task):
+        tasks = self._tasks.get(uid)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks: self._tasks.pop(uid, None)
+
+    def shutdown(self):
+        for pool in (self._cpu, self._io):
+            if pool is not None: pool.shutdown(wait=False, cancel_futures=True)
+        self._cpu = self._io = None
+
+
+executor = JobExecutor()
+metrics.queue_depth.track("jobs_waiting", lambda: executor.waiting)
+metrics.queue_depth.track("jobs_running", lambda: executor.running)
+
+
+def cancellable(handler):
+    """
+    Runs the handler in its own task so `executor.cancel(uid)` can stop it
+    (e.g. when the user presses MAIN MENU) without touching the caller.
+    """
+    @functools.wraps(handler)
+    async def wrapper(update, ctx):
+        uid = update.effective_user.id
+
+        async def tracked():
+            _tracking.set(True)
+            return await handler(update, ctx)
+
+        task = asyncio.ensure_future(tracked())
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # cancelled through executor.cancel() -> quietly stop
+            if task.cancelled(): return None
+            task.cancel()
+            raise
+        finally:
+            executor._untrack(uid, task)
+    return wrapper
@@ -1,56 +1,115 @@
-import os, threading
-import psycopg2
-from flask import Flask
+import os, time, asyncio, threading, functools
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler,
+    ApplicationBuilder, CommandHandler, ExtBot,
     CallbackQueryHandler, MessageHandler,
     ContextTypes, filters
 )
 
 # ===== IMPORT ORIGINAL BOT =====
 import bot_core  # tumhara original script
+import filestore
+import jobqueue
+import metrics
+from ratelimit import OutboundLimiter
 
 # ================= ENV =================
 BOT_TOKEN = os.environ.get("BOT_TOKEN")
 OWNER_ID = int(os.environ.get("OWNER_ID"))
 DATABASE_URL = os.environ.get("DATABASE_URL")
 PORT = int(os.environ.get("PORT", "10000"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "5"))
+ALLOW_CACHE_TTL = int(os.environ.get("ALLOW_CACHE_TTL", "300"))
+# heavy modules imported in the background once the bot is taking updates
+PREWARM = [m for m in os.environ.get("PREWARM", "validation,numset,openpyxl").split(",") if m]
 
 # ================= DATABASE =================
-conn = psycopg2.connect(DATABASE_URL, sslmode="require")
-conn.autocommit = True
+db_pool = None
+
+def get_pool():
+    global db_pool
+    if db_pool is None:
+        from psycopg2.pool import ThreadedConnectionPool
+        db_pool = ThreadedConnectionPool(1, DB_POOL_MAX, DATABASE_URL, sslmode="require")
+    return db_pool
+
+def db_exec(sql, args=(), fetch=False):
+    """Runs one statement on a pooled connection, reconnecting once if it dropped."""
+    import psycopg2
+    for attempt in (1, 2):
+        pool = get_pool()
+        c, broken = pool.getconn(), False
+        try:
+            c.autocommit = True
+            with c.cursor() as cur:
+                cur.execute(sql, args)
+                return cur.fetchall() if fetch else None
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            if attempt == 2: raise
+        finally:
+            # every path hands the connection back, only a dropped one is closed
+            pool.putconn(c, close=broken)
 
 def init_db():
-    with conn.cursor() as cur:
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS allowed_users (
-            user_id BIGINT PRIMARY KEY
-        );
-        """)
+    db_exec("""
+    CREATE TABLE IF NOT EXISTS allowed_users (
+        user_id BIGINT PRIMARY KEY
+    );
+    """)
+
+# ===== ALLOWLIST CACHE =====
+# is_allowed runs on every update, so it only looks at this set. It is
+# loaded at startup, updated by db_add/db_remove and refreshed every
+# ALLOW_CACHE_TTL seconds to pick up changes made by other instances.
+# The first load runs in post_init next to polling; until it is in, updates
+# from anyone but the owner wait for it (allowed()).
+allowed_users = set()
+allowed_loaded_at = 0.0
+allowlist_ready = None
+
+def refresh_allowed():
+    global allowed_users, allowed_loaded_at
+    rows = db_exec("SELECT user_id FROM allowed_users", fetch=True)
+    allowed_users = {r[0] for r in rows}
+    allowed_loaded_at = time.monotonic()
+
+async def allowlist_refresher():
+    while True:
+        await asyncio.sleep(ALLOW_CACHE_TTL)
+        try:
+            await asyncio.to_thread(refresh_allowed)
+        except Exception as e:
+            print(f"Allowlist refresh failed: {e}")
 
 def is_allowed(uid: int):
     if uid == OWNER_ID:
         return True
-    with conn.cursor() as cur:
-        cur.execute("SELECT 1 FROM allowed_users WHERE user_id=%s", (uid,))
-        return cur.fetchone() is not None
+    return uid in allowed_users
+
+async def allowed(uid: int):
+    if uid != OWNER_ID and allowlist_ready is not None and not allowlist_ready.done():
+        await asyncio.shield(allowlist_ready)
+    return is_allowed(uid)
+
+async def load_allowlist():
+    try:
+        await asyncio.to_thread(init_db)
+        await asyncio.to_thread(refresh_allowed)
+    except Exception as e:
+        print(f"Allowlist load failed, retrying in {ALLOW_CACHE_TTL}s: {e}")
 
 def db_add(uid: int):
-    with conn.cursor() as cur:
-        cur.execute(
-            "INSERT INTO allowed_users(user_id) VALUES(%s) ON CONFLICT DO NOTHING",
-            (uid,)
-        )
+    db_exec("INSERT INTO allowed_users(user_id) VALUES(%s) ON CONFLICT DO NOTHING", (uid,))
+    allowed_users.add(uid)
 
 def db_remove(uid: int):
-    with conn.cursor() as cur:
-        cur.execute("DELETE FROM allowed_users WHERE user_id=%s", (uid,))
+    db_exec("DELETE FROM allowed_users WHERE user_id=%s", (uid,))
+    allowed_users.discard(uid)
 
 def db_list():
-    with conn.cursor() as cur:
-        cur.execute("SELECT user_id FROM allowed_users ORDER BY user_id")
-        return [str(r[0]) for r in cur.fetchall()]
+    rows = db_exec("SELECT user_id FROM allowed_users ORDER BY user_id", fetch=True)
+    return [str(r[0]) for r in rows]
 
 # ================= ADMIN UI =================
 def admin_menu():
@@ -73,7 +132,7 @@ orig_file = bot_core.handle_file
 async def start(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     uid = update.effective_user.id
 
-    if not is_allowed(uid):
+    if not await allowed(uid):
         return await update.message.reply_text(
             "📂💾 *VCF Bot Access*\n"
             "Want my *VCF Converter Bot*?\n"
@@ -100,7 +159,7 @@ async def buttons(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     uid = q.from_user.id
     await q.answer()
 
-    if not is_allowed(uid):
+    if not await allowed(uid):
         return await q.answer("⛔ Private Bot", show_alert=True)
 
     # 🔐 OPEN ADMIN PANEL (OWNER ONLY)
@@ -121,7 +180,7 @@ async def buttons(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
             return await q.message.reply_text("🆔 User ID bhejo")
 
         if q.data == "admin_list":
-            users = db_list()
+            users = await asyncio.to_thread(db_list)
             return await q.message.reply_text(
                 "👥 Allowed Users:\n" + ("\n".join(users) if users else "None")
             )
@@ -139,7 +198,7 @@ async def handle_text(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     uid = update.effective_user.id
     txt = update.message.text.strip()
 
-    if not is_allowed(uid):
+    if not await allowed(uid):
         return
 
     # ----- ADMIN INPUT -----
@@ -150,10 +209,10 @@ async def handle_text(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         target = int(txt)
 
         if admin_state[uid] == "add":
-            db_add(target)
+            await asyncio.to_thread(db_add, target)
             msg = "✅ User access added"
         else:
-            db_remove(target)
+            await asyncio.to_thread(db_remove, target)
             msg = "❌ User access removed"
 
         admin_state.pop(uid, None)
@@ -164,32 +223,99 @@ async def handle_text(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 # ================= FILE =================
 async def handle_file(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     uid = update.effective_user.id
-    if not is_allowed(uid):
+    if not await allowed(uid):
         return
     return await orig_file(update, ctx)
 
 # ================= FLASK =================
-flask_app = Flask(__name__)
+# only polling mode serves through Flask, so it is imported there
+def run_flask():
+    from flask import Flask, Response
+    flask_app = Flask(__name__)
 
-@flask_app.route("/")
-def home():
-    return "Bot is running"
+    @flask_app.route("/")
+    def home():
+        return "Bot is running"
+
+    @flask_app.route("/metrics")
+    def metrics_page():
+        return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
-def run_flask():
     flask_app.run(host="0.0.0.0", port=PORT)
 
 # ================= MAIN =================
-if __name__ == "__main__":
-    init_db()
-
-    threading.Thread(target=run_flask, daemon=True).start()
-
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+# BOT_MODE=webhook serves updates + health checks from one uvicorn app
+# (see webhook.py); the default stays long polling with the Flask thread.
+# BOT_MODE=worker only runs queued heavy jobs (needs JOB_QUEUE, see
+# jobqueue.py); start as many as you like, on any host. JOB_WORKERS=N starts
+# N of them next to the bot on this host (SQLite queue unless JOB_QUEUE is set).
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+CONCURRENT_UPDATES = int(os.environ.get("CONCURRENT_UPDATES", "256"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "0"))
+
+def prewarm():
+    import importlib
+    for name in PREWARM:
+        t = time.perf_counter()
+        try:
+            mod = importlib.import_module(name)
+            if hasattr(mod, "prewarm"): mod.prewarm()
+        except Exception as e:
+            print(f"Prewarm of {name} failed: {e}")
+            continue
+        print(f"🔥 {name} ready in {time.perf_counter() - t:.2f}s")
+
+async def post_init(app):
+    global allowlist_ready
+    allowlist_ready = asyncio.create_task(load_allowlist())
+    app.bot_data["prewarm"] = asyncio.create_task(asyncio.to_thread(prewarm))
+    app.bot_data["allowlist_task"] = asyncio.create_task(allowlist_refresher())
+    app.bot_data["session_sweeper"] = asyncio.create_task(bot_core.sessions.sweeper())
+    app.bot_data["loop_lag"] = asyncio.create_task(metrics.loop_lag_monitor())
+    app.bot_data["temp_sweeper"] = asyncio.create_task(filestore.temp_sweeper())
+    metrics.queue_depth.track("updates", app.update_queue.qsize)
+
+async def post_shutdown(app):
+    # discarded blobs are deleted by a daemon thread, let it finish first
+    await asyncio.to_thread(filestore.flush_cleanup)
+
+def build_app(webhook=False):
+    builder = (
+        ApplicationBuilder().token(BOT_TOKEN)
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .rate_limiter(OutboundLimiter())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if webhook: builder = builder.updater(None)
+    app = builder.build()
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CallbackQueryHandler(buttons))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
     app.add_handler(MessageHandler(filters.Document.ALL, handle_file))
+    return app
 
-    print("🚀 Bot running with Inline Admin Panel")
-    app.run_polling()
+if __name__ == "__main__":
+    make_bot = functools.partial(ExtBot, BOT_TOKEN, rate_limiter=OutboundLimiter())
+    if BOT_MODE == "worker":
+        print("🛠 Job worker running")
+        jobqueue.worker_main(make_bot)
+        raise SystemExit
+
+    workers = []
+    if JOB_WORKERS:
+        if not jobqueue.enabled(): jobqueue.configure("sqlite:///jobs.db")
+        workers = jobqueue.start_local_workers(JOB_WORKERS, make_bot)
+        print(f"🛠 {JOB_WORKERS} local job workers")
+
+    if BOT_MODE == "webhook":
+        import webhook
+        print("🚀 Bot running in webhook mode")
+        webhook.serve(build_app(webhook=True), PORT, ready=lambda: allowed_loaded_at > 0)
+    else:
+        threading.Thread(target=run_flask, daemon=True).start()
+        app = build_app()
+        print("🚀 Bot running with Inline Admin Panel")
+        app.run_polling()
+    jobqueue.stop_local_workers(workers)
@@ -0,0 +1,135 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import progress
+from extractor import iter_raw_numbers
+from numset import NumberArray, decode
+from normalize import normalize
+
+# ================= STREAMING MERGE =================
+# Merge reads every input as a stream and writes the output as it goes.
+# Dedup keeps up to MERGE_MEMORY_NUMBERS numbers in a set; beyond that the
+# seen numbers move to a temporary SQLite table that is checked a batch at a
+# time. Peak memory no longer grows with the size of the inputs. Each batch
+# is normalised to E.164 (normalize.py) before dedup, so "+91 98765..." and
+# "098765..." count as the same number.
+
+MERGE_MEMORY_NUMBERS = int(os.environ.get("MERGE_MEMORY_NUMBERS", "1000000"))
+MERGE_BATCH = 20000
+MESSAGE_LIMIT = 4000   # Telegram allows 4096 characters per message
+
+
+class SpillingDeduper:
+    """First-seen filter for encoded numbers, spilling to SQLite when big."""
+
+    def __init__(self, limit=MERGE_MEMORY_NUMBERS):
+        self.limit = limit
+        self.mem = set()
+        self.extra = set()   # numbers too long to encode
+        self.db = None
+        self.tmpdir = None
+
+    def _spill(self):
+        if self.db is None:
+            self.tmpdir = tempfile.mkdtemp(prefix="vcfbot-merge-")
+            self.db = sqlite3.connect(os.path.join(self.tmpdir, "seen.db"))
+            self.db.execute("PRAGMA journal_mode=OFF")
+            self.db.execute("PRAGMA synchronous=OFF")
+            self.db.execute("CREATE TABLE seen (code INTEGER PRIMARY KEY)")
+            self.db.execute("CREATE TEMP TABLE batch (seq INTEGER PRIMARY KEY, code INTEGER)")
+        self.db.executemany("INSERT OR IGNORE INTO seen VALUES (?)", ((c,) for c in self.mem))
+        self.db.commit()
+        self.mem = set()
+
+    def filter(self, codes):
+        """Returns the codes not seen before, in order (duplicates inside the batch dropped)."""
+        fresh = [c for c in dict.fromkeys(codes) if c not in self.mem]
+        if self.db is not None and fresh:
+            self.db.execute("DELETE FROM batch")
+            self.db.executemany("INSERT INTO batch(code) VALUES (?)", ((c,) for c in fresh))
+            fresh = [r[0] for r in self.db.execute(
+                "SELECT b.code FROM batch b LEFT JOIN seen s ON s.code = b.code "
+                "WHERE s.code IS NULL ORDER BY b.seq")]
+        self.mem.update(fresh)
+        if len(self.mem) > self.limit: self._spill()
+        return fresh
+
+    def filter_extra(self, numbers):
+        fresh = [n for n in dict.fromkeys(numbers) if n not in self.extra]
+        self.extra.update(fresh)
+        return fresh
+
+    def close(self):
+        if self.db is not None: self.db.close()
+        if self.tmpdir: shutil.rmtree(self.tmpdir, ignore_errors=True)
+        self.db = self.tmpdir = None
+        self.mem = set()
+
+
+def _batches(src, country_code=""):
+    batch = NumberArray()
+    for n in iter_raw_numbers(src):
+        batch.append(n)
+        if len(batch) >= MERGE_BATCH:
+            batch = normalize(batch, country_code)
+            yield batch.codes, batch.extra
+            batch = NumberArray()
+    if batch:
+        batch = normalize(batch, country_code)
+        yield batch.codes, batch.extra
+
+
+def merge_stream(sources, emit, limit=MERGE_MEMORY_NUMBERS, country_code=""):
+    """
+    Streams every source (a list) through one deduper and calls
+    emit(list_of_numbers) with the numbers that are new, in first-seen order. Returns per-source
+    stats: name, numbers read, new numbers contributed, overlap (numbers that
+    already came from an earlier file or earlier in the same file). Numbers
+    are emitted canonical, with country_code applied.
+    """
+    dedup = SpillingDeduper(limit)
+    stats = []
+    try:
+        for i, src in enumerate(sources):
+            row = {"name": getattr(src, "name", str(src)), "total": 0, "new": 0, "overlap": 0}
+            try:
+                with progress.span(i / len(sources), (i + 1) / len(sources)):
+                    for codes, extra in _batches(src, country_code):
+                        fresh = [decode(c) for c in dedup.filter(codes)] + dedup.filter_extra(extra)
+                        row["total"] += len(codes) + len(extra)
+                        row["new"] += len(fresh)
+                        if fresh: emit(fresh)
+            except Exception as e:
+                print(f"Error extracting: {e}")
+                row["error"] = str(e)
+            row["overlap"] = row["total"] - row["new"]
+            stats.append(row)
+    finally:
+        dedup.close()
+    return stats
+
+
+def _units(text):
+    """Length as Telegram counts it (UTF-16 code units, emoji are 2)."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def format_merge_stats(stats, limit=MESSAGE_LIMIT):
+    """Markdown report that fits one message: per-file lines past `limit`
+    are dropped whole and counted in an "…and N more" line."""
+    head = "📊 **Merge Report**"
+    total_new = sum(s["new"] for s in stats)
+    foot = f"━━━━━━━━━━━━━━━━━━\n✅ **Unique Numbers:** `{total_new}`"
+    lines, used = [], _units(head) + _units(foot) + 40   # room for the "more" line
+    for i, s in enumerate(stats):
+        # nothing can be escaped inside a code span, a backtick would close it
+        name = s["name"].replace("`", "'")
+        line = f"📄 `{name}`: {s['total']} read | ➕ {s['new']} new | ♻️ {s['overlap']} overlap"
+        if used + _units(line) + 1 > limit:
+            lines.append(f"…and {len(stats) - i} more file(s)")
+            break
+        lines.append(line)
+        used += _units(line) + 1
+    return "\n".join([head] + lines + [foot])
@@ -0,0 +1,169 @@
+import os
+import time
+import bisect
+import random
+import asyncio
+import threading
+from contextlib import contextmanager
+
+# ================= METRICS =================
+# Small in-process metrics registry rendered in Prometheus text format on
+# /metrics. Stages (download, parse, validate, render, upload) are timed from
+# the event loop side, since counters bumped inside pool workers would stay
+# in the worker process. Job timings come from the executor itself.
+#
+# PROFILE_JOBS=all (or a comma list of job names) runs a PROFILE_SAMPLE
+# fraction of those jobs under cProfile and dumps .prof files to PROFILE_DIR.
+
+PREFIX = "vcfbot_"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+PROFILE_JOBS = {j.strip() for j in os.environ.get("PROFILE_JOBS", "").split(",") if j.strip()}
+PROFILE_SAMPLE = float(os.environ.get("PROFILE_SAMPLE", "0.05"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+_lock = threading.Lock()
+_registry = []
+
+
+def _labels(label, key):
+    return f'{{{label}="{key}"}}' if label else ""
+
+
+class Counter:
+    def __init__(self, name, help, label):
+        self.name, self.help, self.label = PREFIX + name, help, label
+        self.values = {}
+        _registry.append(self)
+
+    def inc(self, key, n=1):
+        with _lock: self.values[key] = self.values.get(key, 0) + n
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}\n# TYPE {self.name} counter"
+        for key, v in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.label, key)} {v}"
+
+
+class Gauge:
+    """Values are read from callbacks at scrape time (queue sizes etc.)."""
+
+    def __init__(self, name, help, label):
+        self.name, self.help, self.label = PREFIX + name, help, label
+        self.sources = {}
+        _registry.append(self)
+
+    def track(self, key, fn):
+        self.sources[key] = fn
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}\n# TYPE {self.name} gauge"
+        for key, fn in sorted(self.sources.items()):
+            try: v = fn()
+            except Exception: continue
+            yield f"{self.name}{_labels(self.label, key)} {v}"
+
+
+class Histogram:
+    def __init__(self, name, help, label, buckets=BUCKETS):
+        self.name, self.help, self.label, self.buckets = PREFIX + name, help, label, buckets
+        self.series = {}  # key -> [per-bucket counts..., +Inf count, sum]
+        _registry.append(self)
+
+    def observe(self, key, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            s = self.series.get(key)
+            if s is None: s = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += value
+
+    @contextmanager
+    def time(self, key):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(key, time.perf_counter() - t)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}\n# TYPE {self.name} histogram"
+        with _lock: series = {k: list(s) for k, s in self.series.items()}
+        for key, s in sorted(series.items()):
+            lab = f'{self.label}="{key}",' if self.label else ""
+            total = 0
+            for b, n in zip(self.buckets + ("+Inf",), s[:-1]):
+                total += n
+                yield f'{self.name}_bucket{{{lab}le="{b}"}} {total}'
+            yield f"{self.name}_sum{_labels(self.label, key)} {s[-1]:.6f}"
+            yield f"{self.name}_count{_labels(self.label, key)} {total}"
+
+
+stage_seconds = Histogram("stage_seconds", "Time spent per processing stage", "stage")
+job_seconds = Histogram("job_seconds", "Worker pool job run time", "job")
+job_wait_seconds = Histogram("job_wait_seconds", "Time a job waited for its user's slot", "job")
+loop_lag_seconds = Histogram("loop_lag_seconds", "Event loop scheduling delay", "",
+                             buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 5))
+bytes_total = Counter("bytes_total", "Bytes moved per stage", "stage")
+numbers_total = Counter("numbers_total", "Phone numbers handled per stage", "stage")
+stage_errors = Counter("stage_errors_total", "Stages that raised", "stage")
+queue_depth = Gauge("queue_depth", "Items waiting or running", "queue")
+cache_events = Counter("result_cache_total", "Result cache lookups by kind and outcome", "event")
+cache_bytes = Gauge("result_cache_bytes", "Bytes held by the result cache", "level")
+api_calls = Counter("api_calls_total", "Bot API requests sent by endpoint", "endpoint")
+api_events = Counter("api_limiter_total", "Rate limiter flood waits and merged edits", "event")
+api_wait_seconds = Histogram("api_wait_seconds", "Time a Bot API request waited for its rate limit", "lane")
+
+
+def add(stage, nbytes=0, numbers=0):
+    if nbytes: bytes_total.inc(stage, nbytes)
+    if numbers: numbers_total.inc(stage, numbers)
+
+
+@contextmanager
+def timed(stage, nbytes=0, numbers=0):
+    """Times a block (sync or around awaits) as one stage run."""
+    t = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(stage)
+        raise
+    finally:
+        stage_seconds.observe(stage, time.perf_counter() - t)
+    add(stage, nbytes, numbers)
+
+
+async def loop_lag_monitor(every=0.5):
+    """Measures how late the loop wakes up from a sleep; >0.1s means something is blocking it."""
+    loop = asyncio.get_running_loop()
+    while True:
+        t = loop.time()
+        await asyncio.sleep(every)
+        loop_lag_seconds.observe("", max(0.0, loop.time() - t - every))
+
+
+def render():
+    lines = []
+    for m in _registry: lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ===== PROFILING =====
+
+def should_profile(name):
+    return bool(PROFILE_JOBS) and ("all" in PROFILE_JOBS or name in PROFILE_JOBS) and random.random() < PROFILE_SAMPLE
+
+
+def run_profiled(fn, *args, **kwargs):
+    """Runs fn under cProfile (in the worker) and dumps the stats next to the others."""
+    import cProfile
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(fn, *args, **kwargs)
+    finally:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = getattr(fn, "__name__", "job")
+        prof.dump_stats(os.path.join(PROFILE_DIR, f"{name}-{int(time.time() * 1000)}-{os.getpid()}.prof"))
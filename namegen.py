@@ -0,0 +1,45 @@
+import os
+import zipfile
+
+import progress
+from filestore import BlobWriter
+
+# ================= NAME GENERATOR =================
+# NAME GENERATE makes "<base> 1" .. "<base> N". Nothing holds the whole list:
+# pages are built from their index range, and the file is written BLOCK
+# names at a time, zipped once it passes NAMES_ZIP_OVER.
+
+NAMES_MAX = int(os.environ.get("NAMES_MAX", "10000000"))
+NAMES_ZIP_OVER = int(os.environ.get("NAMES_ZIP_OVER", "1000000"))
+PAGE_SIZE = 100
+PAGED_MAX = 5000        # up to this many names are shown page by page
+BASE_MAX = 32           # keeps a page well under Telegram's 4096 chars
+BLOCK = 50000
+
+
+def pages(count):
+    return (count + PAGE_SIZE - 1) // PAGE_SIZE
+
+
+def name_page(base, count, page):
+    """Text of page `page` (0 based)."""
+    lo = page * PAGE_SIZE
+    return "\n".join(f"{base} {i}" for i in range(lo + 1, min(lo + PAGE_SIZE, count) + 1))
+
+
+def _write_names(out, base, count):
+    for lo in range(0, count, BLOCK):
+        hi = min(lo + BLOCK, count)
+        out.write(("\n".join(f"{base} {i}" for i in range(lo + 1, hi + 1)) + ("\n" if hi < count else "")).encode())
+        progress.report(hi / count)
+
+
+def write_names(base, count):
+    """names.txt with count names, or names.zip holding it past NAMES_ZIP_OVER."""
+    if count <= NAMES_ZIP_OVER:
+        with BlobWriter("names.txt") as w: _write_names(w, base, count)
+        return w.close()
+    with BlobWriter("names.zip") as w:
+        with zipfile.ZipFile(w, "w", zipfile.ZIP_DEFLATED, compresslevel=5) as z:
+            with z.open("names.txt", "w", force_zip64=True) as f: _write_names(f, base, count)
+    return w.close()
@@ -0,0 +1,111 @@
+import re
+from array import array
+from functools import lru_cache
+
+from numset import NumberArray, MAX_DIGITS, encode, numpy
+
+# ================= E.164 NORMALISATION =================
+# The extracted tokens are made canonical once per country code, and
+# everything downstream (VCF, TXT/CSV/XLSX, merge, validation) just puts "+"
+# in front. Canonical means E.164 digits without the "+", so never run
+# canonical numbers through here again with a country code. Rules:
+#   - a number written with "+" is international already: kept as is
+#   - "00" + at least INTL_MIN digits is an international call: "00" dropped
+#   - with a country code set, a leading trunk "0" is dropped and the code is
+#     put in front, unless the number already starts with the code and the
+#     rest has a mobile length of that country (phonenumbers metadata)
+# Packed numbers (NumberArray.codes) are handled in bulk with numpy on the
+# integer codes: digit count from a searchsorted over powers of ten, the
+# leading 1/2 of the code tells a "+" apart, then the rules above as masks. Without numpy the same rules run per number.
+
+INTL_MIN = 7
+NON_DIGIT_RE = re.compile(r"\D+")
+POW10 = [10 ** i for i in range(MAX_DIGITS + 2)]
+
+
+@lru_cache(maxsize=None)
+def country_rule(country_code):
+    """(calling code digits, national lengths) for a "+91" style setting, None when unset."""
+    cc = NON_DIGIT_RE.sub("", country_code or "")
+    if not cc: return None
+    import phonenumbers
+    from phonenumbers.phonemetadata import PhoneMetadata
+    lengths = set()
+    for region in phonenumbers.COUNTRY_CODE_TO_REGION_CODE.get(int(cc), ()):
+        md = PhoneMetadata.metadata_for_region_or_calling_code(int(cc), region)
+        desc = md and (md.mobile if md.mobile and md.mobile.possible_length else md.general_desc)
+        if desc and desc.possible_length: lengths.update(desc.possible_length)
+    # unknown code: anything long enough to be a phone number
+    return cc, frozenset(lengths or range(INTL_MIN, 16 - len(cc)))
+
+
+def normalize_one(n, rule=None):
+    """Canonical digits of one raw token (rule from country_rule)."""
+    d = NON_DIGIT_RE.sub("", n)
+    if n.lstrip().startswith("+"): return d
+    if len(d) >= INTL_MIN + 2 and d.startswith("00"): return d[2:]
+    if rule is None: return d
+    cc, lengths = rule
+    if d.startswith("0"): d = d[1:]
+    elif d.startswith(cc) and len(d) - len(cc) in lengths: return d
+    return cc + d
+
+
+def _normalize_codes(codes, rule):
+    """numpy version of normalize_one over packed codes -> (codes, numbers too long to pack)."""
+    np = numpy()
+    p10 = np.array(POW10, dtype=np.uint64)
+    a = np.frombuffer(codes, dtype=np.uint64)
+    nd = np.searchsorted(p10, a, side="right") - 1   # digits after the leading 1 or 2
+    plus = a >= 2 * p10[nd]
+    value = a - np.where(plus, 2 * p10[nd], p10[nd])
+    zeros = ~plus & (nd >= INTL_MIN + 2) & (value < p10[np.maximum(nd - 2, 0)])
+    nd = np.where(zeros, nd - 2, nd)
+    intl = plus | zeros
+    too_long = []
+    if rule is not None:
+        cc, lengths = rule
+        lc, ccv = len(cc), np.uint64(int(cc))
+        trunk = ~intl & (nd >= 1) & (value < p10[np.maximum(nd - 1, 0)])
+        nd = np.where(trunk, nd - 1, nd)
+        rest = np.maximum(nd - lc, 0)
+        has_cc = ~intl & ~trunk & (nd > lc) & (value // p10[rest] == ccv) & np.isin(rest, list(lengths))
+        local = ~intl & ~has_cc
+        fits = nd + lc <= MAX_DIGITS
+        add = local & fits
+        value = np.where(add, value + ccv * p10[np.where(add, nd, 0)], value)
+        nd = np.where(add, nd + lc, nd)
+        over = local & ~fits
+        if over.any():
+            too_long = [cc + str(int(c))[1:] for c in p10[nd[over]] + value[over]]
+            nd, value = nd[~over], value[~over]
+    return array("Q", (p10[nd] + value).tobytes()), too_long
+
+
+def normalize(nums, country_code=""):
+    """New NumberArray of canonical E.164 digits, in order (numbers that no
+    longer fit a code, or stop fitting one, move to the end like other extras)."""
+    rule = country_rule(country_code)
+    if not isinstance(nums, NumberArray): nums = NumberArray.from_iter(nums)
+    if numpy() is not None and len(nums.codes):
+        codes, extra = _normalize_codes(nums.codes, rule)
+    else:
+        codes, extra = array("Q"), []
+        for code in nums.codes:
+            code = str(code)
+            d = normalize_one(("+" if code[0] == "2" else "") + code[1:], rule)
+            c = encode(d)
+            if c is None: extra.append(d)
+            else: codes.append(c)
+    for n in nums.extra:
+        d = normalize_one(n, rule)
+        if not d: continue
+        c = encode(d)
+        if c is None: extra.append(d)
+        else: codes.append(c)
+    return NumberArray(codes, extra)
+
+
+def e164_unique(nums, country_code=""):
+    """normalize then dedupe: "+91 98765 43210" and "098765 43210" are one number."""
+    return normalize(nums, country_code).dedupe()
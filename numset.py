@@ -0,0 +1,138 @@
+from array import array
+
+# ================= COMPACT NUMBER STORAGE =================
+# Phone numbers as Python str cost 60-80 bytes each; here they are packed
+# into an array('Q') at 8 bytes each. A number is stored as int("1" + digits)
+# so leading zeros survive, or int("2" + digits) when it was written with a
+# "+": normalize.py needs to know the number was already international.
+# Iterating gives the digits only, every writer adds its own prefix. Digit
+# strings longer than MAX_DIGITS (junk, not phone numbers) are kept as plain
+# strings in `extra`.
+
+MAX_DIGITS = 18
+_np = False
+
+
+def prewarm():
+    numpy()
+
+
+def numpy():
+    """numpy, imported on first use (None if missing: pure python fallback, same results just slower)."""
+    global _np
+    if _np is False:
+        try: import numpy as _np
+        except ImportError: _np = None
+    return _np
+
+
+def encode(n):
+    digits = n.lstrip("+")
+    if len(digits) > MAX_DIGITS or not digits.isdigit():
+        return None
+    return int(("2" if len(digits) < len(n) else "1") + digits)
+
+
+def decode(code):
+    return str(code)[1:]
+
+
+class NumberArray:
+    """Ordered, list-like sequence of phone numbers backed by array('Q')."""
+
+    __slots__ = ("codes", "extra", "_sorted")
+
+    def __init__(self, codes=None, extra=None):
+        self.codes = codes if codes is not None else array("Q")
+        self.extra = extra if extra is not None else []
+        self._sorted = None
+
+    @classmethod
+    def from_iter(cls, numbers):
+        out = cls()
+        out.extend(numbers)
+        return out
+
+    def append(self, n):
+        code = encode(n)
+        if code is None: self.extra.append(n)
+        else: self.codes.append(code)
+        self._sorted = None
+
+    def extend(self, numbers):
+        if isinstance(numbers, NumberArray):
+            self.codes.extend(numbers.codes)
+            self.extra.extend(numbers.extra)
+        else:
+            codes, extra = self.codes, self.extra
+            for n in numbers:
+                code = encode(n)
+                if code is None: extra.append(n)
+                else: codes.append(code)
+        self._sorted = None
+
+    def dedupe(self):
+        """New NumberArray without duplicates, first occurrence order kept."""
+        np = numpy()
+        if np is not None and len(self.codes):
+            a = np.frombuffer(self.codes, dtype=np.uint64)
+            _, idx = np.unique(a, return_index=True)
+            idx.sort()
+            codes = array("Q", a[idx].tobytes())
+        else:
+            codes = array("Q", dict.fromkeys(self.codes))
+        return NumberArray(codes, list(dict.fromkeys(self.extra)))
+
+    def chunks(self, size):
+        for i in range(0, len(self), size):
+            yield self[i:i + size]
+
+    def __len__(self):
+        return len(self.codes) + len(self.extra)
+
+    def __iter__(self):
+        for code in self.codes:
+            yield str(code)[1:]
+        yield from self.extra
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return NumberArray.from_iter(list(self)[i])
+            n = len(self.codes)
+            return NumberArray(self.codes[start:min(stop, n)], self.extra[max(0, start - n):max(0, stop - n)])
+        if i < 0: i += len(self)
+        if i < len(self.codes): return decode(self.codes[i])
+        return self.extra[i - len(self.codes)]
+
+    def __contains__(self, n):
+        code = encode(n)
+        if code is None: return n in self.extra
+        np = numpy()
+        if np is not None:
+            if self._sorted is None: self._sorted = np.sort(np.frombuffer(self.codes, dtype=np.uint64))
+            pos = np.searchsorted(self._sorted, np.uint64(code))
+            return bool(pos < len(self._sorted) and self._sorted[pos] == code)
+        if self._sorted is None: self._sorted = set(self.codes)
+        return code in self._sorted
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __repr__(self):
+        return f"<NumberArray {len(self)} numbers>"
+
+    @property
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes) + sum(len(n) + 50 for n in self.extra)
+
+    def tolist(self):
+        return list(self)
+
+    def __getstate__(self):
+        return self.codes, self.extra
+
+    def __setstate__(self, state):
+        self.codes, self.extra = state
+        self._sorted = None
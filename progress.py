@@ -0,0 +1,175 @@
+import io
+import os
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+
+from telegram.constants import ParseMode
+from telegram.error import RetryAfter, BadRequest
+
+# ================= PROGRESS =================
+# Status messages that show real progress. Jobs report a fraction with
+# report(); in the process pool it goes through a shared array slot the
+# executor polls. The status message is only sent once a job has run for
+# PROGRESS_DELAY seconds, so quick operations get no extra API calls, and it
+# is edited at most every PROGRESS_INTERVAL seconds, only when the text changed.
+
+PROGRESS_DELAY = float(os.environ.get("PROGRESS_DELAY", "1.5"))
+PROGRESS_INTERVAL = float(os.environ.get("PROGRESS_INTERVAL", "2.5"))
+SLOTS = 256
+
+# ===== WORKER SIDE =====
+
+_slots = None              # shared array('d') from the executor
+_local = threading.local()  # slot index + span for the job on this thread
+
+
+def init_worker(slots):
+    global _slots
+    _slots = slots
+
+
+def run_in_slot(slot, fn, *args, **kwargs):
+    """Runs fn with report() pointed at `slot` (this is what the pool executes)."""
+    _local.slot, _local.span = slot, (0.0, 1.0)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _local.slot = None
+
+
+def active():
+    return _slots is not None and getattr(_local, "slot", None) is not None
+
+
+def report(fraction):
+    if not active(): return
+    lo, hi = _local.span
+    _slots[_local.slot] = lo + (hi - lo) * min(1.0, max(0.0, fraction))
+
+
+@contextmanager
+def span(lo, hi):
+    """report() calls inside the block cover [lo, hi] of the current range."""
+    if not active():
+        yield
+        return
+    old = _local.span
+    a, b = old
+    _local.span = (a + (b - a) * lo, a + (b - a) * hi)
+    try:
+        yield
+    finally:
+        _local.span = old
+        _slots[_local.slot] = max(_slots[_local.slot], a + (b - a) * hi)
+
+
+class TrackedReader(io.RawIOBase):
+    """Binary handle that reports how far into the file reading got."""
+
+    def __init__(self, fh, size):
+        self.fh, self.size, self.last = fh, max(size, 1), 0
+
+    def readable(self): return True
+    def seekable(self): return self.fh.seekable()
+    def seek(self, pos, whence=0): return self.fh.seek(pos, whence)
+    def tell(self): return self.fh.tell()
+
+    def readinto(self, b):
+        n = self.fh.readinto(b)
+        pos = self.fh.tell()
+        if pos - self.last >= self.size // 100 or pos >= self.size:
+            self.last = pos
+            report(pos / self.size)
+        return n
+
+    def close(self):
+        self.fh.close()
+        super().close()
+
+
+def tracked(fh, size):
+    """Wraps a binary handle for progress, only when a job slot is listening."""
+    if not active() or not size: return fh
+    return io.BufferedReader(TrackedReader(fh, size))
+
+
+# ===== BOT SIDE =====
+
+def bar(fraction, width=10):
+    filled = int(fraction * width + 1e-9)
+    return "■" * filled + "□" * (width - filled)
+
+
+class Progress:
+    """
+    async with Progress(message, "Splitting Files") as p:
+        ... p.update(done, total) or pass p.update / p.part(lo, hi) as callbacks
+
+    `status` is an existing message to use (and delete at the end) instead
+    of replying with a new one.
+    """
+
+    def __init__(self, message, title, status=None, delay=PROGRESS_DELAY, interval=PROGRESS_INTERVAL):
+        self.message, self.title, self.status = message, title, status
+        self.delay, self.interval = delay, interval
+        self.fraction = None
+        self._shown = None
+        self._stop = asyncio.Event()
+        self._task = None
+
+    def update(self, done, total=None):
+        f = done if total is None else (done / total if total else 1.0)
+        self.fraction = min(1.0, max(self.fraction or 0.0, f))
+
+    def part(self, lo, hi):
+        """Callback mapping a sub-step's 0..1 onto lo..hi of the whole job."""
+        return lambda f: self.update(lo + (hi - lo) * f)
+
+    def text(self):
+        elapsed = int(time.monotonic() - self.started)
+        if self.fraction is None:
+            return f"⏳ **{self.title}...**\n\n`⏱ {elapsed}s`"
+        return f"⏳ **{self.title}...**\n\n`[{bar(self.fraction)}] {int(self.fraction * 100)}%  ⏱ {elapsed}s`"
+
+    async def _sleep(self, seconds):
+        try:
+            await asyncio.wait_for(self._stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        await self._sleep(self.delay)
+        while not self._stop.is_set():
+            text = self.text()
+            if text != self._shown:
+                try:
+                    if self.status is None:
+                        self.status = await self.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
+                    else:
+                        await self.status.edit_text(text, parse_mode=ParseMode.MARKDOWN)
+                    self._shown = text
+                except RetryAfter as e:
+                    delay = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                    await self._sleep(delay)
+                    continue
+                except BadRequest:
+                    pass
+            await self._sleep(self.interval)
+
+    async def __aenter__(self):
+        self.started = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc):
+        # let an edit in flight finish so its message can be deleted below
+        self._stop.set()
+        try:
+            await self._task
+        except Exception:
+            pass
+        if self.status is not None:
+            try: await self.status.delete()
+            except Exception: pass
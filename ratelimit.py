@@ -0,0 +1,218 @@
+import os
+import time
+import asyncio
+import itertools
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import metrics
+
+# ================= OUTBOUND RATE LIMIT =================
+# Every Bot API call goes through OutboundLimiter (ApplicationBuilder
+# .rate_limiter, and the ExtBot of queue workers). A call needs a token from
+# the global bucket (RATE_GLOBAL/s) and from its chat's bucket (RATE_CHAT/s
+# with bursts of RATE_CHAT_BURST, RATE_GROUP/s for groups). Waiting calls are
+# served by lane, then arrival: taps and menus first, progress edits next,
+# file uploads last, so a big split never delays another user's buttons.
+# A call moves up one lane per RATE_AGING seconds waited, so a steady stream
+# of progress edits cannot starve the uploads of the same chat, and status
+# edits together get at most RATE_STATUS_SHARE of the global rate.
+# A flood wait (429) pauses that chat for retry_after and the call is retried.
+# Edits of the same message that are still waiting are merged: only the
+# newest text is sent and every caller gets its result. A message is edited
+# at most once per RATE_EDIT_INTERVAL, the rest of the time newer edits
+# just replace the waiting one.
+#
+# Buckets are per process: with queue workers, size RATE_GLOBAL per process.
+
+RATE_GLOBAL = float(os.environ.get("RATE_GLOBAL", "25"))
+RATE_CHAT = float(os.environ.get("RATE_CHAT", "1"))
+RATE_CHAT_BURST = float(os.environ.get("RATE_CHAT_BURST", "3"))
+RATE_GROUP = float(os.environ.get("RATE_GROUP", "0.33"))
+RATE_MAX_RETRIES = int(os.environ.get("RATE_MAX_RETRIES", "3"))
+RATE_AGING = float(os.environ.get("RATE_AGING", "2"))
+RATE_EDIT_INTERVAL = float(os.environ.get("RATE_EDIT_INTERVAL", "3"))
+RATE_STATUS_SHARE = float(os.environ.get("RATE_STATUS_SHARE", "0.2"))
+
+INTERACTIVE, STATUS, BULK = 0, 1, 2
+LANE_NAMES = ("interactive", "status", "bulk")
+LANES = {
+    "editMessageText": STATUS, "editMessageCaption": STATUS, "sendChatAction": STATUS,
+    "sendDocument": BULK, "sendMediaGroup": BULK, "sendPhoto": BULK, "sendVideo": BULK, "sendAudio": BULK,
+}
+IDLE_BUCKETS = 1000   # idle chat buckets / edit times are dropped past this many
+
+
+def retry_seconds(e):
+    return e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+
+
+class Bucket:
+    def __init__(self, rate, burst):
+        self.rate, self.burst = rate, burst
+        self.tokens, self.stamp, self.blocked = burst, time.monotonic(), 0.0
+
+    def wait(self, now):
+        """Seconds until a token is free (0 = now)."""
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        return max(self.blocked - now, (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0, 0.0)
+
+    def take(self):
+        self.tokens -= 1
+
+    def full(self, now):
+        return self.wait(now) == 0 and self.tokens >= self.burst
+
+
+class OutboundLimiter(BaseRateLimiter):
+    """Token buckets (global + per chat) with priority lanes, flood waits and edit merging."""
+
+    def __init__(self, rate=RATE_GLOBAL, chat_rate=RATE_CHAT, chat_burst=RATE_CHAT_BURST,
+                 group_rate=RATE_GROUP, max_retries=RATE_MAX_RETRIES):
+        self.rate, self.chat_rate, self.chat_burst = rate, chat_rate, chat_burst
+        self.group_rate, self.max_retries = group_rate, max_retries
+        self._reset()
+
+    def _reset(self):
+        self._global = self._status = None
+        self._chats = {}
+        self._waiting = []    # [lane, seq, chat, future, queued at, not before]
+        self._edits = {}      # (chat, message_id) -> (future set by a newer edit, ticket)
+        self._edited = {}     # (chat, message_id) -> time of the last edit sent
+        self._seq = itertools.count()
+        self._wake = None
+        self._task = None
+
+    def __getstate__(self):
+        # workers get a pickled copy of the bot factory; asyncio state stays behind
+        return {k: getattr(self, k) for k in ("rate", "chat_rate", "chat_burst", "group_rate", "max_retries")}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    async def initialize(self):
+        metrics.queue_depth.track("api_waiting", lambda: len(self._waiting))
+
+    async def shutdown(self):
+        if self._task: self._task.cancel()
+        for w in self._waiting:
+            if not w[3].done(): w[3].cancel()
+        self._reset()
+
+    # ----- scheduling -----
+
+    def _bucket(self, chat):
+        b = self._chats.get(chat)
+        if b is None:
+            if len(self._chats) > IDLE_BUCKETS:
+                now = time.monotonic()
+                self._chats = {c: x for c, x in self._chats.items() if not x.full(now)}
+            group = isinstance(chat, int) and chat < 0
+            b = self._chats[chat] = Bucket(self.group_rate, 1) if group else Bucket(self.chat_rate, self.chat_burst)
+        return b
+
+    async def _dispatch(self):
+        while self._waiting:
+            now, next_in = time.monotonic(), None
+            self._waiting.sort(key=lambda w: (w[0] - (now - w[4]) / RATE_AGING, w[1]))
+            for w in list(self._waiting):
+                lane, _, chat, fut, _, not_before = w
+                if fut.done():
+                    self._waiting.remove(w)
+                    continue
+                if not_before > now:
+                    next_in = not_before - now if next_in is None else min(next_in, not_before - now)
+                    continue
+                wait = self._global.wait(now)
+                if lane == STATUS: wait = max(wait, self._status.wait(now))
+                if chat is not None: wait = max(wait, self._bucket(chat).wait(now))
+                if wait == 0:
+                    self._global.take()
+                    if lane == STATUS: self._status.take()
+                    if chat is not None: self._bucket(chat).take()
+                    self._waiting.remove(w)
+                    fut.set_result(None)
+                else:
+                    next_in = wait if next_in is None else min(next_in, wait)
+            if not self._waiting: break
+            self._wake.clear()
+            try: await asyncio.wait_for(self._wake.wait(), next_in)
+            except asyncio.TimeoutError: pass
+        self._task = None
+
+    def _acquire(self, chat, lane, not_before=0.0):
+        if self._global is None:
+            self._global, self._wake = Bucket(self.rate, self.rate), asyncio.Event()
+            share = self.rate * RATE_STATUS_SHARE
+            self._status = Bucket(share, max(1.0, share))
+        fut = asyncio.get_running_loop().create_future()
+        self._waiting.append([lane, next(self._seq), chat, fut, time.monotonic(), not_before])
+        self._wake.set()
+        if self._task is None: self._task = asyncio.create_task(self._dispatch())
+        return fut
+
+    def _pause(self, chat, seconds):
+        b = self._global if chat is None else self._bucket(chat)
+        b.blocked = max(b.blocked, time.monotonic() + seconds)
+        b.tokens = min(b.tokens, 0.0)   # no burst right after the pause
+
+    # ----- requests -----
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat = data.get("chat_id")
+        lane = (rate_limit_args or {}).get("lane", LANES.get(endpoint, INTERACTIVE))
+        key = (chat, data.get("message_id")) if endpoint == "editMessageText" and data.get("message_id") else None
+        if key is None: return await self._send(callback, args, kwargs, endpoint, chat, lane)
+
+        # an edit still waiting when a newer one for the same message arrives
+        # hands over to it: the newer text is all the user would see anyway
+        loop = asyncio.get_running_loop()
+        result, superseded = loop.create_future(), loop.create_future()
+        ticket = self._acquire(chat, lane, self._edited.get(key, 0.0) + RATE_EDIT_INTERVAL)
+        older = self._edits.get(key)
+        if older is not None and not older[0].done():
+            older[0].set_result(result)
+            older[1].cancel()   # its token goes to someone else
+        self._edits[key] = (superseded, ticket)
+        try:
+            await asyncio.wait([ticket, superseded], return_when=asyncio.FIRST_COMPLETED)
+            if superseded.done():
+                metrics.api_events.inc("edit_merged")
+                sending = asyncio.shield(superseded.result())
+            else:
+                del self._edits[key]
+                self._edited[key] = time.monotonic()
+                if len(self._edited) > IDLE_BUCKETS:
+                    cutoff = time.monotonic() - RATE_EDIT_INTERVAL
+                    self._edited = {k: t for k, t in self._edited.items() if t > cutoff}
+                sending = self._send(callback, args, kwargs, endpoint, chat, lane, ticket)
+            try:
+                value = await sending
+            except Exception as e:
+                result.set_exception(e); result.exception()   # raised again by merged callers, if any
+                raise
+            except BaseException:
+                result.cancel()
+                raise
+            result.set_result(value)
+            return value
+        finally:
+            if not ticket.done(): ticket.cancel()
+            if self._edits.get(key, (None,))[0] is superseded: del self._edits[key]
+
+    async def _send(self, callback, args, kwargs, endpoint, chat, lane, ticket=None):
+        for attempt in range(self.max_retries + 1):
+            t = time.monotonic()
+            await (ticket or self._acquire(chat, lane))
+            ticket = None
+            metrics.api_wait_seconds.observe(LANE_NAMES[lane], time.monotonic() - t)
+            metrics.api_calls.inc(endpoint)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                metrics.api_events.inc("retry_after")
+                if attempt == self.max_retries: raise
+                self._pause(chat, retry_seconds(e))
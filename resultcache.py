@@ -0,0 +1,192 @@
+import os
+import stat
+import pickle
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import metrics
+
+# ================= RESULT CACHE =================
+# People upload the same export again and again (analyse it, then convert,
+# then split). Results are cached by the SHA-256 of the file bytes: the
+# extracted tokens ("tokens"), the E.164 numbers made from them for each
+# country code ("e164<cc>") and the analysis counts ("report"). Telegram's
+# file_unique_id is the same for the same file, so a known id maps straight
+# to its hash and a repeat upload is neither downloaded nor parsed.
+#
+# Both levels are LRU with a byte budget: RESULT_CACHE_MEMORY_MB in memory,
+# RESULT_CACHE_DISK_MB of pickles under RESULT_CACHE_DIR (0 turns a level off).
+# The pickles are loaded back, so the directory must be private: it is
+# created 0700, and one owned by someone else or open to other users turns
+# the disk level off instead of being used.
+
+CACHE_DIR = os.environ.get("RESULT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), f"vcfbot_cache_{os.getuid()}")
+MEMORY_BYTES = int(float(os.environ.get("RESULT_CACHE_MEMORY_MB", "64")) * 1024 * 1024)
+DISK_BYTES = int(float(os.environ.get("RESULT_CACHE_DISK_MB", "512")) * 1024 * 1024)
+ID_MAP_SIZE = 100_000
+
+
+def sha256(blob, block=1024 * 1024):
+    h = hashlib.sha256()
+    with blob.open() as fh:
+        for part in iter(lambda: fh.read(block), b""): h.update(part)
+    return h.hexdigest()
+
+
+def private_dir(path):
+    """Creates path 0700 if missing; True when it is a real directory only we can use."""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+    except OSError as e:
+        print(f"Result cache dir unusable: {e}")
+        return False
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        print(f"Result cache dir {path} is not private to this user, disk cache off")
+        return False
+    return True
+
+
+def _size(value):
+    return getattr(value, "nbytes", 0) + 1024
+
+
+class ResultCache:
+    """Two level LRU of (hash, kind) -> value. Thread safe; disk calls belong off the event loop."""
+
+    def __init__(self, path=CACHE_DIR, memory_bytes=MEMORY_BYTES, disk_bytes=DISK_BYTES):
+        self.path, self.memory_bytes, self.disk_bytes = path, memory_bytes, disk_bytes
+        self.mem = OrderedDict()   # (key, kind) -> (value, size)
+        self.mem_used = 0
+        self.ids = OrderedDict()   # file_unique_id -> key
+        self.files = None          # file name -> size, loaded on first disk use
+        self.disk_used = 0
+        self._lock = threading.Lock()
+
+    # ----- file_unique_id precheck -----
+
+    def key_for(self, unique_id):
+        with self._lock:
+            key = self.ids.get(unique_id)
+            if key: self.ids.move_to_end(unique_id)
+            return key
+
+    def link(self, unique_id, key):
+        if not unique_id: return
+        with self._lock:
+            self.ids[unique_id] = key
+            self.ids.move_to_end(unique_id)
+            if len(self.ids) > ID_MAP_SIZE: self.ids.popitem(last=False)
+
+    # ----- values -----
+
+    def get(self, key, kind):
+        with self._lock:
+            hit = self.mem.get((key, kind))
+            if hit is not None:
+                self.mem.move_to_end((key, kind))
+                metrics.cache_events.inc(f"{kind}_hit")
+                return hit[0]
+        value = self._disk_get(f"{key}.{kind}")
+        metrics.cache_events.inc(f"{kind}_{'miss' if value is None else 'disk_hit'}")
+        if value is not None: self._mem_put((key, kind), value)
+        return value
+
+    def put(self, key, kind, value):
+        self._mem_put((key, kind), value)
+        self._disk_put(f"{key}.{kind}", value)
+
+    def _mem_put(self, k, value):
+        size = _size(value)
+        if size > self.memory_bytes: return
+        with self._lock:
+            old = self.mem.pop(k, None)
+            if old: self.mem_used -= old[1]
+            self.mem[k] = (value, size)
+            self.mem_used += size
+            while self.mem_used > self.memory_bytes:
+                _, (_, s) = self.mem.popitem(last=False)
+                self.mem_used -= s
+
+    # ----- disk level: one pickle per entry, mtime is the LRU order -----
+
+    def _scan(self):
+        if self.files is not None: return
+        self.files = OrderedDict()
+        if not private_dir(self.path):
+            self.disk_bytes = 0
+            return
+        entries = []
+        for e in os.scandir(self.path):
+            if e.name.endswith(".tmp"):
+                try: os.remove(e.path)
+                except OSError: pass
+            elif e.is_file():
+                st = e.stat()
+                entries.append((st.st_mtime, e.name, st.st_size))
+        self.files = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.disk_used = sum(self.files.values())
+
+    def _disk_get(self, name):
+        if not self.disk_bytes: return None
+        with self._lock:
+            self._scan()
+            if not self.disk_bytes or name not in self.files: return None
+            self.files.move_to_end(name)
+        path = os.path.join(self.path, name)
+        try:
+            with open(path, "rb") as f: value = pickle.load(f)
+            os.utime(path)
+            return value
+        except Exception:
+            self._forget(name)
+            return None
+
+    def _disk_put(self, name, value):
+        if not self.disk_bytes: return
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.disk_bytes: return
+        with self._lock: self._scan()
+        if not self.disk_bytes: return
+        path = os.path.join(self.path, name)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f: f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Result cache write failed: {e}")
+            try: os.remove(tmp)
+            except OSError: pass
+            return
+        with self._lock:
+            self.disk_used += len(data) - self.files.pop(name, 0)
+            self.files[name] = len(data)
+            while self.disk_used > self.disk_bytes and len(self.files) > 1:
+                old, size = self.files.popitem(last=False)
+                self.disk_used -= size
+                try: os.remove(os.path.join(self.path, old))
+                except OSError: pass
+
+    def _forget(self, name):
+        with self._lock:
+            self.disk_used -= self.files.pop(name, 0)
+        try: os.remove(os.path.join(self.path, name))
+        except OSError: pass
+
+    def clear(self):
+        with self._lock:
+            self.mem.clear(); self.ids.clear()
+            self.mem_used = 0
+            self._scan()
+            for name in self.files:
+                try: os.remove(os.path.join(self.path, name))
+                except OSError: pass
+            self.files.clear()
+            self.disk_used = 0
+
+
+results = ResultCache()
+metrics.cache_bytes.track("memory", lambda: results.mem_used)
+metrics.cache_bytes.track("disk", lambda: results.disk_used)
@@ -0,0 +1,316 @@
+import os
+import time
+import zlib
+import pickle
+import asyncio
+import sqlite3
+import functools
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+# ================= SESSION STORE =================
+# Per-user state (settings, current mode, queued files...) with TTL expiry and
+# a memory cap (LRU). Entries can be written through to SQLite or Postgres so
+# several bot workers share the same sessions and a restart keeps them.
+#
+# SESSION_BACKEND: "memory" (default), "sqlite:///path/to/file.db" or
+# "postgres" (uses DATABASE_URL).
+
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory")
+SESSION_TTL = int(os.environ.get("SESSION_TTL", str(6 * 3600)))
+SESSION_MAX_ITEMS = int(os.environ.get("SESSION_MAX_ITEMS", "20000"))
+SESSION_MAX_MB = int(os.environ.get("SESSION_MAX_MB", "512"))
+
+
+def approx_size(value, depth=0):
+    """Rough byte size of a session value, good enough for the memory cap."""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value) + 50
+    if hasattr(value, "nbytes"):  # NumberArray, VCFIndex
+        return value.nbytes + 100
+    if hasattr(value, "size") and hasattr(value, "discard"):  # filestore.Blob
+        return (len(value.data) if value.data is not None else 0) + 100
+    if depth > 3:
+        return 64
+    if isinstance(value, dict):
+        return 240 + sum(approx_size(k, depth + 1) + approx_size(v, depth + 1) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        if not value: return 64
+        # big number lists: measure a sample and scale
+        items = list(value)[:64] if len(value) > 64 else value
+        per = sum(approx_size(v, depth + 1) for v in items) / len(items)
+        return 64 + int(per * len(value)) + 8 * len(value)
+    return 64
+
+
+def release(value):
+    """Frees temp files held by an expired value (filestore.Blob etc.)."""
+    if hasattr(value, "discard") and hasattr(value, "size"):
+        value.discard()
+    elif isinstance(value, dict):
+        for v in value.values(): release(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value: release(v)
+
+
+def pack(value):
+    return zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def unpack(data):
+    return pickle.loads(zlib.decompress(bytes(data)))
+
+
+# ===== BACKENDS =====
+
+class SQLiteBackend:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS bot_sessions (
+                ns TEXT, uid INTEGER, data BLOB, expires REAL,
+                PRIMARY KEY (ns, uid)
+            )""")
+
+    def load(self, uid):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT ns, data FROM bot_sessions WHERE uid=? AND expires>?", (uid, time.time())
+            ).fetchall()
+        return {ns: data for ns, data in rows}
+
+    def save(self, uid, upserts, deletes, expires):
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO bot_sessions(ns, uid, data, expires) VALUES(?,?,?,?)",
+                [(ns, uid, data, expires) for ns, data in upserts.items()])
+            self.conn.executemany("DELETE FROM bot_sessions WHERE ns=? AND uid=?", [(ns, uid) for ns in deletes])
+            self.conn.execute("COMMIT")
+
+    def purge(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM bot_sessions WHERE expires<=?", (time.time(),))
+
+
+class PostgresBackend:
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.conn = None
+        self.lock = threading.Lock()
+        self._exec("""
+        CREATE TABLE IF NOT EXISTS bot_sessions (
+            ns TEXT, uid BIGINT, data BYTEA, expires DOUBLE PRECISION,
+            PRIMARY KEY (ns, uid)
+        )""")
+
+    def _exec(self, sql, args=(), many=None, fetch=False):
+        import psycopg2
+        with self.lock:
+            for attempt in (1, 2):
+                try:
+                    if self.conn is None or self.conn.closed:
+                        self.conn = psycopg2.connect(self.dsn, sslmode="require")
+                        self.conn.autocommit = True
+                    with self.conn.cursor() as cur:
+                        if many is not None: cur.executemany(sql, many)
+                        else: cur.execute(sql, args)
+                        return cur.fetchall() if fetch else None
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    self.conn = None
+                    if attempt == 2: raise
+
+    def load(self, uid):
+        rows = self._exec("SELECT ns, data FROM bot_sessions WHERE uid=%s AND expires>%s", (uid, time.time()), fetch=True)
+        return {ns: data for ns, data in rows}
+
+    def save(self, uid, upserts, deletes, expires):
+        if upserts:
+            self._exec(
+                "INSERT INTO bot_sessions(ns, uid, data, expires) VALUES(%s,%s,%s,%s) "
+                "ON CONFLICT (ns, uid) DO UPDATE SET data=EXCLUDED.data, expires=EXCLUDED.expires",
+                many=[(ns, uid, data, expires) for ns, data in upserts.items()])
+        if deletes:
+            self._exec("DELETE FROM bot_sessions WHERE ns=%s AND uid=%s", many=[(ns, uid) for ns in deletes])
+
+    def purge(self):
+        self._exec("DELETE FROM bot_sessions WHERE expires<=%s", (time.time(),))
+
+
+def make_backend(spec=SESSION_BACKEND):
+    if not spec or spec == "memory":
+        return None
+    if spec.startswith("sqlite:///"):
+        return SQLiteBackend(spec[len("sqlite:///"):])
+    if spec == "postgres":
+        return PostgresBackend(os.environ.get("DATABASE_URL"))
+    raise ValueError(f"Unknown SESSION_BACKEND: {spec}")
+
+
+# ===== STORE =====
+
+class Namespace(MutableMapping):
+    """dict-like view of one kind of per-user data, keyed by user id."""
+
+    def __init__(self, hub, name):
+        self.hub = hub
+        self.name = name
+
+    def __getitem__(self, uid):
+        return self.hub._get(self.name, uid)
+
+    def __setitem__(self, uid, value):
+        self.hub._set(self.name, uid, value)
+
+    def __delitem__(self, uid):
+        self.hub._delete(self.name, uid)
+
+    def __iter__(self):
+        return iter([uid for ns, uid in list(self.hub._entries) if ns == self.name])
+
+    def __len__(self):
+        return sum(1 for ns, _ in self.hub._entries if ns == self.name)
+
+    def __contains__(self, uid):
+        try:
+            self.hub._get(self.name, uid)
+            return True
+        except KeyError:
+            return False
+
+
+class SessionHub:
+    def __init__(self, backend=None, ttl=SESSION_TTL, max_items=SESSION_MAX_ITEMS, max_mb=SESSION_MAX_MB):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_bytes = max_mb * 1024 * 1024
+        self.namespaces = {}
+        self._entries = OrderedDict()  # (ns, uid) -> [value, last_access, size]
+        self._bytes = 0
+        self._touched = {}             # uid -> set of ns changed since last save
+        self._lock = threading.RLock()
+
+    def namespace(self, name):
+        return self.namespaces.setdefault(name, Namespace(self, name))
+
+    # --- entry bookkeeping ---
+    def _get(self, ns, uid):
+        with self._lock:
+            key = (ns, uid)
+            e = self._entries.get(key)
+            if e is None:
+                raise KeyError(uid)
+            if time.monotonic() - e[1] > self.ttl:
+                self._drop(key, expired=True)
+                raise KeyError(uid)
+            e[1] = time.monotonic()
+            self._entries.move_to_end(key)
+            self._touched.setdefault(uid, set()).add(ns)
+            return e[0]
+
+    def _set(self, ns, uid, value):
+        with self._lock:
+            key = (ns, uid)
+            if key in self._entries:
+                self._bytes -= self._entries[key][2]
+            size = approx_size(value)
+            self._entries[key] = [value, time.monotonic(), size]
+            self._entries.move_to_end(key)
+            self._bytes += size
+            self._touched.setdefault(uid, set()).add(ns)
+            self._enforce_cap()
+
+    def _delete(self, ns, uid):
+        with self._lock:
+            key = (ns, uid)
+            if key not in self._entries:
+                raise KeyError(uid)
+            self._bytes -= self._entries.pop(key)[2]
+            self._touched.setdefault(uid, set()).add(ns)
+
+    def _drop(self, key, expired=False):
+        value, _, size = self._entries.pop(key)
+        self._bytes -= size
+        # only an expired value is freed for good: one evicted by the cap may
+        # still be in use by a running flow (a queued rename file, the
+        # editor's VCF) or live on in the backend. Its temp files, if it is
+        # really gone, are left to filestore.sweep_stale
+        if expired: release(value)
+
+    def _enforce_cap(self):
+        while self._entries and (len(self._entries) > self.max_items or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._drop(key)
+
+    def sweep(self):
+        """Drops expired entries (also called from the background loop)."""
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if now - e[1] > self.ttl]:
+                self._drop(key, expired=True)
+        if self.backend is not None: self.backend.purge()
+
+    # --- backend sync ---
+    def load_user(self, uid):
+        """Pulls this user's records from the backend (other workers may have changed them)."""
+        if self.backend is None: return
+        records = self.backend.load(uid)
+        with self._lock:
+            for ns in self.namespaces:
+                key = (ns, uid)
+                if ns in records:
+                    value = unpack(records[ns])
+                    if key in self._entries: self._bytes -= self._entries[key][2]
+                    size = approx_size(value)
+                    self._entries[key] = [value, time.monotonic(), size]
+                    self._bytes += size
+                elif key in self._entries:
+                    self._bytes -= self._entries.pop(key)[2]
+            self._enforce_cap()
+
+    def save_user(self, uid):
+        """Writes back whatever this user's handler touched."""
+        with self._lock:
+            touched = self._touched.pop(uid, set())
+            upserts, deletes = {}, []
+            for ns in touched:
+                e = self._entries.get((ns, uid))
+                if e is None:
+                    deletes.append(ns)
+                    continue
+                # values are mutated in place, so re-measure them here
+                size = approx_size(e[0])
+                self._bytes += size - e[2]; e[2] = size
+                if self.backend is not None: upserts[ns] = pack(e[0])
+            self._enforce_cap()
+        if self.backend is not None and (upserts or deletes):
+            self.backend.save(uid, upserts, deletes, time.time() + self.ttl)
+
+    def persist(self, handler):
+        """Handler decorator: load the user's session before, save it after."""
+        @functools.wraps(handler)
+        async def wrapper(update, ctx):
+            uid = update.effective_user.id
+            if self.backend is not None: await asyncio.to_thread(self.load_user, uid)
+            try:
+                return await handler(update, ctx)
+            finally:
+                if self.backend is not None: await asyncio.to_thread(self.save_user, uid)
+                else: self.save_user(uid)
+        return wrapper
+
+    async def sweeper(self, every=300):
+        while True:
+            await asyncio.sleep(every)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                print(f"Session sweep failed: {e}")
+
+
+hub = SessionHub(make_backend())
@@ -0,0 +1,60 @@
+"""upload_numbers (split / gen / quick / analysis) and merge_files must agree on E.164 output."""
+import os
+import sys
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["RESULT_CACHE_DIR"] = tempfile.mkdtemp(prefix="vcfbot-test-")
+
+import pytest
+
+import bot_core
+from filestore import Blob
+
+DATA = b"+14155550123\n0014155550124\n+919876543210\n09876543211\n9876543212\n919876543213\n"
+
+
+class FakeFile:
+    def __init__(self, data):
+        self.data = data
+
+    async def download_to_memory(self, out):
+        out.write(self.data)
+
+
+class FakeBot:
+    async def get_file(self, file_id):
+        return FakeFile(DATA)
+
+
+def upload(country_code, unique_id):
+    doc = SimpleNamespace(file_id=unique_id, file_unique_id=unique_id, file_name="nums.txt", file_size=len(DATA))
+    nums, _ = asyncio.run(bot_core.upload_numbers(1, FakeBot(), doc, country_code=country_code))
+    return ["+" + n for n in nums]
+
+
+def merged(country_code):
+    cfg = dict(bot_core.DEFAULT_SETTINGS, country_code=country_code)
+    out, _ = bot_core.merge_files([Blob("nums.txt", data=DATA)], "txt", cfg)
+    try: return out.read().decode().split("\n")
+    finally: out.discard()
+
+
+@pytest.mark.parametrize("country_code", ["", "+91", "+1"])
+def test_upload_matches_merge(country_code):
+    assert upload(country_code, f"id{country_code}") == merged(country_code)
+
+
+def test_country_code_keeps_international_numbers():
+    nums = upload("+91", "intl")
+    assert nums[:2] == ["+14155550123", "+14155550124"]
+    assert nums[2:] == ["+919876543210", "+919876543211", "+919876543212", "+919876543213"]
+
+
+def test_cached_tokens_reused_per_country_code():
+    # the same file under another country code comes from the cached tokens,
+    # never from re-normalising canonical numbers
+    assert upload("+91", "again")[:2] == ["+14155550123", "+14155550124"]
+    assert upload("+1", "again")[:2] == ["+14155550123", "+14155550124"]
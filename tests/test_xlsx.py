@@ -0,0 +1,55 @@
+"""XLSX text cells from the shared-strings table read the same in memory and spilled to disk."""
+import os
+import sys
+import zipfile
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import extractor
+
+NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+REL_NS = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+ROWS = [("Name", "Phone")] + [(f"user {i}", f"+91 98765 {i:05d}") for i in range(300)] + [("", "")]
+
+
+def write_shared_xlsx(path):
+    """Workbook laid out the way Excel saves it: every text cell is a t="s" index."""
+    strings = list(dict.fromkeys(v for row in ROWS for v in row))
+    rows = "".join(
+        f'<row r="{r}">' + "".join(
+            f'<c r="{col}{r}" t="s"><v>{strings.index(v)}</v></c>' for col, v in zip("AB", row)
+        ) + "</row>"
+        for r, row in enumerate(ROWS, 1))
+    sst = "".join(f"<si><t>{s}</t></si>" for s in strings)
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("xl/workbook.xml", f'<workbook {NS} {REL_NS}><sheets><sheet name="S" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        zf.writestr("xl/_rels/workbook.xml.rels", '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>')
+        zf.writestr("xl/worksheets/sheet1.xml", f"<worksheet {NS}><sheetData>{rows}</sheetData></worksheet>")
+        zf.writestr("xl/sharedStrings.xml", f'<sst {NS} count="{len(strings)}">{sst}</sst>')
+
+
+@pytest.fixture(scope="module")
+def xlsx():
+    path = os.path.join(tempfile.mkdtemp(prefix="vcfbot-test-"), "contacts.xlsx")
+    write_shared_xlsx(path)
+    return path
+
+
+def test_spilled_strings_match(xlsx, monkeypatch):
+    expected = [f"+9198765{i:05d}" for i in range(300)]
+    assert list(extractor.iter_raw_numbers(xlsx)) == expected
+    monkeypatch.setattr(extractor.SharedStrings.__init__, "__defaults__", (7,))
+    assert list(extractor.iter_raw_numbers(xlsx)) == expected
+
+
+def test_shared_strings_table():
+    table = extractor.SharedStrings(limit=2)
+    values = ["a", "", "+91 98765 43210", "ü", "", "last"]
+    for v in values: table.append(v)
+    assert table.file is not None and len(table) == len(values)
+    assert [table[i] for i in range(len(values))] == values
+    table.close()
@@ -0,0 +1,126 @@
+import os
+from collections import OrderedDict
+from functools import lru_cache
+
+import phonenumbers
+from phonenumbers import PhoneNumberType
+
+# ================= NUMBER VALIDATION =================
+# phonenumbers is slow per call, but uploads repeat the same prefixes over and
+# over. Geo descriptions are cached per (calling code, national prefix, number
+# type) and full lookups per number, and whole lists are handled in one call.
+# The prefix is as long as the longest geocoding prefix of that calling code,
+# so cached descriptions are the same ones geocoder would return.
+#
+# The geocoder data takes about half a second to import, so it is loaded on
+# first use (or by prewarm() once the bot is up), not with this module.
+
+GEO_CACHE_SIZE = int(os.environ.get("GEO_CACHE_SIZE", "50000"))
+NUMBER_CACHE_SIZE = int(os.environ.get("NUMBER_CACHE_SIZE", "200000"))
+ANALYSIS_CHUNK = int(os.environ.get("ANALYSIS_CHUNK", "50000"))
+
+
+class PrefixCache:
+    """Small LRU dict for geo descriptions."""
+
+    def __init__(self, maxsize=GEO_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key, compute):
+        try:
+            val = self.data[key]
+            self.data.move_to_end(key)
+            self.hits += 1
+            return val
+        except KeyError:
+            self.misses += 1
+        val = compute()
+        self.data[key] = val
+        if len(self.data) > self.maxsize: self.data.popitem(last=False)
+        return val
+
+
+geo_cache = PrefixCache()
+
+
+def prewarm():
+    from phonenumbers import geocoder  # noqa: F401  (pulls in geodata)
+
+
+def _parse(n):
+    return phonenumbers.parse(n if n.startswith("+") else "+" + n, None)
+
+
+@lru_cache(maxsize=None)
+def geo_prefix_len(cc):
+    """National digits that can matter for geocoding numbers of this calling code."""
+    from phonenumbers import geodata
+    code = str(cc)
+    longest = max((len(k) for k in geodata.GEOCODE_DATA if k.startswith(code)), default=len(code))
+    return longest - len(code)
+
+
+def _describe(pn, ntype):
+    # geocoder.description_for_number without computing the type again
+    from phonenumbers import geocoder
+    if ntype == PhoneNumberType.UNKNOWN:
+        return ""
+    if not phonenumbers.is_number_type_geographical(ntype, pn.country_code):
+        return geocoder.country_name_for_number(pn, "en")
+    return geocoder.description_for_valid_number(pn, "en")
+
+
+def describe(pn, ntype=None):
+    """geocoder description, cached by calling code + national prefix + type."""
+    if ntype is None: ntype = phonenumbers.number_type(pn)
+    if ntype == PhoneNumberType.UNKNOWN: return ""
+    nsn = phonenumbers.national_significant_number(pn)
+    key = (pn.country_code, nsn[:geo_prefix_len(pn.country_code)], ntype)
+    return geo_cache.get(key, lambda: _describe(pn, ntype))
+
+
+@lru_cache(maxsize=NUMBER_CACHE_SIZE)
+def lookup(n):
+    """(is_valid, region) for one number; region is None for unparsable input."""
+    try:
+        pn = _parse(n)
+    except Exception:
+        return False, None
+    # number_type does the same pattern matching as is_valid_number
+    ntype = phonenumbers.number_type(pn)
+    return ntype != PhoneNumberType.UNKNOWN, describe(pn, ntype)
+
+
+def lookup_many(numbers):
+    return [lookup(n) for n in numbers]
+
+
+def tally(numbers):
+    """Country counts and invalid count for a batch of numbers."""
+    stats, invalid = {}, 0
+    for valid, region in lookup_many(numbers):
+        if valid:
+            region = region or "Unknown"
+            stats[region] = stats.get(region, 0) + 1
+        else: invalid += 1
+    return stats, invalid
+
+
+def merge_tallies(parts):
+    stats, invalid = {}, 0
+    for s, inv in parts:
+        for region, count in s.items():
+            stats[region] = stats.get(region, 0) + count
+        invalid += inv
+    return stats, invalid
+
+
+def primary_country(numbers, sample=50):
+    countries = {}
+    for n in numbers[:sample]:
+        _, region = lookup(n)
+        if region: countries[region] = countries.get(region, 0) + 1
+    if countries: return max(countries, key=countries.get)
+    return "Unknown"
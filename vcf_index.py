@@ -0,0 +1,133 @@
+import re
+from array import array
+
+from vcf_writer import write_vcards
+
+# ================= VCF INDEX =================
+# The editor used to re-read the whole VCF and drop every card that contained
+# the typed digits anywhere (so removing 1234567 also removed 91234567890).
+# Here the file is parsed once into card byte spans plus a map from each
+# normalised TEL number to its cards. Removing or adding numbers only touches
+# the index, and the result is written back by copying the kept byte ranges.
+
+NON_DIGIT = re.compile(r"\D")
+TAIL_DIGITS = 10  # "9876543210" still finds "+91 98765 43210"
+
+
+def normalise(number):
+    return NON_DIGIT.sub("", number)
+
+
+def parse_targets(text):
+    """Numbers typed by the user: one per line / comma / semicolon."""
+    out = []
+    for token in re.split(r"[,;\n]+", text):
+        digits = normalise(token)
+        if len(digits) >= 7: out.append(digits)
+    return list(dict.fromkeys(out))
+
+
+def _tel_value(line):
+    """Digits of a TEL line (handles 'item1.TEL;TYPE=CELL:...'), else None."""
+    colon = line.find(b":")
+    if colon < 0: return None
+    name = line[:colon].split(b";", 1)[0].rsplit(b".", 1)[-1].strip().upper()
+    if name != b"TEL": return None
+    return normalise(line[colon + 1:].decode("utf-8", "ignore"))
+
+
+def iter_cards(data):
+    """Yields (start, end, [tel digits]) for each BEGIN:VCARD..END:VCARD block."""
+    pos, n = 0, len(data)
+    start, tels, last_tel = None, [], False
+    while pos < n:
+        nl = data.find(b"\n", pos)
+        end = n if nl < 0 else nl + 1
+        line = data[pos:end].rstrip(b"\r\n")
+        if start is not None and line[:1] in (b" ", b"\t"):
+            # folded line, continues the previous property
+            if last_tel: tels[-1] += normalise(line.decode("utf-8", "ignore"))
+        else:
+            last_tel = False
+            upper = line.strip().upper()
+            if upper == b"BEGIN:VCARD":
+                start, tels = pos, []
+            elif upper == b"END:VCARD" and start is not None:
+                yield start, end, [t for t in tels if t]
+                start = None
+            elif start is not None:
+                tel = _tel_value(line)
+                if tel is not None:
+                    tels.append(tel); last_tel = True
+        pos = end
+
+
+class VCFIndex:
+    def __init__(self):
+        self.starts = array("Q")
+        self.ends = array("Q")
+        self.by_number = {}   # digits -> [card ids]
+        self.by_tail = {}     # last TAIL_DIGITS digits -> [full digits]
+        self.removed = set()
+        self.added = []
+
+    @classmethod
+    def build(cls, data):
+        idx = cls()
+        for cid, (start, end, tels) in enumerate(iter_cards(data)):
+            idx.starts.append(start); idx.ends.append(end)
+            for t in tels:
+                idx.by_number.setdefault(t, []).append(cid)
+                if len(t) >= TAIL_DIGITS:
+                    tails = idx.by_tail.setdefault(t[-TAIL_DIGITS:], [])
+                    if t not in tails: tails.append(t)
+        return idx
+
+    def __len__(self):
+        return len(self.starts) - len(self.removed) + len(self.added)
+
+    @property
+    def nbytes(self):
+        return 16 * len(self.starts) + 120 * (len(self.by_number) + len(self.by_tail) + len(self.added))
+
+    def lookup(self, digits):
+        """Card ids whose number is exactly `digits`, or the same number with a country code."""
+        cards = list(self.by_number.get(digits, ()))
+        if len(digits) >= TAIL_DIGITS:
+            for full in self.by_tail.get(digits[-TAIL_DIGITS:], ()):
+                if full != digits and full.endswith(digits) and len(full) - len(digits) <= 3:
+                    cards.extend(self.by_number[full])
+        return [c for c in cards if c not in self.removed]
+
+    def contains(self, digits):
+        return bool(self.lookup(digits)) or digits in self.added
+
+    def remove(self, targets):
+        """Removes every card holding one of the numbers. Returns cards removed."""
+        count = 0
+        for t in targets:
+            for cid in self.lookup(t):
+                if cid not in self.removed:
+                    self.removed.add(cid); count += 1
+            if t in self.added:
+                self.added.remove(t); count += 1
+        return count
+
+    def add(self, numbers):
+        """Queues new cards for numbers not already in the file. Returns how many."""
+        new = [n for n in dict.fromkeys(normalise(x) for x in numbers) if n and not self.contains(n)]
+        self.added.extend(new)
+        return len(new)
+
+    def write(self, data, fh):
+        """Writes the edited file: kept byte ranges copied as-is, then new cards."""
+        view, n = memoryview(data), len(self.starts)
+        keep_from = 0
+        for cid in sorted(self.removed) + [n]:
+            if cid > keep_from:
+                fh.write(view[self.starts[keep_from]:self.ends[cid - 1]])
+            keep_from = cid + 1
+        if n and (n - 1) not in self.removed and data[self.ends[n - 1] - 1:self.ends[n - 1]] != b"\n":
+            fh.write(b"\n")
+        if self.added:
+            write_vcards(fh, self.added, "Added")
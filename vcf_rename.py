@@ -0,0 +1,65 @@
+import re
+
+from filestore import BlobWriter
+
+# ================= CONTACT RENAME =================
+# RENAME CONTACT sets FN and N of every card to "<name><index>". The file is
+# read in BLOCK sized pieces cut at a card boundary and each piece goes
+# through one regex substitution, so memory stays flat and Python only runs
+# per matched field, not per line. Folded continuation lines of a rewritten
+# field are dropped with it.
+
+BLOCK = 1 << 20
+CARD = b"BEGIN:VCARD"
+CARD_RE = re.compile(rb"^BEGIN:VCARD", re.M | re.I)
+FIELD_RE = re.compile(rb"^(?:BEGIN:VCARD|(FN|N)[;:][^\r\n]*(?:\r?\n[ \t][^\r\n]*)*)", re.M | re.I)
+
+
+def rename_cards(src, out, new_name, start=1):
+    """Streams Blob src into out with card k (from `start`) named new_name + k. Returns the card count."""
+    name = new_name.encode("utf-8")
+    idx = [start - 1]
+
+    def sub(m):
+        field = m.group(1)
+        if field is None:
+            idx[0] += 1
+            return m.group(0)
+        label = name + str(idx[0]).zfill(3).encode()
+        if field.upper() == b"FN": return b"FN:" + label
+        return b"N:;" + label + b";;;"
+
+    carry = b""
+    with src.open() as fh:
+        while True:
+            block = fh.read(BLOCK)
+            if not block: break
+            data = carry + block
+            cut = data.rfind(b"\n" + CARD)
+            if cut < 0:
+                carry = data
+                continue
+            out.write(FIELD_RE.sub(sub, data[:cut + 1]))
+            carry = data[cut + 1:]
+    if carry:
+        out.write(FIELD_RE.sub(sub, carry))
+    return idx[0] - start + 1
+
+
+def count_cards(src):
+    """Number of cards, counted the same way rename_cards numbers them."""
+    count, carry = 0, b""
+    with src.open() as fh:
+        for block in iter(lambda: fh.read(BLOCK), b""):
+            data = carry + block
+            cut = data.rfind(b"\n") + 1
+            count += len(CARD_RE.findall(data, 0, cut))
+            carry = data[cut:]
+    return count + len(CARD_RE.findall(carry))
+
+
+def rename_file(item):
+    """(blob, out name, new contact name, first index) -> renamed Blob. Runs in the job pool."""
+    src, out_name, new_name, start = item
+    with BlobWriter(out_name) as w: rename_cards(src, w, new_name, start)
+    return w.close()
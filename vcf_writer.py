@@ -0,0 +1,45 @@
+import io
+
+# ================= VCF WRITER =================
+# Streams vCards to a binary file handle in batches. Name / prefix pieces are
+# built once per call, so each card is just a few string concatenations.
+# Numbers come in canonical (normalize.py): digits only, country code applied.
+
+BATCH = 2000
+CARD_HEAD = "BEGIN:VCARD\nVERSION:3.0\nFN:"
+CARD_TAIL = "\nEND:VCARD\n"
+
+
+def card_parts(contact_name, suffix="", prefix="+"):
+    """Precomputed (head, mid) so a card is head + index + mid + number + tail."""
+    return CARD_HEAD + contact_name, suffix + "\nTEL;TYPE=CELL:" + prefix
+
+
+def write_vcards(fh, numbers, contact_name, start=1, suffix="", prefix="+", batch=BATCH):
+    """Writes one card per number to a binary handle. Returns how many were written."""
+    head, mid = card_parts(contact_name, suffix, prefix)
+    buf, count = [], 0
+    for i, n in enumerate(numbers, start=start):
+        buf.append(head + str(i).zfill(3) + mid + n + CARD_TAIL)
+        if len(buf) >= batch:
+            fh.write("".join(buf).encode("utf-8"))
+            count += len(buf); buf = []
+    if buf:
+        fh.write("".join(buf).encode("utf-8"))
+        count += len(buf)
+    return count
+
+
+def cfg_parts(cfg):
+    """contact name and group suffix from user settings (the country code is
+    applied when the numbers are normalised)."""
+    suffix = f" ({cfg['group_number']})" if cfg.get("group_number") else ""
+    return cfg["contact_name"], suffix
+
+
+def render_vcf(numbers, contact_name, start=1, suffix="", prefix="+"):
+    """Same as write_vcards but into a fresh BytesIO (rewound)."""
+    out = io.BytesIO()
+    write_vcards(out, numbers, contact_name, start, suffix, prefix)
+    out.seek(0)
+    return out
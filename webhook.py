@@ -0,0 +1,79 @@
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse
+from telegram import Update
+
+import metrics
+
+# ================= WEBHOOK SERVER =================
+# One ASGI app that takes Telegram updates and answers health checks, so the
+# bot runs behind uvicorn instead of long polling + the dev Flask server.
+
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")
+WEBHOOK_MAX_CONN = int(os.environ.get("WEBHOOK_MAX_CONN", "40"))
+
+
+def create_asgi(app, ready=lambda: True, set_webhook=True):
+    """
+    Wraps a PTB Application (built with .updater(None)) in a FastAPI app.
+    `ready` is an extra readiness check, e.g. "allowlist loaded".
+    """
+
+    @asynccontextmanager
+    async def lifespan(api):
+        await app.initialize()
+        if app.post_init: await app.post_init(app)
+        if set_webhook and WEBHOOK_URL:
+            await app.bot.set_webhook(
+                url=WEBHOOK_URL + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET or None,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=WEBHOOK_MAX_CONN,
+            )
+        await app.start()
+        try:
+            yield
+        finally:
+            await app.stop()
+            if app.post_stop: await app.post_stop(app)
+            await app.shutdown()
+            if app.post_shutdown: await app.post_shutdown(app)
+
+    api = FastAPI(lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+
+    @api.post(WEBHOOK_PATH)
+    async def telegram_update(request: Request):
+        if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            return Response(status_code=403)
+        data = await request.json()
+        await app.update_queue.put(Update.de_json(data, app.bot))
+        return Response(status_code=200)
+
+    @api.get("/")
+    async def home():
+        return PlainTextResponse("Bot is running")
+
+    @api.get("/healthz")
+    async def healthz():
+        return PlainTextResponse("ok")
+
+    @api.get("/metrics")
+    async def metrics_page():
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    @api.get("/ready")
+    async def readiness():
+        if app.running and ready():
+            return PlainTextResponse("ready")
+        return PlainTextResponse("starting", status_code=503)
+
+    return api
+
+
+def serve(app, port, ready=lambda: True):
+    import uvicorn
+    uvicorn.run(create_asgi(app, ready), host="0.0.0.0", port=port, log_level="warning")